@@ -3,7 +3,7 @@ from PyInstaller.utils.hooks import collect_all
 
 datas = [('user_config.json', '.'), ('booking_elements', 'booking_elements'), ('branch', 'branch'), ('credentials.json', '.')]
 binaries = []
-hiddenimports = ['tkinter', 'tkinter.ttk', 'gspread', 'google.oauth2.service_account', 'schedule', 'requests']
+hiddenimports = ['tkinter', 'tkinter.ttk', 'gspread', 'google.oauth2.service_account', 'requests']
 tmp_ret = collect_all('playwright')
 datas += tmp_ret[0]; binaries += tmp_ret[1]; hiddenimports += tmp_ret[2]
 
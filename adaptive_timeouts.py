@@ -0,0 +1,174 @@
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from config_service import load_json, save_json
+from tracing import current_run, percentile
+
+# timeout ของแต่ละขั้นตอน (ms) คำนวณจากเวลาที่ใช้จริงในการรันที่ผ่านมา แทนค่าตายตัว
+#   timeout = p95 ของเวลาที่บันทึกไว้ * (1 + MARGIN_RATIO) + MARGIN_MS แล้วบีบให้อยู่ในช่วง [min, max] ของขั้นตอน
+# - ยังมีข้อมูลไม่ถึง MIN_SAMPLES ครั้ง: ใช้ค่าเดิม (default ที่ผู้เรียกส่งมา)
+# - ขั้นตอนที่ timeout: บันทึกเวลา timeout เป็นตัวอย่าง (เวลาจริงอย่างน้อยเท่านี้) รอบหน้าจึงยืดขึ้นเอง
+#   และในการรันเดียวกัน (เช่นตอนลองใหม่) ใช้ค่า max ของขั้นตอนนั้นทันที
+# ประวัติอยู่ใน cache/step_timeouts.json อัปเดตหลังจบการรันแต่ละครั้ง (save_history)
+TIMEOUT_HISTORY_PATH = Path("cache/step_timeouts.json")
+
+# ไฟล์ปักค่า timeout เอง (ไม่บังคับ) เช่น
+#   {"line_login_page": 45000, "step:rocketbooking:branch": {"min_ms": 5000, "max_ms": 30000}}
+# ตัวเลข = ใช้ค่านี้ตายตัว, dict = เปลี่ยนช่วง min/max ที่ใช้บีบค่าที่คำนวณได้
+TIMEOUT_OVERRIDES_PATH = Path("booking_elements/timeout_overrides.json")
+
+PERCENTILE = 95
+MARGIN_RATIO = 0.5
+MARGIN_MS = 1000
+MIN_SAMPLES = 5
+# จำนวนตัวอย่างล่าสุดที่เก็บต่อขั้นตอน (ค่าเก่ากว่านี้ไม่สะท้อนสภาพเว็บปัจจุบันแล้ว)
+HISTORY_WINDOW = 50
+
+# ช่วงเริ่มต้นของขั้นตอนที่ไม่ได้ระบุใน STEP_BOUNDS: ไม่ต่ำกว่า DEFAULT_MIN_MS และไม่เกิน default * DEFAULT_MAX_FACTOR
+DEFAULT_MIN_MS = 2000
+DEFAULT_MAX_FACTOR = 2
+
+# timeout เริ่มต้นของ Playwright (ใช้กับขั้นตอนใน flow ที่ไม่ได้ระบุ timeout_ms)
+PLAYWRIGHT_DEFAULT_TIMEOUT_MS = 30000
+
+# ช่วง (min_ms, max_ms) ของขั้นตอนที่ต้องกำหนดเอง
+STEP_BOUNDS = {
+    # timeout ของการรอปุ่ม Connect บนหน้าโปรไฟล์แปลว่า "ล็อกอินแล้ว" ต้องไม่สั้นจนเข้าใจผิด
+    "line_connect_probe": (5000, 30000),
+    # รอเว็บ redirect กลับจาก LINE ซึ่งช้ามากในวันที่คนเยอะ
+    "line_login_redirect": (10000, 120000),
+}
+
+# สถานะของแต่ละการรัน เก็บใน dict ของ tracing.trace_run (หลายโปรไฟล์รันพร้อมกันบน BookingEngine loop เดียวได้
+# การรันหนึ่งจบแล้ว save_history ต้องไม่ล้างตัวอย่าง/ขั้นตอนที่ escalate ของการรันอื่น)
+#   pending: ตัวอย่างที่ยังไม่ได้บันทึกลงไฟล์ {key: [ms, ...]}, defaults: default ของแต่ละขั้นตอน
+#   escalated: ขั้นตอนที่ timeout ไปแล้วในการรันนี้ (ใช้ค่า max จนจบการรัน)
+# โค้ดที่ไม่ได้อยู่ใน trace_run ใช้สถานะกลางของ process
+_untraced_state = {"pending": {}, "defaults": {}, "escalated": set()}
+
+
+def _state():
+    run = current_run()
+    if run is None:
+        return _untraced_state
+    return run.setdefault("timeouts", {"pending": {}, "defaults": {}, "escalated": set()})
+
+
+def _load(path):
+    try:
+        data = load_json(path)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"⚠️ อ่าน {path} ไม่ได้ ({e}), ใช้ timeout เริ่มต้น")
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def samples_for(key):
+    """เวลาที่บันทึกไว้ของขั้นตอน (ประวัติในไฟล์ + ที่วัดได้ในการรันนี้)"""
+    entry = _load(TIMEOUT_HISTORY_PATH).get(key) or {}
+    return list(entry.get("samples", [])) + _state()["pending"].get(key, [])
+
+
+def bounds_for(key, default_ms):
+    """ช่วง (min_ms, max_ms) ของขั้นตอน: STEP_BOUNDS หรือค่าที่คำนวณจาก default แล้วทับด้วยไฟล์ override"""
+    low, high = STEP_BOUNDS.get(key, (min(default_ms, DEFAULT_MIN_MS), default_ms * DEFAULT_MAX_FACTOR))
+    override = _load(TIMEOUT_OVERRIDES_PATH).get(key)
+    if isinstance(override, dict):
+        low = override.get("min_ms", low)
+        high = override.get("max_ms", high)
+    return low, max(low, high)
+
+
+def timeout_for(key, default_ms):
+    """timeout (ms) ของขั้นตอน key, default_ms คือค่าที่ใช้เมื่อยังไม่มีประวัติพอ"""
+    override = _load(TIMEOUT_OVERRIDES_PATH).get(key)
+    if isinstance(override, (int, float)) and not isinstance(override, bool):
+        return int(override)
+
+    low, high = bounds_for(key, default_ms)
+    if key in _state()["escalated"]:
+        return int(high)
+    samples = samples_for(key)
+    if len(samples) < MIN_SAMPLES:
+        return int(min(high, max(low, default_ms)))
+    value = percentile(sorted(samples), PERCENTILE) * (1 + MARGIN_RATIO) + MARGIN_MS
+    return int(min(high, max(low, value)))
+
+
+def record(key, duration_ms, default_ms):
+    state = _state()
+    state["pending"].setdefault(key, []).append(round(duration_ms, 1))
+    state["defaults"][key] = default_ms
+
+
+def _is_timeout(error):
+    # TimeoutError ของ Playwright ไม่ใช่ builtin TimeoutError (import ที่นี่เพื่อให้อ่านสรุปได้โดยไม่ต้องมี Playwright)
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    return isinstance(error, (PlaywrightTimeoutError, TimeoutError))
+
+
+@contextmanager
+def adaptive(key, default_ms, expect_absent=False):
+    """
+    ให้ timeout (ms) ของขั้นตอน key แล้ววัดเวลาที่ใช้จริงเก็บเป็นประวัติ
+    expect_absent: timeout คือผลปกติของขั้นตอนนี้ (เช่นรอปุ่มที่ไม่ควรมี) จึงไม่นับว่าเว็บช้า
+
+        with adaptive("line_login_page", 30000) as timeout:
+            await page.wait_for_selector(selector, timeout=timeout)
+    """
+    timeout = timeout_for(key, default_ms)
+    started = time.perf_counter()
+    try:
+        yield timeout
+    except Exception as e:
+        if not expect_absent and _is_timeout(e):
+            elapsed = (time.perf_counter() - started) * 1000
+            record(key, max(elapsed, timeout), default_ms)
+            _state()["escalated"].add(key)
+            print(f"⏱️ '{key}' เกินเวลา {timeout} ms, ใช้ค่าสูงสุด {timeout_for(key, default_ms)} ms ในการรันนี้")
+        raise
+    record(key, (time.perf_counter() - started) * 1000, default_ms)
+
+
+def save_history():
+    """รวมเวลาที่วัดได้ในการรันปัจจุบันเข้าไฟล์ประวัติ (เก็บ HISTORY_WINDOW ค่าล่าสุดต่อขั้นตอน)"""
+    state = _state()
+    pending = state["pending"]
+    if not pending:
+        return
+    # อ่านไฟล์ล่าสุดก่อนเขียน (worker หลายตัวอาจจบใกล้กัน ถ้าชนกันจะเสียแค่ตัวอย่างของการรันนั้น)
+    # {key: {"default_ms": ค่าเดิมของขั้นตอน, "samples": [ms, ...]}}
+    history = dict(_load(TIMEOUT_HISTORY_PATH))
+    for key, values in pending.items():
+        samples = list((history.get(key) or {}).get("samples", [])) + values
+        history[key] = {"default_ms": state["defaults"][key], "samples": samples[-HISTORY_WINDOW:]}
+    try:
+        save_json(TIMEOUT_HISTORY_PATH, history)
+    except OSError as e:
+        print(f"⚠️ บันทึกประวัติ timeout ไม่ได้: {e}")
+        return
+    pending.clear()
+    state["defaults"].clear()
+    state["escalated"].clear()
+
+
+def print_summary():
+    history = _load(TIMEOUT_HISTORY_PATH)
+    if not history:
+        print(f"ℹ️ ยังไม่มีประวัติ timeout ใน {TIMEOUT_HISTORY_PATH}")
+        return
+    print(f"⏱️ timeout จากประวัติ ({TIMEOUT_HISTORY_PATH})")
+    print(f"{'ขั้นตอน':<36}{'count':>7}{'p95 ms':>10}{'default':>10}{'timeout':>10}")
+    for key, entry in sorted(history.items()):
+        samples = sorted(entry.get("samples", []))
+        default_ms = entry.get("default_ms", 0)
+        print(f"{key:<36}{len(samples):>7}{percentile(samples, PERCENTILE):>10.0f}{default_ms:>10}{timeout_for(key, default_ms):>10}")
+
+
+if __name__ == "__main__":
+    # python adaptive_timeouts.py
+    print_summary()
@@ -0,0 +1,206 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from mock_server import base_url, start_mock_server
+from tracing import percentile
+
+# benchmark ความเร็วการจองแบบ end-to-end กับเว็บจำลอง (mock_server.py) บน headless Chromium
+# ใช้งาน:
+#   python benchmark.py --iterations 10                 รันและเทียบกับ baseline
+#   python benchmark.py --iterations 10 --save-baseline  บันทึกผลรอบนี้เป็น baseline ใหม่
+# จบด้วย exit code 1 ถ้ามี flow ที่จองไม่สำเร็จ หรือช้ากว่า baseline เกิน margin
+#
+# ขอบเขต: วัดเฉพาะ flow engine (run_site_flow บนเบราว์เซอร์ใหม่ที่ไม่มีโปรไฟล์) ไม่ได้ผ่าน live mode
+# ส่วนของ live mode ที่ไม่ถูกวัด: lease/ซิงก์โปรไฟล์, launch_persistent_context, session cache,
+# CAPTCHA และการตรวจ LINE login (prepare_booking) ดูเวลาของส่วนเหล่านี้จาก span ใน logs/booking_trace.jsonl แทน
+
+BENCHMARK_DIR = Path("benchmarks")
+RESULTS_DIR = BENCHMARK_DIR / "results"
+BASELINE_PATH = BENCHMARK_DIR / "baseline.json"
+
+DEFAULT_SITES = ["rocketbooking", "pmrocket", "ithitec"]
+METRICS = ["cold_start_ms", "first_click_ms", "confirm_ms"]
+# สถิติที่ใช้เทียบกับ baseline
+GATED_STATS = ["p50", "p95"]
+
+
+def _stats(values):
+    values = sorted(values)
+    if not values:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "max": 0.0, "mean": 0.0}
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "max": values[-1],
+        "mean": round(sum(values) / len(values), 1),
+    }
+
+
+async def _run_once(playwright, site_name, site_url, params):
+    """
+    รัน flow ของ site หนึ่งครั้งบนเบราว์เซอร์ใหม่
+    cold_start_ms: เปิดเบราว์เซอร์ + โหลดหน้าแรก
+    first_click_ms / confirm_ms: นับจากเริ่ม flow จนขั้นตอนแรกเสร็จ / จนจองครบทุกขั้นตอน
+    """
+    from flow_engine import run_site_flow
+    from selector_chains import reset_stale
+
+    # ไม่ได้อยู่ใน trace_run: ล้างตัวนับ selector stale เองให้สรุปท้าย flow เป็นของรอบนี้เท่านั้น
+    reset_stale()
+    sample = {"ok": False}
+    started = time.perf_counter()
+    browser = await playwright.chromium.launch(headless=True)
+    try:
+        page = await browser.new_page()
+        await page.goto(site_url, wait_until="domcontentloaded")
+        flow_started = time.perf_counter()
+        sample["cold_start_ms"] = round((flow_started - started) * 1000, 1)
+
+        async def mark_first_step():
+            sample.setdefault("first_click_ms", round((time.perf_counter() - flow_started) * 1000, 1))
+
+        ok = await run_site_flow(page, site_name, params["branch"], params["day"], params["time"], after_step=mark_first_step)
+        sample["confirm_ms"] = round((time.perf_counter() - flow_started) * 1000, 1)
+        sample["ok"] = bool(ok)
+    except Exception as e:
+        sample["error"] = str(e)
+    finally:
+        await browser.close()
+    return sample
+
+
+async def run_benchmark_async(playwright, sites, site_urls, iterations, params):
+    results = {}
+    for site_name in sites:
+        samples = []
+        for i in range(iterations):
+            print(f"🏁 {site_name}: รอบ {i + 1}/{iterations}")
+            samples.append(await _run_once(playwright, site_name, site_urls[site_name], params))
+
+        passed = [s for s in samples if s["ok"]]
+        results[site_name] = {
+            "failures": len(samples) - len(passed),
+            "samples": samples,
+            **{metric: _stats([s[metric] for s in passed if metric in s]) for metric in METRICS},
+        }
+    return results
+
+
+def compare_with_baseline(results, baseline, margin, slack_ms):
+    """
+    คืนรายการ regression: p50/p95 ของ metric ใดที่เกิน baseline * (1 + margin) + slack_ms
+    slack_ms กันไม่ให้ตัวเลขเล็ก ๆ (เช่น 20 ms -> 30 ms) ถูกนับเป็น regression
+    """
+    regressions = []
+    for site_name, site_result in results["sites"].items():
+        base_site = baseline.get("sites", {}).get(site_name)
+        if not base_site:
+            continue
+        for metric in METRICS:
+            for stat in GATED_STATS:
+                base_value = base_site.get(metric, {}).get(stat)
+                value = site_result[metric][stat]
+                if not base_value or not site_result[metric]["count"]:
+                    continue
+                limit = base_value * (1 + margin) + slack_ms
+                if value > limit:
+                    regressions.append(f"{site_name} {metric} {stat}: {value:.0f} ms > {limit:.0f} ms (baseline {base_value:.0f} ms)")
+    return regressions
+
+
+def print_report(results):
+    print(f"\n📊 Benchmark ({results['iterations']} รอบ/site, latency {results['latency_ms']} ms)")
+    print(f"{'site':<16}{'metric':<17}{'p50':>9}{'p95':>9}{'max':>9}{'fail':>6}")
+    for site_name, site_result in results["sites"].items():
+        for metric in METRICS:
+            stats = site_result[metric]
+            print(f"{site_name:<16}{metric:<17}{stats['p50']:>9.0f}{stats['p95']:>9.0f}{stats['max']:>9.0f}{site_result['failures']:>6}")
+
+
+def _write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="วัดเวลาการจองแบบ end-to-end กับเว็บจำลอง")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--sites", nargs="+", default=DEFAULT_SITES, choices=DEFAULT_SITES)
+    parser.add_argument("--latency-ms", type=float, default=50, help="latency ฝั่ง server ของเว็บจำลอง")
+    parser.add_argument("--branch", default="Centralworld")
+    parser.add_argument("--day", default="15")
+    parser.add_argument("--time", default="12:00")
+    parser.add_argument("--output", type=Path, help="ไฟล์ผลลัพธ์ JSON (ค่าเริ่มต้น benchmarks/results/bench_<เวลา>.json)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="บันทึกผลรอบนี้เป็น baseline")
+    parser.add_argument("--margin", type=float, default=0.2, help="ยอมให้ช้ากว่า baseline ได้กี่เท่า (0.2 = 20%%)")
+    parser.add_argument("--slack-ms", type=float, default=50, help="ค่าเผื่อแบบ ms บวกเพิ่มจาก margin")
+    args = parser.parse_args()
+
+    server = start_mock_server(port=0, latency_ms=args.latency_ms)
+    # flow_engine อ่าน BOOKING_MOCK_URL ตอน import จึงต้องตั้งก่อน import ครั้งแรก
+    os.environ["BOOKING_MOCK_URL"] = base_url(server)
+    from booking_engine import get_engine
+    from flow_engine import load_site_plan
+    from booking_scripts.site_rocketbooking import BOOKING_URL
+
+    site_urls = {name: load_site_plan(name)["site_url"] for name in args.sites if name != "rocketbooking"}
+    site_urls["rocketbooking"] = BOOKING_URL
+    params = {"branch": args.branch, "day": args.day, "time": args.time}
+
+    engine = get_engine()
+    try:
+        site_results = engine.run(lambda playwright: run_benchmark_async(playwright, args.sites, site_urls, args.iterations, params))
+    finally:
+        engine.shutdown()
+        server.shutdown()
+
+    results = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "iterations": args.iterations,
+        "latency_ms": args.latency_ms,
+        "params": params,
+        "sites": site_results,
+    }
+    print_report(results)
+
+    output = args.output or RESULTS_DIR / f"bench_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+    _write_json(output, results)
+    print(f"💾 บันทึกผลที่ {output}")
+
+    failed = any(site["failures"] for site in site_results.values())
+    if failed:
+        print("❌ มี flow ที่จองไม่สำเร็จ")
+
+    if args.save_baseline:
+        _write_json(args.baseline, results)
+        print(f"📌 บันทึก baseline ที่ {args.baseline}")
+        return 1 if failed else 0
+
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f"ℹ️ ยังไม่มี baseline ({args.baseline}), รันด้วย --save-baseline เพื่อสร้าง")
+        return 1 if failed else 0
+
+    regressions = compare_with_baseline(results, baseline, args.margin, args.slack_ms)
+    if regressions:
+        print(f"❌ ช้ากว่า baseline เกิน {args.margin:.0%} + {args.slack_ms:.0f} ms:")
+        for line in regressions:
+            print(f"   - {line}")
+        return 1
+
+    print("✅ ไม่พบ regression เทียบกับ baseline")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
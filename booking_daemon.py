@@ -0,0 +1,225 @@
+import datetime
+import logging
+import signal
+import sys
+import threading
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from booking_service import BookingService, describe_failure
+
+# รันการจองโดยไม่มี Tk (เช่นบนเครื่อง Linux ที่ไม่มีจอ) ผ่าน BookingService ตัวเดียวกับ GUI
+#   python main.py daemon            : โหลดรายการจองจาก job_store แล้วรัน scheduler จนได้รับ SIGINT/SIGTERM
+#   python main.py book ...          : จองหนึ่งครั้งจาก argument หรือไฟล์ JSON แล้วจบ (exit code 0 = สำเร็จ)
+# log ทั้งหมด (รวม log ของ worker) เขียนลง logs/daemon.log แบบหมุนไฟล์
+
+DAEMON_LOG_PATH = Path("logs/daemon.log")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# ความถี่ที่ daemon ตรวจรายการจองใหม่/ที่ถูกแก้ไขใน job_store (วินาที)
+DEFAULT_RESCAN_SECONDS = 60
+# เวลาที่รอให้งานจองที่ทำอยู่จบเองเมื่อได้รับสัญญาณหยุด ก่อนยกเลิก (วินาที)
+DEFAULT_SHUTDOWN_GRACE_SECONDS = 30
+
+logger = logging.getLogger("booking_daemon")
+
+
+class _LoggerWriter:
+    """ใช้แทน sys.stdout/sys.stderr: print จากโมดูลอื่นใน process หลักลงไฟล์ log ด้วย"""
+
+    def __init__(self, level):
+        self._level = level
+        self._buffer = ""
+
+    def write(self, text):
+        self._buffer += text
+        if "\n" in self._buffer:
+            lines, self._buffer = self._buffer.rsplit("\n", 1)
+            for line in lines.splitlines():
+                if line.strip():
+                    logger.log(self._level, line)
+
+    def flush(self):
+        if self._buffer.strip():
+            logger.log(self._level, self._buffer)
+        self._buffer = ""
+
+
+def setup_logging(log_path=DAEMON_LOG_PATH, verbose=False):
+    """log ลงไฟล์ (หมุนไฟล์ตามขนาด) และ console แล้วส่ง print ทั้งหมดเข้า logger"""
+    log_path = Path(log_path)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+
+    file_handler = RotatingFileHandler(log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    file_handler.setFormatter(formatter)
+    console_handler = logging.StreamHandler(sys.__stdout__)
+    console_handler.setFormatter(formatter)
+
+    logger.handlers = [file_handler, console_handler]
+    logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+    logger.propagate = False
+
+    sys.stdout = _LoggerWriter(logging.INFO)
+    sys.stderr = _LoggerWriter(logging.WARNING)
+
+
+def _on_worker_event(service, event):
+    # ไม่มีผู้ใช้ให้ถาม: prompt ของ worker (เช่น "กด Enter เพื่อปิด browser") ตอบ continue อัตโนมัติ
+    job_id = event.get("job_id")
+    if event["type"] == "log":
+        logger.log(logging.WARNING if event["stream"] == "stderr" else logging.INFO, f"[#{job_id}] {event['text']}")
+    elif event["type"] == "started":
+        logger.info(f"▶️ [#{job_id}] เริ่ม worker process (pid {event['pid']})")
+    elif event["type"] == "progress":
+        logger.debug(f"⏱️ [#{job_id}] {event['span']}: {event['duration_ms']:.0f} ms ({event['status']})")
+    elif event["type"] == "prompt":
+        logger.warning(f"❔ [#{job_id}] {event['text'].strip()} -> ดำเนินการต่ออัตโนมัติ (โหมดไม่มีหน้าจอ)")
+        service.worker_pool.send(job_id, "continue")
+
+
+def create_service(all_configs, users, line_credentials_for, schedule_json_path=None):
+    """BookingService ที่ log ผ่าน logger ของ daemon"""
+    def max_profiles_for(username):
+        user = users.get(username)
+        try:
+            return int(user.get('max_profiles', 1)) if user else 1
+        except (TypeError, ValueError):
+            return 1
+
+    service = None
+
+    def on_worker_event(event):
+        _on_worker_event(service, event)
+
+    service = BookingService(
+        all_configs['times'],
+        max_profiles_for,
+        line_credentials_for,
+        log=logger.info,
+        on_worker_event=on_worker_event,
+        schedule_json_path=schedule_json_path,
+    )
+    return service
+
+
+def profile_allowed(users, user_profiles, job):
+    """ผู้ใช้ยังมีสิทธิ์ และโปรไฟล์ของงานอยู่ในขีดจำกัด max_profiles (นับตามลำดับใน user_config.json)"""
+    user = users.get(job['username'])
+    if not user:
+        return False
+    if user.get('role') == 'admin':
+        return True
+    profiles = [(u['browser'], u['profile_name']) for u in user_profiles.get("users", []) if u['username'] == job['username']]
+    try:
+        return profiles.index((job['browser'], job['profile_name'])) < int(user.get('max_profiles', 1))
+    except (ValueError, TypeError):
+        return False
+
+
+def _install_signal_handlers(stop_event):
+    def handle(signum, frame):
+        logger.info(f"🛑 ได้รับสัญญาณ {signal.Signals(signum).name}, กำลังหยุด...")
+        stop_event.set()
+
+    # SIGBREAK คือ Ctrl+Break บน Windows
+    for name in ("SIGINT", "SIGTERM", "SIGBREAK"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), handle)
+
+
+def run_daemon(all_configs, users, line_credentials_for, schedule_json_path=None,
+               rescan_seconds=DEFAULT_RESCAN_SECONDS, grace_seconds=DEFAULT_SHUTDOWN_GRACE_SECONDS):
+    """
+    รัน scheduler ของรายการจองทั้งหมดใน job_store จนได้รับ SIGINT/SIGTERM
+    ตรวจ job_store ใหม่ทุก rescan_seconds (รายการที่เพิ่ม/แก้จาก GUI เครื่องเดียวกันจะถูกตั้งเวลาใหม่)
+    """
+    stop_event = threading.Event()
+    _install_signal_handlers(stop_event)
+    service = create_service(all_configs, users, line_credentials_for, schedule_json_path)
+
+    # งานที่ scheduler เรียกไปแล้ว (id, schedule_time) ไม่ตั้งเวลาซ้ำตอนตรวจ job_store ใหม่
+    fired = set()
+    fired_lock = threading.Lock()
+
+    def job_key(job):
+        return (job['id'], job['schedule_time'])
+
+    def can_schedule(job):
+        user = users.get(job['username'])
+        if not user or not user.get('can_use_scheduler'):
+            logger.info(f"ℹ️ ข้ามรายการจอง '{job['name']}': ผู้ใช้ '{job['username']}' ไม่มีสิทธิ์ใช้ระบบตั้งเวลาจอง.")
+            return False
+        with fired_lock:
+            return job_key(job) not in fired
+
+    def can_run(job):
+        with fired_lock:
+            fired.add(job_key(job))
+        return profile_allowed(users, all_configs['user_profiles'], job)
+
+    def snapshot():
+        now_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with fired_lock:
+            return {job['id']: job for job in service.job_store.upcoming_jobs(now_str) if job_key(job) not in fired}
+
+    logger.info(f"▶️ เริ่ม booking daemon (pre-warm ล่วงหน้า {service.prewarm_lead_seconds()} วินาที, ตรวจรายการใหม่ทุก {rescan_seconds} วินาที)")
+    current = snapshot()
+    refs = service.schedule_upcoming(can_schedule=can_schedule, can_run=can_run)
+    logger.info(f"📋 ตั้งเวลาไว้ {len(refs)} รายการ")
+
+    try:
+        while not stop_event.wait(rescan_seconds):
+            latest = snapshot()
+            if latest == current:
+                continue
+            logger.info("🔄 รายการจองใน job_store เปลี่ยน, ตั้งเวลาใหม่")
+            service.scheduler.clear()
+            current = latest
+            refs = service.schedule_upcoming(can_schedule=can_schedule, can_run=can_run)
+            logger.info(f"📋 ตั้งเวลาไว้ {len(refs)} รายการ")
+    finally:
+        active = service.active_jobs()
+        if active["running"] or active["pending"]:
+            logger.info(f"⏳ รองานจองที่ทำอยู่ {active['running']} งาน และรอคิว {active['pending']} งาน สูงสุด {grace_seconds} วินาที")
+        service.shutdown(grace_seconds=grace_seconds)
+        logger.info("⏹️ booking daemon หยุดแล้ว")
+
+
+def run_once(all_configs, users, line_credentials_for, job, fire_at=None):
+    """
+    จองหนึ่งครั้งตาม job (username, browser, profile_name, branch, day, time_str) แล้วรอจนเสร็จ
+    ถ้าระบุ fire_at (epoch seconds) จะ pre-warm แล้วเริ่มจองตรงเวลา คืน True เมื่อสำเร็จ
+    """
+    stop_event = threading.Event()
+    _install_signal_handlers(stop_event)
+    service = create_service(all_configs, users, line_credentials_for)
+    done = threading.Event()
+    result = {}
+
+    def on_done(event):
+        result.update(event)
+        done.set()
+
+    label = f"{job['username']} - {job['browser']} - {job['profile_name']}"
+    try:
+        service.submit_live(job['username'], job['browser'], job['profile_name'], job['branch'], job['day'], job['time_str'],
+                            fire_at=fire_at, on_done=on_done)
+        while not done.wait(0.5):
+            if stop_event.is_set():
+                break
+    finally:
+        service.shutdown()
+        # on_done ของงานที่ถูกยกเลิกตอน shutdown อาจมาช้ากว่า stop_event เล็กน้อย
+        done.wait(1)
+
+    if result.get("ok"):
+        logger.info(f"✅ กระบวนการจอง '{label}' เสร็จสิ้น ({result.get('elapsed_s', 0):.1f} วินาที).")
+        return True
+    if result:
+        _, error = describe_failure(result)
+        logger.error(f"❌ กระบวนการจอง '{label}' ไม่สำเร็จ: {error}")
+    else:
+        logger.error(f"❌ กระบวนการจอง '{label}' ถูกหยุดก่อนเสร็จ")
+    return False
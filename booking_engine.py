@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+
+class BookingEngine:
+    """
+    รัน booking flow ทุกโปรไฟล์บน asyncio event loop เดียว (ใน background thread)
+    และใช้ Playwright driver connection เดียวร่วมกัน
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._playwright = None
+        self._playwright_lock = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            ready = threading.Event()
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run_loop, args=(ready,), name="booking-engine", daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._playwright_lock = asyncio.Lock()
+        self._loop.call_soon(ready.set)
+        self._loop.run_forever()
+
+    async def get_playwright(self):
+        """เริ่ม Playwright driver ครั้งแรกที่ต้องใช้ แล้วใช้ตัวเดิมต่อไปทุก flow"""
+        async with self._playwright_lock:
+            if self._playwright is None:
+                # import Playwright ตอนจองครั้งแรก (ลดเวลาเปิดโปรแกรม)
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+            return self._playwright
+
+    def submit(self, coro_factory):
+        """
+        ส่งงานเข้า event loop โดย coro_factory รับ Playwright แล้วคืน coroutine
+        คืนค่า concurrent.futures.Future (ไม่บล็อก thread ที่เรียก)
+        """
+        self.start()
+
+        async def runner():
+            playwright = await self.get_playwright()
+            return await coro_factory(playwright)
+
+        return asyncio.run_coroutine_threadsafe(runner(), self._loop)
+
+    def run(self, coro_factory):
+        """เหมือน submit แต่รอจนงานเสร็จและคืนผลลัพธ์ (ใช้กับ sync entry point)"""
+        return self.submit(coro_factory).result()
+
+    def run_many(self, coro_factories):
+        """รันหลาย flow พร้อมกันบน loop เดียว แล้วรอผลทั้งหมด (exception จะถูกคืนเป็นผลลัพธ์)"""
+        futures = [self.submit(factory) for factory in coro_factories]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def shutdown(self):
+        if not (self._thread and self._thread.is_alive()):
+            return
+
+        async def stop_playwright():
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+        asyncio.run_coroutine_threadsafe(stop_playwright(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """คืน BookingEngine ตัวเดียวของทั้งโปรเซส"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = BookingEngine()
+        return _engine
@@ -0,0 +1,208 @@
+import heapq
+import itertools
+import os
+import sys
+import threading
+import time
+
+# คิวงานจองที่อยู่หน้า WorkerPool:
+# - จำกัดจำนวนเบราว์เซอร์ที่เปิดพร้อมกันต่อผู้ใช้ตาม max_profiles
+# - จำกัดทั้งเครื่องตามหน่วยความจำที่เหลือ (ประมาณ MEMORY_PER_BROWSER_MB ต่อเบราว์เซอร์)
+# - งานที่ใช้โปรไฟล์เบราว์เซอร์เดียวกัน (resource) รอกันในคิว ไม่ไปแย่ง lease กันใน worker
+# - เมื่อเครื่องเต็ม งานที่รอจะเริ่มตาม deadline ที่เร็วที่สุดก่อน (earliest-deadline-first)
+
+# หน่วยความจำที่เบราว์เซอร์หนึ่งตัวใช้โดยประมาณ (MB)
+MEMORY_PER_BROWSER_MB = 700
+# หน่วยความจำที่เว้นไว้ให้ระบบและโปรแกรมอื่น (MB)
+MEMORY_RESERVE_MB = 1024
+# จำนวนเบราว์เซอร์สูงสุดทั้งเครื่อง ไม่ว่าหน่วยความจำจะเหลือเท่าไร
+DEFAULT_MAX_CONCURRENT = 6
+# ความถี่ที่ตรวจคิวใหม่ระหว่างรอหน่วยความจำว่าง (วินาที)
+_RECHECK_SECONDS = 2.0
+
+
+def available_memory_mb():
+    """หน่วยความจำที่ว่างอยู่ (MB) หรือ None ถ้าอ่านไม่ได้ (ไม่ต้องใช้ psutil)"""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [
+                    ("dwLength", ctypes.c_ulong),
+                    ("dwMemoryLoad", ctypes.c_ulong),
+                    ("ullTotalPhys", ctypes.c_ulonglong),
+                    ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong),
+                    ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong),
+                    ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+                ]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return status.ullAvailPhys / (1024 * 1024)
+            return None
+        if os.path.exists("/proc/meminfo"):
+            with open("/proc/meminfo", "r", encoding="ascii") as f:
+                for line in f:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) / 1024
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class BookingExecutor:
+    """
+    รับงานจองแทนการส่งเข้า WorkerPool โดยตรง แล้วปล่อยงานเมื่อผู้ใช้และเครื่องยังรับได้
+    max_profiles_for(username): คืนจำนวนเบราว์เซอร์ที่ผู้ใช้เปิดพร้อมกันได้ (max_profiles ของผู้ใช้)
+    """
+
+    def __init__(self, pool, max_profiles_for, log=print, max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 memory_per_browser_mb=MEMORY_PER_BROWSER_MB, memory_reserve_mb=MEMORY_RESERVE_MB):
+        self.pool = pool
+        self._max_profiles_for = max_profiles_for
+        self._log = log
+        self.max_concurrent = max_concurrent
+        self.memory_per_browser_mb = memory_per_browser_mb
+        self.memory_reserve_mb = memory_reserve_mb
+        # WorkerPool ไม่ต้องจำกัดซ้ำ (executor คุมจำนวนเองแล้ว)
+        pool.max_workers = max(pool.max_workers, max_concurrent)
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        # heap ของ (deadline, ลำดับ, job)
+        self._queue = []
+        self._running_by_user = {}
+        self._busy_resources = set()
+        self._running = 0
+        self._recheck_timer = None
+
+    def submit(self, kind, kwargs, username, deadline=None, on_done=None, label=None, timeout=None, resource=None):
+        """
+        ส่งงานเข้าคิว (ไม่บล็อก)
+        deadline: epoch seconds ที่งานต้องเริ่มทำจริง (เช่นเวลาจองของงานที่ตั้งไว้), None = ตอนนี้
+        resource: สิ่งที่งานต้องใช้แต่เพียงผู้เดียว (เช่น "chrome/Profile 1") งานที่ใช้ resource เดียวกันไม่รันพร้อมกัน
+        """
+        job = {
+            "kind": kind,
+            "kwargs": kwargs,
+            "username": username,
+            "deadline": deadline if deadline is not None else time.time(),
+            "on_done": on_done,
+            "label": label or kind,
+            "timeout": timeout,
+            "resource": resource,
+            "enqueued_at": time.monotonic(),
+        }
+        with self._lock:
+            heapq.heappush(self._queue, (job["deadline"], next(self._seq), job))
+        self._dispatch()
+
+    def cancel_pending(self):
+        """ยกเลิกงานที่ยังรอคิวทั้งหมด (on_done ของแต่ละงานได้ event "cancelled") คืนจำนวนงานที่ยกเลิก"""
+        with self._lock:
+            pending = [item[2] for item in self._queue]
+            self._queue = []
+            if self._recheck_timer is not None:
+                self._recheck_timer.cancel()
+                self._recheck_timer = None
+        for job in pending:
+            if job["on_done"] is not None:
+                try:
+                    job["on_done"]({"type": "done", "job_id": None, "ok": False, "reason": "cancelled", "error": "ยกเลิกขณะรอคิว", "label": job["label"]})
+                except Exception as e:
+                    self._log(f"⚠️ คิวการจอง: on_done ของงาน '{job['label']}' ผิดพลาด: {e}")
+        return len(pending)
+
+    def stats(self):
+        with self._lock:
+            return {"running": self._running, "queued": len(self._queue), "by_user": dict(self._running_by_user),
+                    "resources": sorted(self._busy_resources)}
+
+    def _machine_has_room(self):
+        if self._running >= self.max_concurrent:
+            return False, f"ครบ {self.max_concurrent} เบราว์เซอร์"
+        if self._running == 0:
+            # ให้มีงานทำได้อย่างน้อยหนึ่งงานเสมอ แม้หน่วยความจำจะเหลือน้อย
+            return True, None
+        free_mb = available_memory_mb()
+        if free_mb is not None and free_mb - self.memory_reserve_mb < self.memory_per_browser_mb:
+            return False, f"หน่วยความจำเหลือ {free_mb:.0f} MB"
+        return True, None
+
+    def _dispatch(self):
+        to_start = []
+        blocked_reason = None
+        with self._lock:
+            deferred = []
+            while self._queue:
+                has_room, reason = self._machine_has_room()
+                if not has_room:
+                    blocked_reason = reason
+                    break
+                item = heapq.heappop(self._queue)
+                job = item[2]
+                limit = self._max_profiles_for(job["username"])
+                if self._running_by_user.get(job["username"], 0) >= limit:
+                    # ผู้ใช้นี้เปิดครบ max_profiles แล้ว ข้ามไปงานของผู้ใช้อื่นก่อน
+                    deferred.append(item)
+                    continue
+                if job["resource"] is not None and job["resource"] in self._busy_resources:
+                    # โปรไฟล์นี้มีงานอื่นใช้อยู่ รอจนงานนั้นจบ
+                    deferred.append(item)
+                    continue
+                if job["resource"] is not None:
+                    self._busy_resources.add(job["resource"])
+                self._running += 1
+                self._running_by_user[job["username"]] = self._running_by_user.get(job["username"], 0) + 1
+                to_start.append(job)
+            for item in deferred:
+                heapq.heappush(self._queue, item)
+            queued = len(self._queue)
+            if queued and blocked_reason and self._recheck_timer is None:
+                # หน่วยความจำอาจว่างขึ้นโดยไม่มีงานไหนจบ จึงตรวจคิวซ้ำเป็นระยะ
+                self._recheck_timer = threading.Timer(_RECHECK_SECONDS, self._recheck)
+                self._recheck_timer.daemon = True
+                self._recheck_timer.start()
+
+        for job in to_start:
+            self._start(job)
+        if blocked_reason and queued and not to_start:
+            self._log(f"⏳ คิวการจอง: รอ {queued} งาน ({blocked_reason})")
+
+    def _recheck(self):
+        with self._lock:
+            self._recheck_timer = None
+        self._dispatch()
+
+    def _start(self, job):
+        wait_s = time.monotonic() - job["enqueued_at"]
+        if wait_s >= 0.5:
+            self._log(f"⏳ งาน '{job['label']}' รอคิว {wait_s:.1f} วินาที")
+
+        def on_done(event):
+            event["queue_wait_s"] = round(wait_s, 2)
+            with self._lock:
+                self._running -= 1
+                remaining = self._running_by_user.get(job["username"], 1) - 1
+                if remaining > 0:
+                    self._running_by_user[job["username"]] = remaining
+                else:
+                    self._running_by_user.pop(job["username"], None)
+                self._busy_resources.discard(job["resource"])
+            try:
+                if job["on_done"] is not None:
+                    job["on_done"](event)
+            finally:
+                self._dispatch()
+
+        kwargs = {"on_done": on_done, "label": job["label"]}
+        if job["timeout"] is not None:
+            kwargs["timeout"] = job["timeout"]
+        try:
+            self.pool.submit(job["kind"], job["kwargs"], **kwargs)
+        except Exception as e:
+            on_done({"type": "done", "job_id": None, "ok": False, "reason": "failed", "error": str(e), "label": job["label"]})
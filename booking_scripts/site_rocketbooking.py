@@ -1,42 +1,48 @@
+import asyncio
 import time
-from playwright.sync_api import Page, TimeoutError
-import json
-from pathlib import Path
-import shutil
+from playwright.async_api import Page, TimeoutError
 
-# CONFIG_PATH (ยังคงเหมือนเดิม)
-CONFIG_PATH = Path("booking_elements/rocketbooking.json")
+from adaptive_timeouts import adaptive
+from flow_engine import run_site_flow
+from selector_chains import find_present, wait_for_any
+from site_plans import MOCK_BASE_URL, load_site_plan
+from tracing import span
+
+SITE_NAME = "rocketbooking"
+BOOKING_URL = f"{MOCK_BASE_URL}/booking" if MOCK_BASE_URL else "https://popmartth.rocket-booking.app/booking"
 
 def load_config():
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
-        full_config = json.load(f)
-        return full_config.get("selectors", {})
+    """คืน selectors ของ rocketbooking (โหลดจากไฟล์ JSON ครั้งเดียวผ่าน flow_engine)"""
+    return load_site_plan(SITE_NAME)["selectors"]
 
-def wait_for_captcha_and_confirm(page: Page, config):
+async def wait_for_captcha_and_confirm(page: Page, config):
     # โค้ดส่วนนี้ยังคงเดิม
     captcha_form_selector = config.get("captcha_form_selector")
     captcha_begin_button = config.get("captcha_begin_button")
     captcha_confirm_button = config.get("captcha_confirm_button")
 
-    if captcha_form_selector and page.query_selector(captcha_form_selector):
+    if not (captcha_form_selector and await find_present(page, "captcha_form_selector", captcha_form_selector)):
+        return
+
+    with span("captcha", category="human"):
         print("⚠️ พบ CAPTCHA Form")
-        if page.query_selector(captcha_begin_button):
+        if await find_present(page, "captcha_begin_button", captcha_begin_button):
             print("กรุณากดปุ่ม Begin CAPTCHA เพื่อดำเนินการต่อ...")
-            while page.query_selector(captcha_begin_button):
-                time.sleep(1)
+            while await find_present(page, "captcha_begin_button", captcha_begin_button):
+                await asyncio.sleep(1)
             print("ปุ่ม Begin ถูกกดแล้ว กำลังรอ CAPTCHA ผ่าน...")
 
-        if page.query_selector(captcha_confirm_button):
+        if await find_present(page, "captcha_confirm_button", captcha_confirm_button):
             print("กรุณากดปุ่ม Confirm CAPTCHA เพื่อดำเนินการต่อ...")
-            while page.query_selector(captcha_confirm_button):
-                time.sleep(1)
+            while await find_present(page, "captcha_confirm_button", captcha_confirm_button):
+                await asyncio.sleep(1)
             print("ปุ่ม Confirm CAPTCHA ถูกกดแล้ว")
 
-        while page.query_selector(captcha_form_selector):
-            time.sleep(1)
+        while await find_present(page, "captcha_form_selector", captcha_form_selector):
+            await asyncio.sleep(1)
         print("✅ CAPTCHA ผ่านแล้ว")
 
-def perform_line_login(page: Page, config, line_email: str, line_password: str):
+async def perform_line_login(page: Page, config, line_email: str, line_password: str):
     # โค้ดส่วนนี้ยังคงเดิม ไม่ได้มีการเปลี่ยนแปลงตามคำขอปัจจุบัน
     profile_button_selector = config.get("profile_button")
     line_connect_button_initial = config.get("line_connect_button_initial")
@@ -53,18 +59,26 @@ def perform_line_login(page: Page, config, line_email: str, line_password: str):
         return False
 
     print("กำลังมองหาปุ่ม 'Connect' แรกสุด...")
+    # timeout ทุกจุดมาจาก adaptive_timeouts (ประวัติเวลาที่ใช้จริง), ตัวเลขที่ส่งไปคือค่าเริ่มต้นเมื่อยังไม่มีประวัติ
     try:
-        page.locator(line_connect_button_initial).click(timeout=20000) 
+        with adaptive("line_connect_button", 20000) as timeout:
+            connect_button = await wait_for_any(page, "line_connect_button_initial", line_connect_button_initial, timeout=timeout)
+        with adaptive("click", 5000) as timeout:
+            await connect_button.click(timeout=timeout)
         print("Clicked initial 'Connect' button.")
-        page.wait_for_load_state("domcontentloaded", timeout=5000)
-        page.wait_for_timeout(1000)
+        with adaptive("line_connect_load", 5000) as timeout:
+            await page.wait_for_load_state("domcontentloaded", timeout=timeout)
+        await page.wait_for_timeout(1000)
     except TimeoutError:
-        print("⚠️ ไม่พบปุ่ม 'Connect' (เริ่มต้น) หรือไม่สามารถคลิกได้ภายใน 20 วินาที. ดำเนินการต่อเพื่อหาปุ่มถัดไป.")
+        print("⚠️ ไม่พบปุ่ม 'Connect' (เริ่มต้น) หรือไม่สามารถคลิกได้ภายในเวลาที่กำหนด. ดำเนินการต่อเพื่อหาปุ่มถัดไป.")
         pass
 
     print("กำลังมองหาปุ่ม 'Connect LINE Account*'...")
     try:
-        page.locator(line_connect_account_button).click(timeout=20000) 
+        with adaptive("line_connect_account_button", 20000) as timeout:
+            account_button = await wait_for_any(page, "line_connect_account_button", line_connect_account_button, timeout=timeout)
+        with adaptive("click", 5000) as timeout:
+            await account_button.click(timeout=timeout)
         print("Clicked 'Connect LINE Account*' button.")
     except TimeoutError:
         print("❌ ไม่พบปุ่ม 'Connect LINE Account*' หรือปุ่มไม่พร้อมใช้งาน. ไม่สามารถดำเนินการเชื่อมต่อ LINE ได้.")
@@ -72,7 +86,8 @@ def perform_line_login(page: Page, config, line_email: str, line_password: str):
 
     print("รอหน้า LINE Login โหลด...")
     try:
-        page.wait_for_selector(line_login_email_field, state="visible", timeout=30000)
+        with adaptive("line_login_page", 30000) as timeout:
+            email_field = await wait_for_any(page, "line_login_email_field", line_login_email_field, timeout=timeout)
         print("หน้า LINE Login โหลดแล้ว.")
     except TimeoutError:
         print("❌ หน้า LINE Login ไม่โหลดขึ้นมาภายในเวลาที่กำหนด. ไม่สามารถดำเนินการต่อได้.")
@@ -80,37 +95,50 @@ def perform_line_login(page: Page, config, line_email: str, line_password: str):
 
     if line_email and line_password:
         print("กำลังกรอกข้อมูล LINE Login อัตโนมัติ...")
-        page.fill(line_login_email_field, line_email)
+        await email_field.fill(line_email)
         print(f"กรอก Email: {line_email}")
 
-        page.fill(line_login_password_field, line_password)
+        with adaptive("line_login_field", 10000) as timeout:
+            password_field = await wait_for_any(page, "line_login_password_field", line_login_password_field, timeout=timeout)
+        await password_field.fill(line_password)
         print("กรอก Password แล้ว.")
 
-        page.click(line_login_button)
+        with adaptive("line_login_field", 10000) as timeout:
+            login_button = await wait_for_any(page, "line_login_button", line_login_button, timeout=timeout)
+        await login_button.click()
         print("คลิกปุ่ม Login แล้ว.")
     else:
         print("❌ ไม่พบ Email หรือ Password สำหรับ LINE Login ใน config_line_user.json. จะต้องดำเนินการด้วยตนเอง.")
-        input("กรุณาทำการล็อกอิน LINE ในหน้าเว็บที่เปิดขึ้น (ด้วยตนเอง) และกด Enter เพื่อดำเนินการต่อ: ")
+        with span("line_manual_login", category="human"):
+            await asyncio.to_thread(input, "กรุณาทำการล็อกอิน LINE ในหน้าเว็บที่เปิดขึ้น (ด้วยตนเอง) และกด Enter เพื่อดำเนินการต่อ: ")
     
-    print("รอการเปลี่ยนหน้าหลังจาก Login LINE (สูงสุด 60 วินาที)...")
     try:
-        page.wait_for_load_state("networkidle", timeout=60000) 
+        with adaptive("line_login_redirect", 60000) as timeout:
+            print(f"รอการเปลี่ยนหน้าหลังจาก Login LINE (สูงสุด {timeout / 1000:.0f} วินาที)...")
+            await page.wait_for_load_state("networkidle", timeout=timeout)
         
-        if line_verification_code_text and page.query_selector(line_verification_code_text):
-            code = page.text_content(line_verification_code_text)
+        code_text = await find_present(page, "line_verification_code_text", line_verification_code_text)
+        if code_text is not None:
+            code = await code_text.text_content()
             print(f"⚠️ พบหน้ายืนยันรหัส LINE: โปรดยืนยันรหัสนี้ ({code}) บนมือถือของคุณ")
-            input("หลังจากยืนยันในมือถือแล้ว กด Enter เพื่อดำเนินการต่อ...")
-            page.wait_for_load_state("networkidle", timeout=60000)
+            with span("line_verification", category="human"):
+                await asyncio.to_thread(input, "หลังจากยืนยันในมือถือแล้ว กด Enter เพื่อดำเนินการต่อ...")
+            with adaptive("line_login_redirect", 60000) as timeout:
+                await page.wait_for_load_state("networkidle", timeout=timeout)
         
         print("คลิกปุ่ม Profile อีกครั้งเพื่อรีเฟรชสถานะ LINE Login...")
         try:
-            page.locator(profile_button_selector).click(timeout=5000)
-            page.wait_for_load_state("networkidle", timeout=10000) 
+            with adaptive("profile_button_refresh", 5000) as timeout:
+                refresh_button = await wait_for_any(page, "profile_button", profile_button_selector, timeout=timeout)
+            with adaptive("click", 5000) as timeout:
+                await refresh_button.click(timeout=timeout)
+            with adaptive("profile_refresh_idle", 10000) as timeout:
+                await page.wait_for_load_state("networkidle", timeout=timeout)
         except TimeoutError:
             print("⚠️ ไม่สามารถคลิกปุ่ม Profile อีกครั้งเพื่อยืนยัน LINE Login ได้")
             return False 
 
-        if page.query_selector(line_connect_button_initial) is None:
+        if await find_present(page, "line_connect_button_initial", line_connect_button_initial) is None:
             print("✅ กระบวนการ Login LINE อัตโนมัติเสร็จสมบูรณ์และยืนยันแล้ว.")
             return True
         else:
@@ -125,7 +153,7 @@ def perform_line_login(page: Page, config, line_email: str, line_password: str):
         return False
 
 
-def check_line_login(page: Page, config, line_email: str = None, line_password: str = None):
+async def check_line_login(page: Page, config, line_email: str = None, line_password: str = None):
     # โค้ดส่วนนี้ยังคงเหมือนเดิม
     profile_button_selector = config.get("profile_button")
     line_connect_button_initial = config.get("line_connect_button_initial")
@@ -138,25 +166,30 @@ def check_line_login(page: Page, config, line_email: str = None, line_password:
 
     print("รอหน้าหลักโหลดให้พร้อมก่อนคลิกปุ่ม Profile...")
     try:
-        page.wait_for_url("https://popmartth.rocket-booking.app/booking", timeout=30000)
-        page.wait_for_load_state("networkidle", timeout=20000) 
-        page.locator(profile_button_selector).wait_for(state="visible", timeout=10000) 
+        with adaptive("booking_url", 30000) as timeout:
+            await page.wait_for_url(BOOKING_URL, timeout=timeout)
+        with adaptive("booking_idle", 20000) as timeout:
+            await page.wait_for_load_state("networkidle", timeout=timeout)
+        with adaptive("profile_button", 10000) as timeout:
+            profile_button = await wait_for_any(page, "profile_button", profile_button_selector, timeout=timeout)
         print("หน้าหลักโหลดพร้อมและปุ่ม Profile ปรากฏ.")
     except TimeoutError:
         print("❌ หน้าหลักโหลดไม่ทันเวลา หรือปุ่ม Profile ไม่ปรากฏหลังจากโหลด.")
         return False
 
     try:
-        page.click(profile_button_selector)
+        await profile_button.click()
         print("Clicked Profile button.")
         
         print("รอการแสดงผลสถานะ LINE Login บนหน้าโปรไฟล์...")
         try:
-            page.wait_for_selector(line_connect_button_initial, state="visible", timeout=15000) 
+            # ไม่พบปุ่มภายในเวลาที่กำหนด = ล็อกอินแล้ว (ผลปกติ จึงไม่นับว่าเว็บช้า)
+            with adaptive("line_connect_probe", 15000, expect_absent=True) as timeout:
+                await wait_for_any(page, "line_connect_button_initial", line_connect_button_initial, timeout=timeout)
             
             print("❌ ยังไม่ได้เชื่อมต่อบัญชี LINE. กำลังเริ่มกระบวนการล็อกอิน LINE...")
             
-            login_successful = perform_line_login(page, config, line_email, line_password)
+            login_successful = await perform_line_login(page, config, line_email, line_password)
             
             return login_successful 
         
@@ -168,211 +201,71 @@ def check_line_login(page: Page, config, line_email: str = None, line_password:
         print("❌ ปุ่ม Profile ไม่ปรากฏให้คลิกหลังจากหน้าโหลด, ไม่สามารถตรวจสอบ LINE Login ได้")
         return False
 
-# --- ฟังก์ชัน check_for_events ที่ปรับปรุงใหม่โดยใช้ปุ่ม Register เป็นตัวหลัก ---
-def check_for_events(page: Page, config):
+async def verify_session(page: Page, config):
     """
-    ตรวจสอบว่ามี Event ให้จองหรือไม่ โดยอ้างอิงจากปุ่ม Register
-    และข้อความ 'ไม่มีอีเว้นต์ในขณะนี้' เป็นตัวสำรอง
+    ตรวจเร็ว ๆ ว่า session ที่ใส่ไปยังล็อกอิน LINE อยู่จริง (ก่อนข้าม check_line_login ที่ต้องรอปุ่ม Connect จนหมดเวลา)
+    เปิดหน้า Profile แล้วดูทันทีโดยไม่รอว่าไม่มีปุ่ม Connect คืน False ถ้าไม่แน่ใจ (ให้ตรวจแบบเต็มแทน)
     """
-    register_button_selector = config.get("register_button")
-    no_event_text_selector = config.get("no_event_text_selector") # เช่น "ไม่มีอีเว้นต์ในขณะนี้"
-
-    print("กำลังตรวจสอบ Event ที่มีให้จอง...")
-
-    # Step 1: ตรวจสอบว่าปุ่ม Register ปรากฏหรือไม่
     try:
-        # Playwright จะรอให้ปุ่ม Register มองเห็นได้และพร้อมคลิก
-        page.locator(register_button_selector).wait_for(state="visible", timeout=10000) 
-        print("✅ พบปุ่ม 'Register'. มี Event ให้จอง.")
-        return True
+        with adaptive("session_verify_profile", 10000) as timeout:
+            profile_button = await wait_for_any(page, "profile_button", config.get("profile_button"), timeout=timeout)
+            await profile_button.click(timeout=timeout)
+        with adaptive("session_verify_idle", 10000) as timeout:
+            await page.wait_for_url("**/profile", timeout=timeout)
+            await page.wait_for_load_state("networkidle", timeout=timeout)
     except TimeoutError:
-        # ถ้าไม่พบปุ่ม Register ภายในเวลาที่กำหนด
-        print(f"ไม่พบปุ่ม 'Register' ({register_button_selector}) ภายในเวลาที่กำหนด. กำลังตรวจสอบข้อความ 'ไม่มีอีเว้นต์'.")
-        
-        # Step 2: ตรวจสอบข้อความ "ไม่มีอีเว้นต์ในขณะนี้"
-        try:
-            # ใช้ text= ใน selector เพื่อหาข้อความที่ตรงกัน
-            page.wait_for_selector(f"text={no_event_text_selector}", state="visible", timeout=5000) 
-            print(f"❌ ไม่พบ Event ให้จอง: พบข้อความ '{no_event_text_selector}'.")
-            return False
-        except TimeoutError:
-            print("❌ ไม่พบ Event ให้จอง: ไม่พบปุ่ม 'Register' และไม่พบข้อความแจ้งว่าไม่มีกิจกรรม.")
-            return False
-    except Exception as e:
-        print(f"❌ เกิดข้อผิดพลาดในการตรวจสอบ Event: {e}")
         return False
+    return await find_present(page, "line_connect_button_initial", config.get("line_connect_button_initial")) is None
 
+async def prepare_booking(page: Page, config, line_email: str = None, line_password: str = None, skip_login_check: bool = False, timings: dict = None):
+    """
+    ขั้นเตรียมตัวก่อนถึงเวลาจอง: ผ่าน CAPTCHA และตรวจสอบการล็อกอิน LINE
+    แยกออกมาเพื่อให้ Scheduler ทำล่วงหน้า (pre-warm) ได้
+    skip_login_check: ข้ามการตรวจ LINE login แบบเต็ม (เมื่อใช้ session ที่บันทึกไว้และยังใหม่อยู่) เหลือแค่ verify_session
+    timings: ถ้าส่ง dict มา จะใส่ login_check_ms (เวลาที่ใช้ตรวจ LINE login)
+             และ session_rejected = True ถ้า verify_session ไม่ผ่านจนต้องตรวจแบบเต็ม
+    """
+    await wait_for_captcha_and_confirm(page, config)
 
-def booking(page: Page, branch: str, selected_day: int, selected_time_str: str, line_email: str = None, line_password: str = None):
-    config = load_config()
-
-    wait_for_captcha_and_confirm(page, config)
-
-    if not check_line_login(page, config, line_email, line_password):
+    if skip_login_check:
+        with span("verify_session") as verify_attrs:
+            verified = await verify_session(page, config)
+            verify_attrs["ok"] = verified
+        if verified:
+            return True
+        print("🔑 ยืนยัน session ที่บันทึกไว้บนหน้า Profile ไม่ผ่าน, ตรวจ LINE login ตามปกติ")
+        if timings is not None:
+            timings["session_rejected"] = True
+        # check_line_login เริ่มจากหน้า Booking
+        await page.goto(BOOKING_URL)
+
+    started = time.perf_counter()
+    with span("check_line_login"):
+        logged_in = await check_line_login(page, config, line_email, line_password)
+    if timings is not None:
+        timings["login_check_ms"] = (time.perf_counter() - started) * 1000
+    if not logged_in:
         print("❌ การล็อกอิน LINE ไม่สำเร็จ หรือผู้ใช้ไม่ได้ดำเนินการต่อ. การจองถูกยกเลิก.")
-        return
-    
-    # --- คลิกปุ่ม "Booking" เพื่อไปยังหน้า Event ---
-    booking_page_button_selector = config.get("booking_page_button")
-    if booking_page_button_selector:
-        print("กำลังคลิกปุ่ม 'Booking' เพื่อไปยังหน้า Event...")
-        try:
-            page.locator(booking_page_button_selector).click(timeout=10000)
-            print("Clicked 'Booking' button.")
-            page.wait_for_load_state("networkidle", timeout=15000) # รอให้หน้า Event โหลด
-        except TimeoutError:
-            print("❌ ไม่พบปุ่ม 'Booking' หรือไม่สามารถคลิกได้. ไม่สามารถดำเนินการจองต่อได้.")
-            return
-        except Exception as e:
-            print(f"❌ เกิดข้อผิดพลาดในการคลิกปุ่ม 'Booking': {e}")
-            return
-    else:
-        print("⚠️ ไม่พบ Selector สำหรับปุ่ม 'Booking' ใน config. ข้ามการคลิกปุ่ม 'Booking'.")
-
-    # --- เรียกใช้ check_for_events หลังจากคลิกปุ่ม "Booking" ---
-    if not check_for_events(page, config):
-        print("⚠️ ไม่มี Event ให้จองในขณะนี้. บอทจะปิดการทำงาน.")
-        return # ปิดการทำงานของบอทหากไม่มี Event
-
-    # --- ส่วนนี้จะถูกย้ายขึ้นไปตรวจสอบใน check_for_events แล้ว ---
-    # กดปุ่ม Register
-    register_selector = config.get("register_button")
-    if register_selector and page.query_selector(register_selector):
-        page.click(register_selector)
-        print("Clicked Register button")
-    # else: ถ้าไม่เจอ register_button ตรงนี้อาจจะหมายถึงไม่มี event ให้จองจริงๆ ก็ควร return ไปแล้ว
-    # จึงไม่ต้องมี else นี้
-
-    try:
-        page.wait_for_load_state("networkidle", timeout=10000)
-    except TimeoutError:
-        print("⚠️ โหลดหน้า Register ไม่ทันเวลา, อาจมีปัญหา")
-    wait_for_captcha_and_confirm(page, config)
-
-    # ... โค้ดส่วนที่เหลือของการจอง ...
-    # (Select สาขา, วัน, เวลา และ Confirm จะอยู่ตรงนี้)
-    # ลอจิกการคลิกปุ่ม Register ที่เคยอยู่ด้านบนถูกย้ายไปใน check_for_events แล้ว
-    # ดังนั้นควรลบออก หรือปรับเปลี่ยนถ้าต้องการให้คลิกอีกครั้งหลังเลือก Event
-    # แต่โดยทั่วไป, การคลิก Register เพื่อเข้าสู่ flow การจองจะทำแค่ครั้งเดียว
-
-    # เลือกสาขา (branch)
-    branch_list_selector = config.get("branch_list")
-    branch_buttons_selector = config.get("branch_buttons")
-    if branch_list_selector and branch_buttons_selector:
-        page.wait_for_selector(branch_list_selector, state="visible", timeout=15000)
-        branch_buttons = page.query_selector_all(f"{branch_buttons_selector} > button")
-        selected_branch_index = None
-        for idx, btn in enumerate(branch_buttons):
-            btn_text = btn.inner_text().strip()
-            if btn_text == branch:
-                selected_branch_index = idx + 1
-                break
-
-        if selected_branch_index is None:
-            print(f"❌ ไม่พบสาขาที่เลือก: {branch}, เลือกสาขาแรกแทน")
-            selected_branch_index = 1
-
-        branch_button_selector = f"{branch_buttons_selector} > button:nth-child({selected_branch_index})"
-        page.click(branch_button_selector)
-        print(f"Selected branch: {branch} (button #{selected_branch_index})")
-
-    try:
-        page.wait_for_load_state("networkidle", timeout=10000)
-    except TimeoutError:
-        print("⚠️ โหลดหน้าหลังเลือกสาขาไม่ทันเวลา, อาจมีปัญหา")
-    wait_for_captcha_and_confirm(page, config)
-
-    # กด Next หลังเลือก branch
-    branch_next_button = config.get("branch_next_button")
-    if branch_next_button and page.query_selector(branch_next_button):
-        page.click(branch_next_button)
-        print("Clicked Next button after branch selection")
-
-    try:
-        page.wait_for_load_state("networkidle", timeout=10000)
-    except TimeoutError:
-        print("⚠️ โหลดหน้าหลังกด Next สาขาไม่ทันเวลา, อาจมีปัญหา")
-    wait_for_captcha_and_confirm(page, config)
-
-    # เลือกวัน booking
-    calendar_grid_selector = config.get("calendar_grid")
-    if calendar_grid_selector:
-        page.wait_for_selector(calendar_grid_selector, state="visible", timeout=15000)
-        day_buttons = page.query_selector_all(f"{calendar_grid_selector} > button.day-cell")
-
-        selected_day_button = None
-        for btn in day_buttons:
-            if btn.inner_text().strip() == str(selected_day):
-                selected_day_button = btn
-                break
-
-        if selected_day_button:
-            selected_day_button.click()
-            print(f"Selected day: {selected_day}")
-        else:
-            print(f"❌ ไม่พบวันที่ {selected_day} ในปฏิทิน")
-            return
-
-    try:
-        page.wait_for_load_state("networkidle", timeout=10000)
-    except TimeoutError:
-        print("⚠️ โหลดหน้าหลังเลือกวันไม่ทันเวลา, อาจมีปัญหา")
-    wait_for_captcha_and_confirm(page, config)
-
-    # เลือกเวลา booking
-    time_buttons_selector = config.get("time_buttons_selector")
-    if time_buttons_selector:
-        page.wait_for_selector(time_buttons_selector, state="visible", timeout=15000)
-        time_buttons = page.query_selector_all(time_buttons_selector + " > button")
-
-        selected_time_index = None
-        for idx, btn in enumerate(time_buttons, start=1):
-            if btn.inner_text().strip() == selected_time_str:
-                selected_time_index = idx
-                break
-
-        if selected_time_index is None:
-            print(f"❌ ไม่พบเวลาที่เลือก: {selected_time_str}, เลือกเวลาแรกแทน")
-            selected_time_index = 1
-
-        time_selector = f"{time_buttons_selector} > button:nth-child({selected_time_index})"
-        page.click(time_selector)
-        print(f"Selected time: {selected_time_str} (button #{selected_time_index})")
+        return False
+    return True
 
-    try:
-        page.wait_for_load_state("networkidle", timeout=10000)
-    except TimeoutError:
-        print("⚠️ โหลดหน้าหลังเลือกเวลาไม่ทันเวลา, อาจมีปัญหา")
-    wait_for_captcha_and_confirm(page, config)
 
-    # กด Next หลังเลือกวันและเวลา
-    datetime_next_button = config.get("datetime_next_button")
-    if datetime_next_button and page.query_selector(datetime_next_button):
-        page.click(datetime_next_button)
-        print("Clicked Next button after date/time selection")
+async def booking(page: Page, branch: str, selected_day: int, selected_time_str: str, line_email: str = None, line_password: str = None):
+    config = load_config()
 
-    try:
-        page.wait_for_load_state("networkidle", timeout=10000)
-    except TimeoutError:
-        print("⚠️ โหลดหน้าหลังกด Next วัน/เวลาไม่ทันเวลา, อาจมีปัญหา")
-    wait_for_captcha_and_confirm(page, config)
+    if not await prepare_booking(page, config, line_email, line_password):
+        return
 
-    # ติ๊ก Checkbox
-    checkbox_selector = config.get("checkbox")
-    if checkbox_selector and page.query_selector(checkbox_selector):
-        page.check(checkbox_selector)
-        print("Checked confirmation checkbox")
+    await run_booking_steps(page, config, branch, selected_day, selected_time_str)
 
-    try:
-        page.wait_for_load_state("networkidle", timeout=10000)
-    except TimeoutError:
-        print("⚠️ โหลดหน้าหลังติ๊ก Checkbox ไม่ทันเวลา, อาจมีปัญหา")
-    wait_for_captcha_and_confirm(page, config)
 
-    # กด Confirm Booking
-    confirm_button_selector = config.get("confirm_button")
-    if confirm_button_selector and page.query_selector(confirm_button_selector):
-        page.click(confirm_button_selector)
-        print("Clicked Confirm Booking button")
+async def run_booking_steps(page: Page, config, branch: str, selected_day: int, selected_time_str: str, checkpoint: dict = None):
+    """
+    ขั้นตอนจองจริง (หลังเตรียมตัวแล้ว): Booking → Event → Register → สาขา → วัน → เวลา → Confirm
+    ลำดับขั้นตอน, readiness และนโยบายลองใหม่ (retry/anchor) อยู่ใน booking_elements/rocketbooking.json
+    checkpoint: dict จาก flow_engine.new_checkpoint() สำหรับอ่านจำนวนครั้งที่ลองใหม่หลังจบ
+    """
+    async def check_captcha():
+        await wait_for_captcha_and_confirm(page, config)
 
-    print("✅ จองสำเร็จ")
\ No newline at end of file
+    return await run_site_flow(page, SITE_NAME, branch, selected_day, selected_time_str, after_step=check_captcha, checkpoint=checkpoint)
@@ -0,0 +1,195 @@
+import datetime
+import time
+
+from booking_executor import BookingExecutor
+from job_store import JobStore
+from precise_scheduler import PreciseScheduler
+from worker_pool import WorkerPool, DEFAULT_TIMEOUT_SECONDS
+
+# ส่วนกลางของการจองที่ GUI (gui_app.py) และโหมด daemon (booking_daemon.py) ใช้ร่วมกัน
+# job_store -> PreciseScheduler -> BookingExecutor -> WorkerPool เส้นทางเดียวกันทุกโหมด
+
+# เวลาที่ Scheduler จะเปิดเบราว์เซอร์และเตรียมหน้าเว็บล่วงหน้าก่อนถึงเวลาจอง (วินาที, 0 = ปิด pre-warm)
+DEFAULT_PREWARM_LEAD_SECONDS = 60
+
+_FAILURE_REASONS = {"crashed": "worker หยุดทำงานกะทันหัน", "timeout": "เกินเวลา", "cancelled": "ถูกยกเลิก"}
+# reason ของ event "done" -> status ในประวัติการรัน (reason อื่นใช้ชื่อเดียวกัน)
+_RUN_STATUSES = {"unsuccessful": "failed", "failed": "error", "crashed": "error"}
+
+
+def describe_failure(event):
+    """คืน (status สำหรับประวัติการรัน, ข้อความ error) จาก event "done" ที่ไม่สำเร็จ"""
+    reason = _FAILURE_REASONS.get(event["reason"])
+    error = f"{reason}: {event.get('error')}" if reason else event.get("error")
+    return _RUN_STATUSES.get(event["reason"], event["reason"]), error
+
+
+class BookingService:
+    """
+    times: รายการเวลาจาก branch/time.json (แปลง time_str เป็น time_index)
+    max_profiles_for(username): จำนวนเบราว์เซอร์ที่ผู้ใช้เปิดพร้อมกันได้
+    line_credentials_for(username, profile_name): คืน (line_email, line_password)
+    on_worker_event(event): event log/progress/prompt ของ worker (ดู worker_pool.py)
+    """
+
+    def __init__(self, times, max_profiles_for, line_credentials_for, log=print, on_worker_event=None,
+                 schedule_json_path=None, job_store=None):
+        self.times = times
+        self._line_credentials_for = line_credentials_for
+        self._log = log
+        # รายการจองที่ตั้งเวลาไว้เก็บใน SQLite (ดู job_store.py), schedule_config.json เดิมจะถูก import ครั้งแรกครั้งเดียว
+        self.job_store = job_store or JobStore()
+        if schedule_json_path is not None:
+            self.job_store.import_schedule_json(schedule_json_path)
+        # Scheduler (งานครั้งเดียวตามวันเวลาที่แน่นอน ดู precise_scheduler.py)
+        self.scheduler = PreciseScheduler(log=log)
+        # การจองแต่ละครั้งรันใน worker process แยก (log/progress ส่งกลับมาเป็น event)
+        self.worker_pool = WorkerPool(on_event=on_worker_event)
+        # คิวหน้า worker pool: จำกัดตาม max_profiles ของผู้ใช้และหน่วยความจำของเครื่อง, งานที่ถึงเวลาก่อนได้ก่อน
+        self.executor = BookingExecutor(self.worker_pool, max_profiles_for, log=log)
+
+    def prewarm_lead_seconds(self):
+        try:
+            return max(0, int(self.job_store.get_setting("prewarm_lead_seconds", DEFAULT_PREWARM_LEAD_SECONDS)))
+        except (TypeError, ValueError):
+            return DEFAULT_PREWARM_LEAD_SECONDS
+
+    def submit_live(self, username, browser, profile_name, branch, day, time_str, fire_at=None, on_done=None):
+        """
+        ส่งงานจองเข้า worker process โดยไม่บล็อก thread ที่เรียก
+        ถ้าระบุ fire_at (epoch seconds) จะ pre-warm เบราว์เซอร์ก่อนแล้วเริ่มจองตรงเวลา fire_at
+        """
+        day = int(day)
+        time_index = self.times.index(time_str) if time_str in self.times else 0
+        line_email, line_password = self._line_credentials_for(username, profile_name)
+
+        self._log(f"Selected: User='{username}', Browser='{browser}', Profile='{profile_name}', Branch='{branch}', Day={day}, Time='{time_str}'")
+
+        kwargs = {
+            "username": username, "browser": browser, "profile_name": profile_name,
+            "branch": branch, "day": day, "time_index": time_index,
+            "line_email": line_email, "line_password": line_password,
+        }
+        timeout = DEFAULT_TIMEOUT_SECONDS
+        if fire_at is not None:
+            kwargs["fire_at"] = fire_at
+            # เวลารอ pre-warm จนถึงเวลาจองไม่นับรวมใน timeout
+            timeout += max(0.0, fire_at - time.time())
+        self.executor.submit(
+            "live_prewarmed" if fire_at is not None else "live",
+            kwargs,
+            username=username,
+            deadline=fire_at,
+            timeout=timeout,
+            label=f"{username} - {browser} - {profile_name}",
+            on_done=on_done,
+            resource=f"{browser}/{profile_name}",
+        )
+
+    def run_job(self, job, fire_at=None, on_done=None):
+        """รันรายการจองจาก job_store พร้อมบันทึกประวัติการรัน, on_done(event, success) เรียกหลังบันทึกผลแล้ว"""
+        run_id = self.job_store.start_run(job, job['schedule_time'])
+
+        def finished(event):
+            if event["ok"]:
+                self.finish_run(run_id, "success")
+                self._log(f"✅ รายการจอง '{job['name']}' เสร็จสิ้น.")
+            else:
+                status, error = describe_failure(event)
+                self.finish_run(run_id, status, error)
+                self._log(f"❌ รายการจอง '{job['name']}' ไม่สำเร็จ [#{event['job_id']}]: {error}")
+            if on_done is not None:
+                on_done(event, event["ok"])
+
+        try:
+            self.submit_live(job['username'], job['browser'], job['profile_name'], job['branch'], job['day'], job['time_str'],
+                             fire_at=fire_at, on_done=finished)
+        except Exception as e:
+            self._log(f"❌ เกิดข้อผิดพลาดในกระบวนการจอง '{job['name']}': {e}")
+            self.finish_run(run_id, "error", str(e))
+
+    def finish_run(self, run_id, status, message=None):
+        if run_id is None:
+            return
+        try:
+            self.job_store.finish_run(run_id, status, message)
+        except Exception as e:
+            self._log(f"⚠️ บันทึกประวัติการรันไม่สำเร็จ: {e}")
+
+    def schedule_upcoming(self, can_schedule=None, can_run=None, lead_seconds=None, on_done=None):
+        """
+        ตั้งเวลารายการจองที่เปิดใช้งานและยังไม่ถึงเวลาจองทั้งหมด แล้วเริ่ม scheduler
+        can_schedule(job): ตั้งเวลางานนี้หรือไม่ (ตรวจตอนตั้งเวลา)
+        can_run(job): ตรวจสิทธิ์อีกครั้งตอนถึงเวลา, False = ข้ามและบันทึกเป็น skipped
+        คืน dict ชื่องาน -> id ใน scheduler
+        """
+        if lead_seconds is None:
+            lead_seconds = self.prewarm_lead_seconds()
+        lead_seconds = max(0, int(lead_seconds))
+        now = datetime.datetime.now()
+        refs = {}
+        # ดึงเฉพาะงานที่เปิดใช้งานและยังไม่ถึงเวลาจอง (ใช้ index ตามเวลาจอง)
+        for job_data in self.job_store.upcoming_jobs(now.strftime("%Y-%m-%d %H:%M:%S")):
+            if can_schedule is not None and not can_schedule(job_data):
+                continue
+            job_time_str = job_data['schedule_time']
+            job_name = job_data['name']
+            try:
+                scheduled_dt = datetime.datetime.strptime(job_time_str, "%Y-%m-%d %H:%M:%S")
+                if scheduled_dt <= now:
+                    self._log(f"ℹ️ ข้ามรายการจอง '{job_name}' เพราะเลยเวลาจองแล้ว ({job_time_str}).")
+                    continue
+                # ถ้าเหลือเวลาน้อยกว่า lead time ให้เริ่ม pre-warm ทันที
+                trigger_dt = max(now, scheduled_dt - datetime.timedelta(seconds=lead_seconds))
+                refs[job_name] = self.scheduler.schedule_at(trigger_dt, self._fire_job, job_data, lead_seconds, can_run, on_done, name=job_name)
+                self._log(f"✅ ตั้งเวลาจอง '{job_name}' เวลา {scheduled_dt.strftime('%Y-%m-%d %H:%M:%S')} (pre-warm ล่วงหน้า {lead_seconds} วินาที).")
+            except ValueError:
+                self._log(f"❌ รายการจอง '{job_name}' มีรูปแบบเวลา Schedule ไม่ถูกต้อง: {job_time_str}. ข้ามรายการนี้.")
+            except Exception as e:
+                self._log(f"❌ ไม่สามารถตั้งเวลาจอง '{job_name}' ได้: {e}")
+
+        self.scheduler.start()
+        return refs
+
+    def _fire_job(self, job, lead_seconds, can_run, on_done):
+        fire_datetime = datetime.datetime.strptime(job['schedule_time'], "%Y-%m-%d %H:%M:%S")
+        if can_run is not None and not can_run(job):
+            self._log(f"❌ Scheduler: งาน '{job['name']}' ถูกเรียก แต่ถูกข้ามเนื่องจากสิทธิ์ผู้ใช้หรือเกินขีดจำกัดโปรไฟล์.")
+            self.job_store.start_run(job, job['schedule_time'], status="skipped")
+            return
+        if lead_seconds:
+            self._log(f"🔥 Scheduler: กำลัง pre-warm '{job['name']}' ล่วงหน้า {lead_seconds} วินาที (เวลาจอง: {fire_datetime}).")
+            self.run_job(job, fire_at=fire_datetime.timestamp(), on_done=on_done)
+        else:
+            self._log(f"🚀 Scheduler: กำลังเริ่มจอง '{job['name']}' ตามเวลาที่ตั้งไว้ ({fire_datetime}).")
+            self.run_job(job, on_done=on_done)
+
+    def active_jobs(self):
+        """จำนวนงานที่กำลังทำงานและรออยู่ (รวมงานที่ยังอยู่ในคิวของ executor)"""
+        active = self.worker_pool.active_jobs()
+        active["pending"] += self.executor.stats()["queued"]
+        return active
+
+    def wait_idle(self, timeout):
+        """รอจนไม่มีงานเหลือ (หรือครบ timeout วินาที) คืน True ถ้าไม่มีงานเหลือแล้ว"""
+        deadline = time.monotonic() + timeout
+        while True:
+            active = self.active_jobs()
+            if not active["running"] and not active["pending"]:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.2)
+
+    def shutdown(self, grace_seconds=0):
+        """
+        หยุด scheduler แล้วปิดงานจองทั้งหมด
+        grace_seconds: เวลาที่รอให้งานที่ทำอยู่จบเอง ก่อนยกเลิก (งานที่ถูกยกเลิกบันทึกเป็น cancelled)
+        """
+        self.scheduler.stop()
+        if grace_seconds > 0:
+            self.wait_idle(grace_seconds)
+        self.executor.cancel_pending()
+        self.worker_pool.cancel_all()
+        self.wait_idle(5)
+        self.worker_pool.shutdown()
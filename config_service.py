@@ -0,0 +1,133 @@
+import copy
+import json
+import os
+import threading
+from pathlib import Path
+
+# cache กลางของไฟล์ config (JSON) ทั้งโปรแกรม
+# อ่านและ parse แต่ละไฟล์ครั้งเดียว แล้วโหลดใหม่เฉพาะเมื่อ mtime/ขนาดไฟล์เปลี่ยน หรือ watcher แจ้งว่ามีการแก้ไข
+# หมายเหตุ: object ที่ได้จาก load_json เป็นตัวเดียวกับใน cache (ผู้ใช้ร่วมกันทั้งโปรแกรม) ห้ามแก้ไขตรง ๆ
+# ถ้าจะแก้ให้ copy.deepcopy ก่อน แล้ว save_json กลับ (site_plans ใช้ identity ของ object นี้ตัดสินว่าไฟล์เปลี่ยนหรือไม่)
+
+# ความถี่ที่ watcher ตรวจไฟล์ (วินาที)
+DEFAULT_WATCH_INTERVAL = 1.0
+
+_lock = threading.Lock()
+# {path: {"mtime_ns", "size", "data"}}
+_cache = {}
+_stats = {"hits": 0, "misses": 0, "reloads": 0, "invalidations": 0}
+_listeners = []
+_watcher = None
+_watcher_stop = threading.Event()
+
+
+def _key(path):
+    return str(Path(path).resolve())
+
+
+def load_json(path):
+    """
+    คืนข้อมูล JSON ของไฟล์ (จาก cache ถ้าไฟล์ไม่เปลี่ยน)
+    error เหมือน open() + json.load(): FileNotFoundError, json.JSONDecodeError
+    """
+    key = _key(path)
+    st = os.stat(key)
+    with _lock:
+        entry = _cache.get(key)
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            _stats["hits"] += 1
+            return entry["data"]
+        _stats["misses"] += 1
+        if entry:
+            _stats["reloads"] += 1
+
+    with open(key, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    with _lock:
+        _cache[key] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "data": data}
+    return data
+
+
+def save_json(path, data):
+    """เขียนไฟล์ JSON แบบ atomic แล้วอัปเดต cache ด้วยสำเนาของข้อมูลชุดนี้ (ผู้เรียกแก้ data ต่อได้โดยไม่กระทบ cache)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    st = path.stat()
+    with _lock:
+        _cache[_key(path)] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "data": copy.deepcopy(data)}
+
+
+def invalidate(path=None):
+    """ลบไฟล์ออกจาก cache (path=None ลบทั้งหมด)"""
+    with _lock:
+        if path is None:
+            _cache.clear()
+        else:
+            _cache.pop(_key(path), None)
+
+
+def stats():
+    with _lock:
+        return dict(_stats, files=len(_cache))
+
+
+def format_stats():
+    s = stats()
+    total = s["hits"] + s["misses"]
+    hit_rate = s["hits"] / total * 100 if total else 0.0
+    return (f"📊 Config cache: hit {s['hits']}, miss {s['misses']} ({hit_rate:.0f}% hit), "
+            f"reload {s['reloads']}, watcher แจ้งแก้ไข {s['invalidations']}, ไฟล์ใน cache {s['files']}")
+
+
+# --- watcher ---
+
+def add_listener(callback):
+    """callback(path) จะถูกเรียก (จาก thread ของ watcher) เมื่อไฟล์ใน cache ถูกแก้ไขจากภายนอก"""
+    _listeners.append(callback)
+
+
+def _changed_paths():
+    with _lock:
+        snapshot = {key: (entry["mtime_ns"], entry["size"]) for key, entry in _cache.items()}
+    changed = []
+    for key, (mtime_ns, size) in snapshot.items():
+        try:
+            st = os.stat(key)
+        except OSError:
+            changed.append(key)
+            continue
+        if st.st_mtime_ns != mtime_ns or st.st_size != size:
+            changed.append(key)
+    return changed
+
+
+def _watch_loop(interval):
+    while not _watcher_stop.wait(interval):
+        for key in _changed_paths():
+            with _lock:
+                if _cache.pop(key, None) is None:
+                    continue
+                _stats["invalidations"] += 1
+            for callback in list(_listeners):
+                try:
+                    callback(Path(key))
+                except Exception as e:
+                    print(f"⚠️ config watcher: listener ผิดพลาด ({key}): {e}")
+
+
+def start_watcher(interval=DEFAULT_WATCH_INTERVAL):
+    """เริ่ม thread ที่ตรวจไฟล์ใน cache ทุก interval วินาที (เรียกซ้ำได้)"""
+    global _watcher
+    if _watcher and _watcher.is_alive():
+        return
+    _watcher_stop.clear()
+    _watcher = threading.Thread(target=_watch_loop, args=(interval,), name="config-watcher", daemon=True)
+    _watcher.start()
+
+
+def stop_watcher():
+    _watcher_stop.set()
@@ -0,0 +1,223 @@
+import asyncio
+import time
+
+from playwright.async_api import TimeoutError
+
+from adaptive_timeouts import PLAYWRIGHT_DEFAULT_TIMEOUT_MS, adaptive
+from selector_chains import evaluate_any, find_present, get_locator, print_stale_summary, wait_for_any
+from site_plans import MOCK_BASE_URL, SITES_DIR, STEP_ACTIONS, compile_plan, list_trial_sites, load_site_plan
+from step_readiness import perform_step, print_step_summary
+from tracing import span
+
+
+class FlowAbort(Exception):
+    """ขั้นตอนใน flow ล้มเหลวจนไม่สามารถจองต่อได้"""
+
+
+# อ่าน index, ข้อความ และสถานะ enabled ของทุกตัวเลือกใน evaluate ครั้งเดียว (แทน inner_text ทีละปุ่ม)
+_SCAN_ITEMS_JS = """(elements) => elements.map((el, index) => ({
+    index,
+    text: (el.innerText || el.textContent || "").trim(),
+    enabled: !el.disabled && el.getAttribute("aria-disabled") !== "true" && !el.classList.contains("disabled"),
+}))"""
+
+
+async def _run_action(page, step, params, timeout):
+    """ทำ action ของขั้นตอน คืนจำนวน round trip ไปยังเบราว์เซอร์ที่ใช้"""
+    action = step["action"]
+
+    if action == "require":
+        try:
+            await wait_for_any(page, step["target_key"], step["target"], timeout=timeout)
+        except TimeoutError:
+            raise FlowAbort(step["fail_message"] or f"ไม่พบ element ที่จำเป็นในขั้นตอน '{step['name']}'")
+        return 1
+
+    if action in ("click", "check"):
+        if step["optional"]:
+            locator = await find_present(page, step["target_key"], step["target"])
+            if locator is None:
+                return 1
+        elif isinstance(step["target"], str):
+            locator = get_locator(page, step["target"]).first
+        else:
+            # หลายตัวเลือก: รอพร้อมกันแล้วใช้ตัวแรกที่เจอ
+            locator = await wait_for_any(page, step["target_key"], step["target"], timeout=timeout)
+        if action == "click":
+            await locator.click(timeout=timeout)
+            print(f"Clicked {step['name']}")
+        else:
+            await locator.check(timeout=timeout)
+            print(f"Checked {step['name']}")
+        return 2 if step["optional"] or not isinstance(step["target"], str) else 1
+
+    # select_text: หา element ที่ข้อความตรงกับค่าที่ผู้ใช้เลือก แล้วคลิก
+    wanted = str(params[step["value"]])
+    items, candidates = await evaluate_any(page, step["items_key"], step["items"], _SCAN_ITEMS_JS)
+    round_trips = 1
+    if not candidates:
+        # รายการยังไม่ render: รอ container แล้วสแกนใหม่อีกครั้ง
+        await wait_for_any(page, step["container_key"], step["container"], timeout=timeout)
+        items, candidates = await evaluate_any(page, step["items_key"], step["items"], _SCAN_ITEMS_JS)
+        round_trips += 2
+
+    enabled = [item for item in candidates if item["enabled"]]
+    target = next((item for item in enabled if item["text"] == wanted), None)
+    if target is None:
+        reason = "ถูกปิดอยู่" if any(item["text"] == wanted for item in candidates) else "ไม่พบ"
+        if step["fallback"] == "first" and enabled:
+            target = enabled[0]
+            print(f"❌ {step['name']} ที่เลือก ({wanted}) {reason}, เลือกรายการแรกแทน")
+        else:
+            raise FlowAbort(step["fail_message"] or f"{step['name']} ที่เลือก ({wanted}) {reason}")
+
+    await items.nth(target["index"]).click(timeout=timeout)
+    print(f"Selected {step['name']}: {target['text']} (button #{target['index'] + 1})")
+    return round_trips + 1
+
+
+def new_checkpoint():
+    """
+    สถานะของ flow ที่ run_plan บันทึกระหว่างรัน (ส่ง dict นี้เข้าไปเพื่ออ่านผลหลังจบ)
+    completed: ขั้นตอนที่ผ่านแล้วตามลำดับ, step_urls: URL ของหน้าก่อนเริ่มแต่ละขั้นตอน
+    retries/resumes/recovered_ms: จำนวนครั้งที่ลองใหม่ และเวลาของขั้นตอนที่ไม่ต้องทำซ้ำ
+    """
+    return {
+        "completed": [],
+        "last_completed": None,
+        "url": None,
+        "step_urls": {},
+        "step_ms": {},
+        "retries": 0,
+        "resumes": [],
+        "recovered_ms": 0.0,
+    }
+
+
+def _is_retryable(error):
+    # หมดเวลา (หน้าเว็บช้า/ยังโหลดไม่เสร็จ) ลองใหม่ได้
+    # FlowAbort คือเว็บตอบชัดเจนแล้ว (เช่นไม่มี Event, วันที่เลือกเต็ม) ลองซ้ำก็ได้ผลเดิม และ error อื่น (เช่นหน้าเว็บถูกปิด) ไม่ลองใหม่
+    return isinstance(error, TimeoutError)
+
+
+async def _resume_after_failure(page, plan, checkpoint, failed_index, attempts, error, after_step):
+    """
+    เลือกขั้นตอนที่จะทำต่อหลังขั้นตอน failed_index ล้มเหลว ตาม plan["retry"]
+    ลองขั้นตอนเดิมบนหน้าเดิมก่อน (ถ้าหน้ายังอยู่ที่เดิม) แล้วจึงถอยไป anchor ก่อนหน้า
+    คืน index ของขั้นตอนที่จะเริ่มใหม่ หรือ None ถ้าไม่ลองใหม่แล้ว
+    """
+    steps = plan["steps"]
+    policy = plan["retry"]
+    step = steps[failed_index]
+    attempts[failed_index] += 1
+    if not _is_retryable(error) or not step["retry"] or checkpoint["retries"] >= policy["max_retries"]:
+        return None
+
+    same_page = page.url == checkpoint["step_urls"].get(step["name"])
+    if same_page and attempts[failed_index] <= policy["same_step_attempts"]:
+        resume_index = failed_index
+    else:
+        resume_index = next((i for i in range(failed_index, -1, -1) if steps[i]["anchor"]), None)
+        if resume_index is None:
+            return None
+
+    checkpoint["retries"] += 1
+    resume_step = steps[resume_index]
+    # ขั้นตอนก่อนหน้าที่ไม่ต้องทำซ้ำ (ถ้าเริ่มใหม่ทั้งหมดต้องทำทุกขั้นตอนนี้อีกครั้ง)
+    recovered_ms = sum(checkpoint["step_ms"].get(s["name"], 0.0) for s in steps[:resume_index])
+    print(f"♻️ ขั้นตอน '{step['name']}' ล้มเหลว ({error}), ลองใหม่ครั้งที่ {checkpoint['retries']}/{policy['max_retries']} "
+          f"จากขั้นตอน '{resume_step['name']}' (ไม่ต้องทำซ้ำ {resume_index} ขั้นตอน)")
+
+    with span("flow_resume", category="retry", failed_step=step["name"], resume_step=resume_step["name"],
+              attempt=checkpoint["retries"], recovered_ms=round(recovered_ms, 1)):
+        await asyncio.sleep(policy["backoff_ms"] / 1000)
+        if after_step is not None:
+            # เช่น CAPTCHA ที่โผล่ขึ้นมาระหว่างขั้นตอนจนทำให้ timeout
+            await after_step()
+        anchor_url = checkpoint["step_urls"].get(resume_step["name"])
+        if resume_index != failed_index and anchor_url and page.url != anchor_url:
+            await page.goto(anchor_url, wait_until="domcontentloaded")
+
+    del checkpoint["completed"][resume_index:]
+    checkpoint["last_completed"] = checkpoint["completed"][-1] if checkpoint["completed"] else None
+    checkpoint["recovered_ms"] += recovered_ms
+    checkpoint["resumes"].append({
+        "failed_step": step["name"],
+        "resume_step": resume_step["name"],
+        "error": str(error),
+        "recovered_ms": round(recovered_ms, 1),
+    })
+    return resume_index
+
+
+async def run_plan(page, plan, params, after_step=None, checkpoint=None):
+    """
+    รันทุกขั้นตอนของ plan บนหน้าเว็บ
+    params: ค่าที่ผู้ใช้เลือก เช่น {"branch": ..., "day": ..., "time": ...}
+    after_step: coroutine function ที่เรียกหลังแต่ละขั้นตอน (เช่นตรวจ CAPTCHA)
+    checkpoint: dict จาก new_checkpoint() สำหรับอ่านขั้นตอนล่าสุดที่ผ่านและจำนวนครั้งที่ลองใหม่
+    ขั้นตอนที่ล้มเหลวจะลองใหม่บนหน้าเดิมตาม plan["retry"] แทนการเริ่มจองใหม่ทั้งหมด
+    คืนค่า True เมื่อจองครบทุกขั้นตอน
+    """
+    if checkpoint is None:
+        checkpoint = new_checkpoint()
+    steps = plan["steps"]
+    attempts = [0] * len(steps)
+    step_timings = []
+    index = 0
+    try:
+        while index < len(steps):
+            step = steps[index]
+            checkpoint["step_urls"][step["name"]] = page.url
+            started = time.perf_counter()
+            try:
+                with span(f"step:{step['name']}", category="step", site=plan["name"], attempt=attempts[index] + 1) as step_attrs:
+                    async def action(step=step, step_attrs=step_attrs):
+                        # timeout_ms ใน JSON เป็นค่าเริ่มต้น, ค่าจริงปรับตามประวัติเวลาของขั้นตอนนี้ (ไม่รวมเวลารอ readiness)
+                        default_ms = step["timeout_ms"] or PLAYWRIGHT_DEFAULT_TIMEOUT_MS
+                        with adaptive(f"step:{plan['name']}:{step['name']}", default_ms) as timeout:
+                            step_attrs["timeout_ms"] = timeout
+                            step_attrs["round_trips"] = await _run_action(page, step, params, timeout)
+
+                    if step["ready"]:
+                        timing = await perform_step(page, step["name"], action, step["ready"])
+                        step_attrs.update(waited_ms=timing["waited_ms"], budget_ms=timing["budget_ms"], ready_ok=timing["ok"])
+                        step_timings.append(timing)
+                    else:
+                        await action()
+
+                if after_step is not None:
+                    await after_step()
+            except Exception as e:
+                resume_index = await _resume_after_failure(page, plan, checkpoint, index, attempts, e, after_step)
+                if resume_index is None:
+                    raise
+                index = resume_index
+                continue
+
+            checkpoint["step_ms"][step["name"]] = (time.perf_counter() - started) * 1000
+            checkpoint["completed"].append(step["name"])
+            checkpoint["last_completed"] = step["name"]
+            checkpoint["url"] = page.url
+            index += 1
+    except FlowAbort as e:
+        print(f"❌ {e} (ขั้นตอนล่าสุดที่ผ่าน: {checkpoint['last_completed'] or '-'})")
+        return False
+    except Exception as e:
+        print(f"❌ เกิดข้อผิดพลาดในขั้นตอนการจอง ({plan['name']}): {e} (ขั้นตอนล่าสุดที่ผ่าน: {checkpoint['last_completed'] or '-'})")
+        return False
+    finally:
+        print_step_summary(step_timings)
+        print_stale_summary()
+        if checkpoint["retries"]:
+            print(f"♻️ ลองใหม่ {checkpoint['retries']} ครั้ง, ไม่ต้องทำขั้นตอนที่ผ่านแล้วซ้ำ ~{checkpoint['recovered_ms'] / 1000:.2f} วินาที")
+
+    print("✅ จองสำเร็จ")
+    return True
+
+
+async def run_site_flow(page, site_name, branch, selected_day, selected_time_str, after_step=None, checkpoint=None):
+    """จองด้วย flow ของ site ที่ระบุ (ใช้ plan จาก cache)"""
+    plan = load_site_plan(site_name)
+    params = {"branch": branch, "day": selected_day, "time": selected_time_str}
+    return await run_plan(page, plan, params, after_step, checkpoint)
@@ -1,21 +1,25 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
+import copy
 import json
 from pathlib import Path
-import threading
 import sys
-import os
 import datetime
-import schedule
-import time as time_module
+import multiprocessing
 
 # เพิ่มพาธของโฟลเดอร์แม่เพื่อให้สามารถ import live_mode, trial_mode และ utils ได้
 # เนื่องจาก gui_app.py จะกลายเป็นไฟล์หลัก
 script_dir = Path(__file__).resolve().parent
 sys.path.append(str(script_dir))
 
-from live_mode import run_live_mode_for_user
-from trial_mode import start_trial_mode, TRIAL_SITES, BROWSERS
+import startup_profile
+from log_pipeline import LogSink, TextRedirector
+from trial_mode import TRIAL_SITES, BROWSERS
+from booking_service import BookingService, describe_failure
+import config_service
+import run_profiler
+from config_service import load_json, save_json
+from user_directory import UserDirectory
 from utils import connect_gsheet # นำเข้า connect_gsheet โดยตรง
 
 # --- พาธไปยัง config ไฟล์ต่างๆ (ย้ายมาจาก main.py) ---
@@ -64,8 +68,7 @@ def ensure_file_exists(path: Path, default_content=None):
 def load_json_config(path):
     """Helper to load JSON config safely (ย้ายมาจาก main.py)."""
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_json(path)
     except FileNotFoundError:
         print(f"❌ Config file not found: {path}")
         return {}
@@ -131,11 +134,9 @@ def authenticate_user(username, password, gsheet_users_data):
     Authenticates a user against data loaded from Google Sheet.
     Returns (user_data_dict) on success, or None on failure.
     The user_data_dict will contain 'username', 'role', 'max_profiles', 'can_use_scheduler'.
+    gsheet_users_data is a UserDirectory (lookup by username index, cached on disk).
     """
-    for user_cred in gsheet_users_data:
-        if user_cred.get("username") == username and user_cred.get("password") == password:
-            return user_cred  # Return the full user data dict
-    return None
+    return gsheet_users_data.authenticate(username, password)
 
 def get_available_profiles(username, all_user_profiles_from_config):
     """Filters profiles from user_config.json for a given username."""
@@ -162,14 +163,26 @@ class BookingApp:
         self.root.geometry("800x800") # ขยายหน้าต่างให้ใหญ่ขึ้นเพื่อรองรับ Config Tab
 
         # Load configs (รับมาจาก main.py หรือในกรณีนี้คือโหลดเองใน run_gui_app)
-        self.users_data = all_configs['user_profiles'].get("users", []) # Profiles from user_config.json
-        self.line_accounts = all_configs['line_accounts'] # LINE accounts from config_line_user.json
+        # สองรายการนี้ถูกแก้ไขในแท็บตั้งค่า จึงใช้สำเนา ไม่แก้ object ใน cache ของ config_service ตรง ๆ
+        self.users_data = copy.deepcopy(all_configs['user_profiles'].get("users", [])) # Profiles from user_config.json
+        self.line_accounts = copy.deepcopy(all_configs['line_accounts']) # LINE accounts from config_line_user.json
         self.branches = all_configs['branches'] # Branches from branch/config.json
         self.times = all_configs['times'] # Times from branch/time.json
-        self.gsheet_users_data = gsheet_users_data # User credentials from Google Sheet (จากฟังก์ชัน load_user_credentials_from_gsheet)
+        self.gsheet_users_data = gsheet_users_data # UserDirectory ของผู้ใช้จาก Google Sheet (มี cache บนดิสก์)
         
-        # Schedule config (โหลดเองเพราะ GUI เป็นผู้จัดการการเพิ่ม/แก้ไข)
-        self.scheduled_bookings = self._load_json_config_for_gui(SCHEDULE_CONFIG_PATH).get("scheduled_bookings", [])
+        # job_store, scheduler, คิวงานจอง และ worker pool ใช้ร่วมกับโหมด daemon (ดู booking_service.py)
+        self.booking_service = BookingService(
+            self.times,
+            self._max_profiles_for,
+            self._load_line_credentials_for_ui,
+            log=self.log_message,
+            on_worker_event=self._on_worker_event,
+            schedule_json_path=SCHEDULE_CONFIG_PATH,
+        )
+        self.job_store = self.booking_service.job_store
+        self.scheduler = self.booking_service.scheduler
+        self.scheduled_bookings = []
+        self._load_schedule_config()
 
         # User session variables
         self.logged_in_username = None
@@ -177,39 +190,66 @@ class BookingApp:
         self.max_allowed_profiles = 0
         self.can_use_scheduler = False
 
-        # Scheduler
-        self.scheduler_thread = None
         self.scheduler_running = False
         self.job_refs = {}
 
         self._create_widgets()
+        # ทุก thread เขียน log ผ่าน LogSink แล้ว Tk loop จะดึงไปแสดงเป็นชุด ๆ
+        self.log_sink = LogSink(self.log_text)
+        self.log_sink.start()
         self._populate_initial_data()
         self._update_scheduled_jobs_display()
         self._update_user_profiles_display() # อัปเดต Treeview ของ User Profiles
         self._update_line_accounts_display() # อัปเดต Treeview ของ LINE Accounts
 
-        sys.stdout = TextRedirector(self.log_text, 'stdout')
-        sys.stderr = TextRedirector(self.log_text, 'stderr')
+        sys.stdout = TextRedirector(self.log_sink, 'stdout')
+        sys.stderr = TextRedirector(self.log_sink, 'stderr')
+
+        # โหลดรายการใหม่อัตโนมัติเมื่อไฟล์ config ถูกแก้ไขจากภายนอก
+        config_service.add_listener(self._on_config_file_changed)
+        config_service.start_watcher()
+
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+
+    def _on_close(self):
+        # ปิด worker ที่ยังค้างอยู่ทั้งหมดพร้อมหน้าต่างหลัก
+        active = self.booking_service.active_jobs()
+        if active["running"] or active["pending"]:
+            if not messagebox.askyesno("ยืนยันการปิด", f"มีงานจองกำลังทำงาน {active['running']} งาน และรอคิว {active['pending']} งาน\nปิดโปรแกรมและหยุดงานทั้งหมดหรือไม่?"):
+                return
+        self.booking_service.shutdown()
+        self.log_sink.stop()
+        self.root.destroy()
+
+    def _on_config_file_changed(self, path):
+        # เรียกจาก thread ของ watcher จึงส่งงานแก้ UI กลับไปที่ Tk loop
+        self.log_message(f"🔄 ตรวจพบการแก้ไขไฟล์ {path.name}, โหลดใหม่")
+        refreshers = {
+            USER_CONFIG_PATH.resolve(): self._update_user_profiles_display,
+            LINE_USER_CONFIG_PATH.resolve(): self._update_line_accounts_display,
+        }
+        refresh = refreshers.get(path)
+        if refresh is not None:
+            self.root.after(0, refresh)
         
     def _load_json_config_for_gui(self, path):
-        """Helper to load JSON config safely (for GUI's internal files like schedule_config and new config tabs)."""
+        """
+        Helper to load JSON config safely (for GUI's internal files like schedule_config and new config tabs).
+        คืนสำเนา (deep copy) เพราะแท็บตั้งค่าแก้ข้อมูลนี้ก่อนบันทึก ไม่ให้ไปแก้ object ที่ load_json cache ไว้
+        """
         try:
             if not path.exists():
                 # สร้างไฟล์เปล่าหากไม่พบ
                 empty_data = {}
-                if path == SCHEDULE_CONFIG_PATH:
-                    empty_data = {"scheduled_bookings": []}
-                elif path == USER_CONFIG_PATH:
+                if path == USER_CONFIG_PATH:
                     empty_data = {"users": []}
                 elif path == LINE_USER_CONFIG_PATH:
                     empty_data = {"line_accounts": []}
 
-                with open(path, "w", encoding="utf-8") as f:
-                    json.dump(empty_data, f, indent=2, ensure_ascii=False) # เพิ่ม ensure_ascii=False
+                save_json(path, empty_data)
                 self.log_message(f"✅ สร้างไฟล์ config เปล่าที่ {path} แล้ว.")
                 return empty_data
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            return copy.deepcopy(load_json(path))
         except json.JSONDecodeError:
             messagebox.showerror("Error", f"Invalid JSON in config file: {path}")
             return {}
@@ -217,11 +257,13 @@ class BookingApp:
             messagebox.showerror("Error", f"Could not load config file {path}: {e}")
             return {}
 
+    def _load_schedule_config(self):
+        self.scheduled_bookings = self.job_store.list_jobs()
+
     def _save_json_config_for_gui(self, path, data):
         """Helper to save JSON config safely."""
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False) # เพิ่ม ensure_ascii=False
+            save_json(path, data)
             self.log_message(f"✅ Config saved to {path}")
         except Exception as e:
             self.log_message(f"❌ Failed to save config to {path}: {e}")
@@ -328,6 +370,20 @@ class BookingApp:
         self.manual_widgets['trial_browser_combobox'].pack(fill="x", padx=5, pady=5)
         if trial_browser_options: self.manual_widgets['trial_browser_var'].set(trial_browser_options[0])
 
+        # ตัวเลือกการเปิดเบราว์เซอร์ของโหมดทดสอบ (ดู resource_blocking.py)
+        self.manual_widgets['trial_headless_var'] = tk.BooleanVar(self.root, value=False)
+        ttk.Checkbutton(self.manual_widgets['trial_mode_options_frame'], text="Headless (ไม่แสดงหน้าต่างเบราว์เซอร์)",
+                        variable=self.manual_widgets['trial_headless_var']).pack(anchor="w", padx=5)
+        self.manual_widgets['trial_block_var'] = tk.BooleanVar(self.root, value=False)
+        ttk.Checkbutton(self.manual_widgets['trial_mode_options_frame'], text="บล็อกรูป/ฟอนต์/วิดีโอ/สคริปต์ภายนอก",
+                        variable=self.manual_widgets['trial_block_var']).pack(anchor="w", padx=5)
+
+
+        # profiling ของการจองครั้งถัดไป (ทั้ง Live/Trial และงานที่ Scheduler เริ่ม) ดู run_profiler.py
+        self.manual_widgets['profile_run_var'] = tk.BooleanVar(self.root, value=run_profiler.is_enabled())
+        ttk.Checkbutton(manual_frame, text="🔬 Profile การจอง (cProfile + Playwright trace ใน logs/profiles)",
+                        variable=self.manual_widgets['profile_run_var'],
+                        command=lambda: run_profiler.set_enabled(self.manual_widgets['profile_run_var'].get())).pack(side="bottom", anchor="w", padx=5)
 
         self.manual_widgets['start_button'] = ttk.Button(manual_frame, text="🚀 เริ่มการจอง", command=self._start_manual_booking_thread, state="disabled")
         self.manual_widgets['start_button'].pack(pady=10)
@@ -409,6 +465,8 @@ class BookingApp:
         ttk.Button(line_accounts_buttons_frame, text="✏️ แก้ไขบัญชี LINE", command=self._edit_selected_line_account_gui).pack(side="left", padx=2)
         ttk.Button(line_accounts_buttons_frame, text="🗑️ ลบบัญชี LINE", command=self._delete_selected_line_account_gui).pack(side="left", padx=2)
 
+        ttk.Button(config_frame, text="📊 สถิติ Config Cache", command=lambda: self.log_message(config_service.format_stats())).pack(anchor="e", padx=5, pady=5)
+
 
         # Log Text area (Shared across tabs)
         self.log_text = tk.Text(self.root, height=10, state='disabled', wrap='word')
@@ -523,11 +581,8 @@ class BookingApp:
             self.manual_widgets['time_combobox'].set(self.times[0])
 
     def _authenticate_user_from_gsheet(self, username, password):
-        # Data is already loaded in self.gsheet_users_data from main.py's load
-        for user_cred in self.gsheet_users_data:
-            if user_cred.get("username") == username and user_cred.get("password") == password:
-                return user_cred
-        return None
+        # Data is already loaded in self.gsheet_users_data (UserDirectory) from main.py's load
+        return self.gsheet_users_data.authenticate(username, password)
 
     def _attempt_login(self):
         username = self.login_username_entry.get().strip()
@@ -615,13 +670,12 @@ class BookingApp:
                 self.root.after(100, lambda: self.manual_widgets['start_button'].config(state="normal"))
                 return
 
-            booking_thread = threading.Thread(target=self._run_booking_process_live, args=(
+            self._run_booking_process_live(
                 selected_profile_str,
                 selected_branch,
                 selected_day_str,
                 selected_time_str
-            ))
-            booking_thread.start()
+            )
 
         elif selected_mode == "Trial Mode":
             selected_trial_site_url = self.manual_widgets['trial_site_var'].get()
@@ -660,62 +714,101 @@ class BookingApp:
             # For simplicity, we'll pass the logged-in username
             trial_username = self.logged_in_username 
             
-            booking_thread = threading.Thread(target=self._run_booking_process_trial, args=(
+            self._run_booking_process_trial(
                 trial_username,
                 trial_site_key,
                 trial_browser_key,
                 selected_branch,
                 int(selected_day_str), # day
                 selected_time_str # time_str
-            ))
-            booking_thread.start()
+            )
 
 
     def _run_booking_process_live(self, selected_profile_str, selected_branch, selected_day_str, selected_time_str):
+        """ส่งงานจองเข้า worker process (ดู booking_service.py) โดยไม่บล็อก thread ที่เรียก"""
         try:
-            parts = selected_profile_str.split(' - ')
-            username = parts[0]
-            browser = parts[1]
-            profile_name = parts[2]
-
-            day = int(selected_day_str)
-            
-            time_index = self.times.index(selected_time_str) if selected_time_str in self.times else 0
-
-            line_email, line_password = self._load_line_credentials_for_ui(username, profile_name)
-
-            self.log_message(f"Selected: User='{username}', Browser='{browser}', Profile='{profile_name}', Branch='{selected_branch}', Day={day}, Time='{selected_time_str}'")
-            
-            run_live_mode_for_user(username, browser, profile_name, selected_branch, day, time_index, line_email, line_password)
-            
-            self.log_message(f"✅ กระบวนการจอง '{selected_profile_str}' (Branch: {selected_branch}, Day: {day}, Time: {selected_time_str}) เสร็จสิ้น.")
+            username, browser, profile_name = selected_profile_str.split(' - ')[:3]
+            success_message = f"✅ กระบวนการจอง '{selected_profile_str}' (Branch: {selected_branch}, Day: {selected_day_str}, Time: {selected_time_str}) เสร็จสิ้น."
+            self.booking_service.submit_live(
+                username, browser, profile_name, selected_branch, selected_day_str, selected_time_str,
+                on_done=lambda event: self._on_booking_done(event, success_message, "❌ เกิดข้อผิดพลาดในกระบวนการจอง"),
+            )
 
         except ValueError:
             self.log_message("❌ กรุณาตรวจสอบการเลือกวัน (ต้องเป็นตัวเลข).")
+            self._enable_start_button()
+            return
         except Exception as e:
             self.log_message(f"❌ เกิดข้อผิดพลาดในกระบวนการจอง: {e}")
-        finally:
-            self.root.after(100, lambda: self.manual_widgets['start_button'].config(state="normal"))
+            self._enable_start_button()
+            return
 
     def _run_booking_process_trial(self, username, site_key, browser_key, branch, day, time_str):
-        try:
-            self.log_message(f"Selected Trial: User='{username}', Site='{TRIAL_SITES[site_key][0]}', Browser='{BROWSERS[browser_key]}', Branch='{branch}', Day={day}, Time='{time_str}'")
-            
-            start_trial_mode(username, site_key, browser_key, branch, day, time_str)
-            
-            self.log_message(f"✅ กระบวนการทดสอบ '{username}' (Site: {TRIAL_SITES[site_key][0]}, Browser: {BROWSERS[browser_key]}) เสร็จสิ้น.")
+        self.log_message(f"Selected Trial: User='{username}', Site='{TRIAL_SITES[site_key][0]}', Browser='{BROWSERS[browser_key]}', Branch='{branch}', Day={day}, Time='{time_str}'")
+        launch_options = {
+            "headless": self.manual_widgets['trial_headless_var'].get(),
+            "block_resources": self.manual_widgets['trial_block_var'].get(),
+        }
 
+        success_message = f"✅ กระบวนการทดสอบ '{username}' (Site: {TRIAL_SITES[site_key][0]}, Browser: {BROWSERS[browser_key]}) เสร็จสิ้น."
+        try:
+            self.booking_service.executor.submit(
+                "trial",
+                {
+                    "username": username, "site_choice": site_key, "browser_choice": browser_key,
+                    "branch": branch, "day": day, "time_str": time_str, "launch_options": launch_options,
+                },
+                username=username,
+                label=f"trial {TRIAL_SITES[site_key][0]}",
+                on_done=lambda event: self._on_booking_done(event, success_message, "❌ เกิดข้อผิดพลาดในกระบวนการทดสอบ"),
+            )
         except Exception as e:
             self.log_message(f"❌ เกิดข้อผิดพลาดในกระบวนการทดสอบ: {e}")
+            self._enable_start_button()
+
+    def _max_profiles_for(self, username):
+        user = self.gsheet_users_data.get(username)
+        try:
+            return int(user.get('max_profiles', 1)) if user else 1
+        except (TypeError, ValueError):
+            return 1
+
+    def _on_booking_done(self, event, success_message, error_prefix):
+        """รายงานผลเมื่อ worker จบงาน (เรียกจาก thread ของ worker pool) แล้วเปิดปุ่มเริ่มการจองอีกครั้ง"""
+        try:
+            if event["ok"]:
+                self.log_message(success_message)
+            else:
+                _, error = describe_failure(event)
+                self.log_message(f"{error_prefix} [#{event['job_id']}]: {error}")
         finally:
-            self.root.after(100, lambda: self.manual_widgets['start_button'].config(state="normal"))
+            self._enable_start_button()
+
+    def _on_worker_event(self, event):
+        # เรียกจาก thread ของ worker pool: log ผ่าน LogSink, งานที่ต้องแตะ widget ส่งกลับไป Tk loop
+        job_id = event.get("job_id")
+        if event["type"] == "log":
+            self.log_message(f"[#{job_id}] {event['text']}")
+        elif event["type"] == "started":
+            self.log_message(f"▶️ [#{job_id}] เริ่ม worker process (pid {event['pid']})")
+        elif event["type"] == "progress":
+            self.log_message(f"⏱️ [#{job_id}] {event['span']}: {event['duration_ms']:.0f} ms ({event['status']})")
+        elif event["type"] == "prompt":
+            self.root.after(0, lambda: self._answer_worker_prompt(job_id, event["text"]))
+
+    def _answer_worker_prompt(self, job_id, text):
+        # input() ใน worker (เช่น รอผู้ใช้ล็อกอิน LINE เอง หรือ "กด Enter เพื่อปิด browser") แสดงเป็นหน้าต่างถาม
+        answer = messagebox.askokcancel(f"งานจอง #{job_id}", f"{text.strip()}\n\nกด OK เพื่อดำเนินการต่อ หรือ Cancel เพื่อยกเลิก")
+        self.booking_service.worker_pool.send(job_id, "continue" if answer else "cancel")
+
+    def _enable_start_button(self):
+        self.root.after(100, lambda: self.manual_widgets['start_button'].config(state="normal"))
 
 
     def _load_line_credentials_for_ui(self, username, profile_name):
         try:
-            with open(LINE_USER_CONFIG_PATH, "r", encoding="utf-8") as f:
-                line_config = json.load(f)
-            
+            line_config = load_json(LINE_USER_CONFIG_PATH)
+
             for account in line_config.get("line_accounts", []):
                 if account["username"] == username and account["profile_name"] == profile_name:
                     self.log_message(f"✅ โหลดข้อมูล LINE Login สำหรับ '{username}' ({profile_name}) สำเร็จแล้ว (สำหรับ UI).")
@@ -730,14 +823,8 @@ class BookingApp:
             return None, None
 
     def log_message(self, message):
-        if self.root.winfo_exists():
-            self.root.after(0, self._insert_log_message, message)
-
-    def _insert_log_message(self, message):
-        self.log_text.config(state='normal')
-        self.log_text.insert(tk.END, message + "\n")
-        self.log_text.see(tk.END)
-        self.log_text.config(state='disabled')
+        # เรียกได้จากทุก thread (ไม่แตะ widget โดยตรง)
+        self.log_sink.write(message + "\n")
 
     # --- Scheduler Functions ---
     def _update_scheduled_jobs_display(self):
@@ -745,9 +832,9 @@ class BookingApp:
         for i in self.schedule_tree.get_children():
             self.schedule_tree.delete(i)
         
-        self.scheduled_bookings = self._load_json_config_for_gui(SCHEDULE_CONFIG_PATH).get("scheduled_bookings", [])
+        self._load_schedule_config()
 
-        for idx, job_data in enumerate(self.scheduled_bookings):
+        for job_data in self.scheduled_bookings:
             job_username = job_data.get('username')
             job_profile_name = job_data.get('profile_name')
             job_browser = job_data.get('browser')
@@ -790,7 +877,7 @@ class BookingApp:
                 profile_str += " (เกินขีดจำกัดโปรไฟล์)"
                 tags.append("profile_limit_exceeded")
             
-            self.schedule_tree.insert("", "end", iid=str(idx), 
+            self.schedule_tree.insert("", "end", iid=str(job_data['id']), 
                                       values=(job_data['name'], profile_str, job_time_str, enabled_status),
                                       tags=tuple(tags))
         
@@ -823,14 +910,18 @@ class BookingApp:
             messagebox.showwarning("Warning", "กรุณาเลือกรายการที่ต้องการแก้ไข.")
             return
         
-        job_index = int(selected_item)
-        job_data = self.scheduled_bookings[job_index]
+        job_id = int(selected_item)
+        job_data = self.job_store.get_job(job_id)
+        if job_data is None:
+            messagebox.showwarning("Warning", "ไม่พบรายการจองนี้แล้ว (อาจถูกลบไปแล้ว).")
+            self._update_scheduled_jobs_display()
+            return
         
         if job_data.get('username') != self.logged_in_username and self.user_role != 'admin':
             messagebox.showerror("Error", "คุณไม่มีสิทธิ์แก้ไขรายการจองนี้.")
             return
 
-        self._open_job_editor_window(job_data, job_index)
+        self._open_job_editor_window(job_data, job_id)
 
     def _edit_scheduled_job(self, event):
         self._edit_selected_job()
@@ -849,20 +940,23 @@ class BookingApp:
             messagebox.showwarning("Warning", "กรุณาเลือกรายการที่ต้องการลบ.")
             return
         
-        job_index = int(selected_item)
-        job_name = self.scheduled_bookings[job_index]['name']
+        job_id = int(selected_item)
+        job_data = self.job_store.get_job(job_id)
+        if job_data is None:
+            self._update_scheduled_jobs_display()
+            return
+        job_name = job_data['name']
 
-        if self.scheduled_bookings[job_index].get('username') != self.logged_in_username and self.user_role != 'admin':
+        if job_data.get('username') != self.logged_in_username and self.user_role != 'admin':
             messagebox.showerror("Error", "คุณไม่มีสิทธิ์ลบรายการจองนี้.")
             return
 
         if messagebox.askyesno("ยืนยันการลบ", f"คุณแน่ใจหรือไม่ที่ต้องการลบ '{job_name}' ออกจาก Schedule?"):
-            del self.scheduled_bookings[job_index]
-            self._save_json_config_for_gui(SCHEDULE_CONFIG_PATH, {"scheduled_bookings": self.scheduled_bookings})
+            self.job_store.delete_job(job_id)
             self._update_scheduled_jobs_display()
             self.log_message(f"🗑️ ลบรายการจอง '{job_name}' ออกจาก Schedule แล้ว.")
 
-    def _open_job_editor_window(self, job_data=None, job_index=None):
+    def _open_job_editor_window(self, job_data=None, job_id=None):
         editor_win = tk.Toplevel(self.root)
         editor_win.title("เพิ่ม/แก้ไขรายการจองที่ตั้งเวลา")
         editor_win.geometry("450x550")
@@ -936,10 +1030,10 @@ class BookingApp:
 
         button_frame = ttk.Frame(editor_win, padding=10)
         button_frame.pack(fill="x", pady=5)
-        ttk.Button(button_frame, text="บันทึก", command=lambda: self._save_job_from_editor(editor_win, job_name_var.get(), profile_var.get(), branch_var.get(), day_var.get(), time_var.get(), schedule_time_var.get(), enabled_var.get(), job_index)).pack(side="left", padx=5)
+        ttk.Button(button_frame, text="บันทึก", command=lambda: self._save_job_from_editor(editor_win, job_name_var.get(), profile_var.get(), branch_var.get(), day_var.get(), time_var.get(), schedule_time_var.get(), enabled_var.get(), job_id)).pack(side="left", padx=5)
         ttk.Button(button_frame, text="ยกเลิก", command=editor_win.destroy).pack(side="right", padx=5)
 
-    def _save_job_from_editor(self, editor_win, name, profile_str, branch, day_str, time_str, schedule_time_str, enabled, job_index):
+    def _save_job_from_editor(self, editor_win, name, profile_str, branch, day_str, time_str, schedule_time_str, enabled, job_id):
         try:
             if not all([name, profile_str, branch, day_str, time_str, schedule_time_str]):
                 messagebox.showwarning("ข้อมูลไม่ครบ", "กรุณากรอกข้อมูลให้ครบทุกช่อง.")
@@ -957,7 +1051,7 @@ class BookingApp:
             if len(parts) != 3: raise ValueError("รูปแบบโปรไฟล์ไม่ถูกต้อง: Username - Browser - ProfileName")
             username, browser, profile_name = parts[0], parts[1], parts[2]
 
-            logged_in_user_details = next((u for u in self.gsheet_users_data if u.get('username') == self.logged_in_username), None)
+            logged_in_user_details = self.gsheet_users_data.get(self.logged_in_username)
             
             current_user_max_profiles = logged_in_user_details.get('max_profiles', 1) if logged_in_user_details else 1
             current_user_role = logged_in_user_details.get('role', 'normal') if logged_in_user_details else 'normal'
@@ -994,14 +1088,14 @@ class BookingApp:
                 "enabled": enabled
             }
 
-            if job_index is not None:
-                self.scheduled_bookings[job_index] = new_job_data
+            # บันทึกเฉพาะแถวที่แก้ไข (transaction เดียว) แทนการเขียนไฟล์ schedule ใหม่ทั้งไฟล์
+            if job_id is not None:
+                self.job_store.update_job(job_id, new_job_data)
                 self.log_message(f"✅ แก้ไขรายการจอง '{name}' แล้ว.")
             else:
-                self.scheduled_bookings.append(new_job_data)
+                self.job_store.add_job(new_job_data)
                 self.log_message(f"✅ เพิ่มรายการจอง '{name}' ใหม่แล้ว.")
             
-            self._save_json_config_for_gui(SCHEDULE_CONFIG_PATH, {"scheduled_bookings": self.scheduled_bookings})
             self._update_scheduled_jobs_display()
             editor_win.destroy()
 
@@ -1028,70 +1122,30 @@ class BookingApp:
         self.log_message("▶️ เริ่ม Scheduler แล้ว. ตรวจสอบรายการจองที่เปิดใช้งาน...")
 
         self._clear_all_scheduled_jobs()
-        for idx, job_data in enumerate(self.scheduled_bookings):
-            if job_data['enabled'] and \
-               ((self.logged_in_username == job_data['username']) or (self.user_role == 'admin')):
-                job_time_str = job_data['schedule_time']
-                job_name = job_data['name']
-                
-                try:
-                    scheduled_dt = datetime.datetime.strptime(job_time_str, "%Y-%m-%d %H:%M:%S")
-                    
-                    def job_function_wrapper(data):
-                        current_datetime = datetime.datetime.now()
-                        target_datetime = datetime.datetime.strptime(data['schedule_time'], "%Y-%m-%d %H:%M:%S")
-                        
-                        if current_datetime.year == target_datetime.year and \
-                           current_datetime.month == target_datetime.month and \
-                           current_datetime.day == target_datetime.day and \
-                           current_datetime.hour == target_datetime.hour and \
-                           current_datetime.minute == target_datetime.minute:
-
-                            logged_in_user_details = next((u for u in self.gsheet_users_data if u.get('username') == self.logged_in_username), None)
-                            
-                            current_user_max_profiles_at_run_time = logged_in_user_details.get('max_profiles', 1) if logged_in_user_details else 1
-                            current_user_role_at_run_time = logged_in_user_details.get('role', 'normal') if logged_in_user_details else 'normal'
-
-                            job_profile_str_for_check = f"{data['username']} - {data['browser']} - {data['profile_name']}"
-                            all_user_profiles_for_check = [u for u in self.users_data if u['username'] == data['username']]
-                            
-                            profile_index_at_run_time = -1
-                            try:
-                                profile_index_at_run_time = all_user_profiles_for_check.index(job_profile_str_for_check)
-                            except ValueError:
-                                pass
-
-                            if data['username'] == self.logged_in_username and \
-                               (current_user_role_at_run_time == 'admin' or profile_index_at_run_time < current_user_max_profiles_at_run_time):
-                                self.log_message(f"🚀 Scheduler: กำลังเริ่มจอง '{job_name}' ตามเวลาที่ตั้งไว้ ({target_datetime}).")
-                                self._run_booking_process_scheduled(data)
-                            else:
-                                self.log_message(f"❌ Scheduler: งาน '{job_name}' ถูกเรียก แต่ถูกข้ามเนื่องจากสิทธิ์ผู้ใช้หรือเกินขีดจำกัดโปรไฟล์.")
-                        else:
-                            self.log_message(f"ℹ️ Scheduler: งาน '{job_name}' ถูกเรียก แต่ไม่ใช่เวลา/วันที่ตรงตามเป้าหมาย (เป้าหมาย: {target_datetime}, ปัจจุบัน: {current_datetime.strftime('%Y-%m-%d %H:%M:%S')}).")
-
-
-                    job_instance = schedule.every().day.at(scheduled_dt.strftime("%H:%M")).do(
-                        job_function_wrapper, job_data
-                    ).tag(job_name) 
-                    
-                    self.job_refs[job_name] = job_instance
-                    self.log_message(f"✅ ตั้งเวลาจอง '{job_name}' สำหรับทุกวันเวลา {scheduled_dt.strftime('%H:%M')} น. (จะตรวจสอบวันที่และเวลาที่แน่นอนใน Job).")
-                    
-                except ValueError:
-                    self.log_message(f"❌ รายการจอง '{job_name}' มีรูปแบบเวลา Schedule ไม่ถูกต้อง: {job_time_str}. ข้ามรายการนี้.")
-                except Exception as e:
-                    self.log_message(f"❌ ไม่สามารถตั้งเวลาจอง '{job_name}' ได้: {e}")
-        
-        self.scheduler_thread = threading.Thread(target=self._run_scheduler_loop)
-        self.scheduler_thread.daemon = True 
-        self.scheduler_thread.start()
+        self._load_schedule_config()
+        self.job_refs = self.booking_service.schedule_upcoming(
+            can_schedule=lambda job: self.logged_in_username == job['username'] or self.user_role == 'admin',
+            can_run=self._can_run_scheduled_job,
+        )
+
+    def _can_run_scheduled_job(self, job_data):
+        """ตรวจสิทธิ์ตอนถึงเวลาจอง: ต้องเป็นผู้ใช้ที่ล็อกอินอยู่ และโปรไฟล์อยู่ในขีดจำกัด max_profiles"""
+        logged_in_user_details = self.gsheet_users_data.get(self.logged_in_username)
 
-    def _run_scheduler_loop(self):
-        while self.scheduler_running:
-            schedule.run_pending()
-            time_module.sleep(1)
-        self.log_message("Scheduler หยุดทำงานแล้ว.")
+        current_user_max_profiles_at_run_time = logged_in_user_details.get('max_profiles', 1) if logged_in_user_details else 1
+        current_user_role_at_run_time = logged_in_user_details.get('role', 'normal') if logged_in_user_details else 'normal'
+
+        job_profile_str_for_check = f"{job_data['username']} - {job_data['browser']} - {job_data['profile_name']}"
+        all_user_profiles_for_check = [u for u in self.users_data if u['username'] == job_data['username']]
+
+        profile_index_at_run_time = -1
+        try:
+            profile_index_at_run_time = all_user_profiles_for_check.index(job_profile_str_for_check)
+        except ValueError:
+            pass
+
+        return job_data['username'] == self.logged_in_username and \
+            (current_user_role_at_run_time == 'admin' or profile_index_at_run_time < current_user_max_profiles_at_run_time)
 
 
     def _stop_scheduler(self):
@@ -1099,30 +1153,18 @@ class BookingApp:
             self.scheduler_running = False
             self.start_scheduler_button.config(state="normal")
             self.stop_scheduler_button.config(state="disabled")
-            self._clear_all_scheduled_jobs() 
+            self._clear_all_scheduled_jobs()
+            self.scheduler.stop()
             self.log_message("⏹️ Scheduler ถูกหยุดและลบงานทั้งหมดแล้ว.")
         else:
             self.log_message("Scheduler ไม่ได้กำลังทำงาน.")
 
 
     def _clear_all_scheduled_jobs(self):
-        schedule.clear()
+        self.scheduler.clear()
         self.job_refs = {}
         self.log_message("Scheduler: ลบงานทั้งหมดในคิวแล้ว.")
 
-    def _run_booking_process_scheduled(self, job_data):
-        selected_profile_str = f"{job_data['username']} - {job_data['browser']} - {job_data['profile_name']}"
-        selected_branch = job_data['branch']
-        selected_day_str = str(job_data['day'])
-        selected_time_str = job_data['time_str']
-
-        booking_thread = threading.Thread(target=self._run_booking_process_live, args=( # ต้องใช้ _run_booking_process_live เสมอสำหรับ Scheduled Booking
-            selected_profile_str, selected_branch, selected_day_str, selected_time_str
-        ))
-        booking_thread.start()
-        self.log_message(f"✅ Scheduler: งานจอง '{job_data['name']}' ถูกส่งเข้าคิวแล้ว.")
-        
-    # --- ฟังก์ชันจัดการ User Profiles (ย้ายมาจากคำตอบก่อนหน้า) ---
     def _update_user_profiles_display(self):
         """Clears and repopulates the user profiles Treeview."""
         for i in self.user_profiles_tree.get_children():
@@ -1417,22 +1459,6 @@ class BookingApp:
         except Exception as e:
             messagebox.showerror("ข้อผิดพลาด", f"ไม่สามารถบันทึกบัญชี LINE ได้: {e}")
 
-class TextRedirector:
-    def __init__(self, widget, tag="stdout"):
-        self.widget = widget
-        self.tag = tag
-        self.stdout = sys.__stdout__
-
-    def write(self, s):
-        self.widget.config(state='normal')
-        self.widget.insert(tk.END, s, (self.tag,))
-        self.widget.see(tk.END)
-        self.widget.config(state='disabled')
-        self.stdout.write(s)
-
-    def flush(self):
-        self.stdout.flush()
-
 # --- ฟังก์ชัน main ที่ปรับแก้ใหม่สำหรับ gui_app.py (ย้ายมาจาก main.py) ---
 def run_gui_app(all_configs, gsheet_users_data):
     """
@@ -1440,18 +1466,23 @@ def run_gui_app(all_configs, gsheet_users_data):
     Receives pre-loaded configs and GSheet user data.
     This now acts as the primary entry point when main.py is removed.
     """
+    startup_profile.mark("gui module imported")
     root = tk.Tk()
     app = BookingApp(root, all_configs, gsheet_users_data)
+    startup_profile.mark("window created")
+    # รายงานหลังหน้าต่างแสดงผลแล้ว (เมื่อเปิด --startup-profile)
+    root.after_idle(startup_profile.report)
     root.mainloop()
 
 # --- บล็อกหลักสำหรับการรันโปรแกรม (ย้ายมาจาก main.py) ---
 if __name__ == "__main__":
+    # จำเป็นสำหรับ worker process (multiprocessing แบบ spawn) ใน build ของ PyInstaller
+    multiprocessing.freeze_support()
     # ตรวจสอบและสร้างไฟล์ config ถ้ายังไม่มี
     ensure_file_exists(USER_CONFIG_PATH, {"users": []})
     ensure_file_exists(LINE_USER_CONFIG_PATH, {"line_accounts": []})
     ensure_file_exists(BRANCH_CONFIG_PATH, [])
     ensure_file_exists(TIME_CONFIG_PATH, [])
-    ensure_file_exists(SCHEDULE_CONFIG_PATH, {"scheduled_bookings": []}) # เพิ่ม schedule_config.json
 
     # Load all necessary configs at the start
     all_configs = {
@@ -1460,12 +1491,14 @@ if __name__ == "__main__":
         'branches': load_json_config(BRANCH_CONFIG_PATH),
         'times': load_json_config(TIME_CONFIG_PATH),
     }
-    gsheet_users_data = load_user_credentials_from_gsheet()  # Load user credentials from GSheet
+    # โหลดผู้ใช้จาก cache ทันที แล้วรีเฟรชจาก Google Sheet ใน background
+    gsheet_users_data = UserDirectory(load_user_credentials_from_gsheet)
 
-    if not gsheet_users_data:
+    if not gsheet_users_data.load():
         print("❌ ไม่สามารถโหลดข้อมูลผู้ใช้จาก Google Sheet ได้. โปรแกรมไม่สามารถทำงานได้.")
         # messagebox.showerror("Error", "ไม่สามารถโหลดข้อมูลผู้ใช้จาก Google Sheet ได้. โปรแกรมไม่สามารถทำงานได้.")
         sys.exit(1) # ออกจากโปรแกรมหากโหลดข้อมูลไม่ได้
+    gsheet_users_data.start_background_refresh()
 
     print("Starting GUI mode...")
     run_gui_app(all_configs, gsheet_users_data)
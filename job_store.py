@@ -0,0 +1,211 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# ฐานข้อมูลรายการจองที่ตั้งเวลาไว้และประวัติการรัน (แทนการเขียน schedule_config.json ใหม่ทั้งไฟล์)
+JOB_DB_PATH = Path("data/booking_jobs.db")
+
+# key ใน settings ที่บอกว่า import schedule_config.json เดิมไปแล้ว
+IMPORTED_MARKER = "schedule_json_imported"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    username TEXT NOT NULL,
+    browser TEXT NOT NULL,
+    profile_name TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    time_str TEXT NOT NULL,
+    schedule_time TEXT NOT NULL,
+    enabled INTEGER NOT NULL DEFAULT 1,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_username ON jobs(username);
+CREATE INDEX IF NOT EXISTS idx_jobs_profile ON jobs(username, browser, profile_name);
+CREATE INDEX IF NOT EXISTS idx_jobs_fire ON jobs(enabled, schedule_time);
+
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER REFERENCES jobs(id) ON DELETE SET NULL,
+    job_name TEXT NOT NULL,
+    username TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    scheduled_for TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    status TEXT NOT NULL,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_job ON runs(job_id, started_at);
+CREATE INDEX IF NOT EXISTS idx_runs_username ON runs(username, started_at);
+
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+JOB_FIELDS = ("name", "username", "browser", "profile_name", "branch", "day", "time_str", "schedule_time", "enabled")
+
+
+def _job_from_row(row):
+    job = dict(row)
+    job["enabled"] = bool(job["enabled"])
+    return job
+
+
+class JobStore:
+    """
+    เก็บรายการจองที่ตั้งเวลาไว้ (jobs) และผลการรัน (runs) ใน SQLite (WAL mode)
+    แต่ละ thread ใช้ connection ของตัวเอง, การแก้ไขทุกครั้งเป็น transaction แถวเดียว
+    """
+
+    def __init__(self, db_path=JOB_DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: จัดการ BEGIN/COMMIT เองใน _transaction()
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # --- jobs ---
+
+    def list_jobs(self, username=None):
+        if username is None:
+            rows = self._conn().execute("SELECT * FROM jobs ORDER BY schedule_time, id").fetchall()
+        else:
+            rows = self._conn().execute(
+                "SELECT * FROM jobs WHERE username = ? ORDER BY schedule_time, id", (username,)
+            ).fetchall()
+        return [_job_from_row(row) for row in rows]
+
+    def upcoming_jobs(self, after_time_str):
+        """งานที่เปิดใช้งานและเวลาจองหลัง after_time_str ('YYYY-MM-DD HH:MM:SS') เรียงตามเวลา"""
+        rows = self._conn().execute(
+            "SELECT * FROM jobs WHERE enabled = 1 AND schedule_time > ? ORDER BY schedule_time, id",
+            (after_time_str,),
+        ).fetchall()
+        return [_job_from_row(row) for row in rows]
+
+    def get_job(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job_from_row(row) if row else None
+
+    def add_job(self, job, conn=None):
+        now = time.time()
+        values = [job[field] if field != "enabled" else int(bool(job[field])) for field in JOB_FIELDS]
+        sql = (f"INSERT INTO jobs ({', '.join(JOB_FIELDS)}, created_at, updated_at) "
+               f"VALUES ({', '.join('?' for _ in JOB_FIELDS)}, ?, ?)")
+        if conn is not None:
+            return conn.execute(sql, (*values, now, now)).lastrowid
+        with self._transaction() as conn:
+            return conn.execute(sql, (*values, now, now)).lastrowid
+
+    def update_job(self, job_id, job):
+        values = [job[field] if field != "enabled" else int(bool(job[field])) for field in JOB_FIELDS]
+        assignments = ", ".join(f"{field} = ?" for field in JOB_FIELDS)
+        with self._transaction() as conn:
+            cursor = conn.execute(f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ?", (*values, time.time(), job_id))
+        return cursor.rowcount == 1
+
+    def delete_job(self, job_id):
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return cursor.rowcount == 1
+
+    # --- runs ---
+
+    def start_run(self, job, scheduled_for=None, status="running"):
+        profile = f"{job['browser']} - {job['profile_name']}"
+        with self._transaction() as conn:
+            return conn.execute(
+                "INSERT INTO runs (job_id, job_name, username, profile, scheduled_for, started_at, status) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job.get("id"), job["name"], job["username"], profile, scheduled_for, time.time(), status),
+            ).lastrowid
+
+    def finish_run(self, run_id, status, message=None):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE runs SET finished_at = ?, status = ?, message = ? WHERE id = ?",
+                (time.time(), status, message, run_id),
+            )
+
+    def recent_runs(self, username=None, limit=50):
+        if username is None:
+            rows = self._conn().execute("SELECT * FROM runs ORDER BY started_at DESC LIMIT ?", (limit,)).fetchall()
+        else:
+            rows = self._conn().execute(
+                "SELECT * FROM runs WHERE username = ? ORDER BY started_at DESC LIMIT ?", (username, limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    # --- settings ---
+
+    def get_setting(self, key, default=None):
+        row = self._conn().execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def set_setting(self, key, value, conn=None):
+        sql = "INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value"
+        if conn is not None:
+            conn.execute(sql, (key, json.dumps(value)))
+            return
+        with self._transaction() as conn:
+            conn.execute(sql, (key, json.dumps(value)))
+
+    # --- import ---
+
+    def import_schedule_json(self, path):
+        """
+        import รายการจองจาก schedule_config.json เดิมครั้งเดียว (ครั้งต่อไปจะข้าม)
+        คืนจำนวนรายการที่ import
+        """
+        if self.get_setting(IMPORTED_MARKER):
+            return 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {}
+        except json.JSONDecodeError as e:
+            print(f"❌ import {path} ไม่ได้ (JSON ไม่ถูกต้อง): {e}")
+            return 0
+
+        jobs = data.get("scheduled_bookings", []) if isinstance(data, dict) else []
+        with self._transaction() as conn:
+            for job in jobs:
+                self.add_job({field: job.get(field, True if field == "enabled" else "") for field in JOB_FIELDS}, conn=conn)
+            if isinstance(data, dict) and "prewarm_lead_seconds" in data:
+                self.set_setting("prewarm_lead_seconds", data["prewarm_lead_seconds"], conn=conn)
+            self.set_setting(IMPORTED_MARKER, True, conn=conn)
+        if jobs:
+            print(f"📥 import รายการจอง {len(jobs)} รายการจาก {path} เข้าฐานข้อมูล {self.db_path}")
+        return len(jobs)
@@ -1,54 +1,49 @@
-import json
+import asyncio
 import os
-from pathlib import Path
-from playwright.sync_api import sync_playwright
-import shutil
+import time
 
-# import ฟังก์ชัน booking กับ load_config จาก site_rocketbooking.py
-from booking_scripts.site_rocketbooking import booking, load_config as load_site_config
+from adaptive_timeouts import save_history as save_timeout_history
+from booking_engine import get_engine
+from config_service import load_json
+from precise_scheduler import sleep_until
+from profile_manager import DEFAULT_LEASE_WAIT_SECONDS, acquire_lease, prepare_workdir, release_lease
+from resource_blocking import format_load_report, install_blocking, measure_page_load, resolve_launch_options
+from run_profiler import profiled_run, start_tracing, stop_tracing
+from session_store import apply_session, invalidate_session, load_fresh_session, save_session
+from tracing import span, trace_run
+from worker_pool import in_worker
+
+# ขั้นตอน booking (async) อยู่ใน booking_scripts/site_rocketbooking.py
+# import ตอนเริ่มจองครั้งแรก เพื่อไม่ให้ Playwright ถูกโหลดตอนเปิดโปรแกรม
 
 def load_config(path='user_config.json'):
     """
     โหลดไฟล์ user_config.json
     """
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return load_json(path)
 
-def get_user_data_dir_and_executable(username, browser, profile_name):
+def get_user_data_dir_and_executable(username, browser, profile_name, user_data_root=None, executable_path=None):
     """
-    กำหนดพาธ User Data และ Executable ของเบราว์เซอร์
-    ใช้ os.path.expanduser('~') เพื่อให้พาธยืดหยุ่นกับ username ของคอมพิวเตอร์
+    กำหนดพาธ User Data (โฟลเดอร์ทำงานที่ซิงก์จากโปรไฟล์จริง) และ Executable ของเบราว์เซอร์
+    ต้องเรียกขณะถือ lease ของโปรไฟล์ (ดู profile_manager.py)
     """
-    home_dir = Path(os.path.expanduser('~')) # C:\Users\<CurrentUsername>
-
-    if browser == 'chrome':
-        base_chrome_user_data_dir = home_dir / "AppData/Local/Google/Chrome/User Data"
-        
-        # ชื่อโฟลเดอร์ชั่วคราวจะอ้างอิงถึงชื่อโปรไฟล์
-        temp_user_data_dir = Path(f"./playwright_chrome_user_data_{profile_name}") 
-        source_profile_path = base_chrome_user_data_dir / profile_name
-
-        if not source_profile_path.is_dir():
-            print(f"❌ ไม่พบโปรไฟล์ Chrome '{profile_name}' ที่พาธ: {source_profile_path}. ตรวจสอบให้แน่ใจว่าโปรไฟล์นี้มีอยู่จริงใน Chrome.")
-            raise ValueError(f"ไม่พบโปรไฟล์ Chrome '{profile_name}'")
-        
-        if temp_user_data_dir.exists():
-            shutil.rmtree(temp_user_data_dir)
-            print(f"🗑️ ลบโฟลเดอร์ชั่วคราวเก่า: {temp_user_data_dir}")
-
-        shutil.copytree(source_profile_path, temp_user_data_dir)
-        print(f"📂 คัดลอกโปรไฟล์ '{profile_name}' ไปยัง: {temp_user_data_dir}")
+    return prepare_workdir(browser, profile_name, user_data_root, executable_path)
 
-        executable = r"C:\Program Files\Google\Chrome\Application\chrome.exe"
-        return str(temp_user_data_dir), executable
-
-    elif browser == 'edge':
-        base = home_dir / f"AppData/Local/Microsoft/Edge/User Data/{profile_name}"
-        executable = r"C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe"
-        return str(base), executable
-
-    else:
-        raise ValueError("Browser ต้องเป็น chrome หรือ edge")
+async def acquire_profile_lease_async(user_config):
+    """
+    ขอ lease ของโปรไฟล์ก่อนแตะโฟลเดอร์ทำงาน (รอใน thread เพื่อไม่บล็อก flow ของโปรไฟล์อื่น)
+    ถ้างานอื่นถือไว้เกิน lease_wait_seconds ของโปรไฟล์จะ raise ProfileBusyError
+    """
+    browser_name = user_config['browser'].lower()
+    profile_name = user_config.get('profile_name', 'Default')
+    wait_seconds = user_config.get("lease_wait_seconds", DEFAULT_LEASE_WAIT_SECONDS)
+    with span("profile_lease", browser=browser_name, profile=profile_name) as lease_attrs:
+        started = time.perf_counter()
+        lease = await asyncio.to_thread(
+            acquire_lease, browser_name, profile_name, f"{user_config['username']} (pid {os.getpid()})", wait_seconds
+        )
+        lease_attrs["wait_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return lease
 
 def load_time_config():
     """
@@ -56,84 +51,295 @@ def load_time_config():
     """
     time_file = os.path.join("branch", "time.json")
     try:
-        with open(time_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_json(time_file)
     except Exception as e:
         print(f"โหลดไฟล์ time.json ไม่ได้: {e}")
         return []
 
-# **เพิ่ม parameter สำหรับ LINE Login**
-def run_browser_for_user(user_config, branch, day, time_index, line_email=None, line_password=None):
+def resolve_time_str(time_index):
+    time_options = load_time_config()
+    if not time_options:
+        print("❌ ไม่มีข้อมูลเวลาใน time.json")
+        return None
+
+    if time_index >= len(time_options):
+        print("❌ ดัชนีเวลาที่เลือกไม่ถูกต้อง")
+        return None
+
+    return time_options[time_index]
+
+async def prepare_browser_for_user_async(playwright, user_config, line_email=None, line_password=None):
+    """
+    เปิดเบราว์เซอร์, โหลดหน้า Booking และผ่าน CAPTCHA/ตรวจ LINE Login ให้พร้อม
+    คืนค่า session dict (context, page, warmup_seconds) หรือ None ถ้าเตรียมไม่สำเร็จ
+    """
+    from booking_scripts.site_rocketbooking import BOOKING_URL, load_config as load_site_config, prepare_booking
+
+    started = time.perf_counter()
     username = user_config['username']
     browser_name = user_config['browser'].lower()
     profile_name = user_config.get('profile_name', 'Default')
 
-    user_data_dir, executable_path = get_user_data_dir_and_executable(username, browser_name, profile_name)
+    # การซิงก์โปรไฟล์เป็นงาน disk I/O จึงย้ายไปทำใน thread เพื่อไม่ให้บล็อก flow ของโปรไฟล์อื่น
+    with span("profile_prep", browser=browser_name, profile=profile_name):
+        user_data_dir, executable_path = await asyncio.to_thread(
+            get_user_data_dir_and_executable, username, browser_name, profile_name,
+            user_config.get("user_data_root"), user_config.get("executable_path"),
+        )
+
+    # session (cookies/localStorage) ที่บันทึกไว้หลังล็อกอินครั้งก่อน ตรวจจากไฟล์อย่างเดียวจึงเร็ว
+    saved_session, session_reason = load_fresh_session(browser_name, profile_name, BOOKING_URL)
 
+    args_list = [
+        "--disable-blink-features=AutomationControlled",
+        "--no-first-run",
+        "--no-default-browser-check"
+    ]
+
+    # live mode เปิดแบบมีหน้าต่างโดยปริยาย (ผู้ใช้อาจต้องผ่าน CAPTCHA/LINE เอง)
+    # โปรไฟล์ที่มี session พร้อมแล้วตั้ง "headless": true ได้ เพื่อรันบนเครื่องที่ไม่มีจอ (โหมด daemon)
+    launch_options = resolve_launch_options(user_config.get("launch_options"))
+
+    # context ถูกปิดเสมอถ้าเตรียมไม่สำเร็จ (รวมกรณี exception) ไม่ให้ Chromium ค้างถือโฟลเดอร์ทำงานของโปรไฟล์
+    browser_context = None
+    ready = False
     try:
-        with sync_playwright() as p:
-            args_list = [
-                "--disable-blink-features=AutomationControlled",
-                "--no-first-run",
-                "--no-default-browser-check"
-            ]
-            
-            browser_context = p.chromium.launch_persistent_context(
+        with span("browser_launch", browser=browser_name):
+            browser_context = await playwright.chromium.launch_persistent_context(
                 user_data_dir=user_data_dir,
                 executable_path=executable_path,
-                headless=False,
+                headless=launch_options["headless"],
                 args=args_list,
             )
+            blocking_stats = await install_blocking(browser_context, launch_options)
+            if saved_session is not None:
+                await apply_session(browser_context, saved_session)
+            # ถ้าเปิด profiling ไว้ (ดู run_profiler.py) บันทึก screenshot/DOM/network ของทั้งรอบ
+            await start_tracing(browser_context)
 
             if browser_context.pages:
                 page = browser_context.pages[0]
                 try:
-                    page.wait_for_load_state("domcontentloaded", timeout=5000)
+                    await page.wait_for_load_state("domcontentloaded", timeout=5000)
                 except Exception:
                     print("⚠️ แท็บเริ่มต้นโหลดไม่ทันเวลา, ลองดำเนินการต่อ...")
             else:
-                page = browser_context.new_page()
+                page = await browser_context.new_page()
 
-            time_options = load_time_config()
-            if not time_options:
-                print("❌ ไม่มีข้อมูลเวลาใน time.json")
-                return
+        with span("navigation", url=BOOKING_URL) as nav_attrs:
+            await page.goto(BOOKING_URL)
+            await page.wait_for_load_state("networkidle")
+            load_metrics = await measure_page_load(page)
+            nav_attrs.update(blocking=blocking_stats is not None, **(load_metrics or {}))
+        print(format_load_report(load_metrics, blocking_stats))
+        print(f"✅ เปิด browser สำหรับ {username} ({browser_name}, โปรไฟล์: {profile_name}) เรียบร้อย")
 
-            if time_index >= len(time_options):
-                print("❌ ดัชนีเวลาที่เลือกไม่ถูกต้อง")
-                return
+        site_config = load_site_config()
+        with span("session_cache") as session_attrs:
+            # ถ้าเว็บ redirect ออกจากหน้า Booking แสดงว่า session ที่ใส่ไปใช้ไม่ได้แล้ว
+            # (URL อย่างเดียวไม่พอ: prepare_booking ตรวจในหน้าอีกครั้งด้วย verify_session ก่อนข้ามการตรวจ LINE login)
+            session_hit = saved_session is not None and page.url.startswith(BOOKING_URL)
+            session_attrs["hit"] = session_hit
+            if session_hit:
+                saved_ms = saved_session.get("login_check_ms")
+                session_attrs["saved_ms"] = saved_ms
+                saved_text = f", ประหยัดเวลา ~{saved_ms / 1000:.2f} วินาที" if saved_ms else ""
+                print(f"⚡ Session cache hit ({session_reason}): ตรวจแค่หน้า Profile แทนการตรวจ LINE login เต็มรูปแบบ{saved_text}")
+            else:
+                if saved_session is not None:
+                    session_reason = f"ถูก redirect ไป {page.url}"
+                print(f"🔑 Session cache miss ({session_reason}): ตรวจ LINE login ตามปกติ")
 
-            time_str = time_options[time_index]
-            print(f"⏰ เวลาที่เลือก: {time_str}")
+        timings = {}
+        if not await prepare_booking(page, site_config, line_email, line_password, skip_login_check=session_hit, timings=timings):
+            from selector_chains import print_stale_summary
+            print_stale_summary()
+            if saved_session is not None:
+                invalidate_session(browser_name, profile_name)
+            return None
 
-            page.goto("https://popmartth.rocket-booking.app/booking")
-            page.wait_for_load_state("networkidle")
-            print(f"✅ เปิด browser สำหรับ {username} ({browser_name}, โปรไฟล์: {profile_name}) เรียบร้อย")
+        if session_hit and timings.get("session_rejected"):
+            # URL ยังอยู่ที่หน้า Booking แต่ตรวจในหน้าแล้วพบว่ายังไม่ได้ล็อกอิน (session ใช้ไม่ได้แล้ว)
+            session_hit = False
+        if not session_hit:
+            await _save_session_safely(browser_context, browser_name, profile_name, timings.get("login_check_ms"))
 
-            site_config = load_site_config()
+        ready = True
+        return {
+            "context": browser_context,
+            "page": page,
+            "site_config": site_config,
+            "browser": browser_name,
+            "profile_name": profile_name,
+            "session_hit": session_hit,
+            "warmup_seconds": time.perf_counter() - started,
+        }
+    finally:
+        if not ready and browser_context is not None:
+            await _close_context(browser_context)
 
-            # **เรียก booking พร้อมส่ง line_email และ line_password**
-            booking(page, branch, str(day), time_str, line_email, line_password)
+async def _close_context(context):
+    """บันทึก Playwright trace (ถ้าเปิด profiling) แล้วปิด context โดยไม่ให้ error ตอนปิดบัง error เดิม"""
+    await stop_tracing(context)
+    try:
+        await context.close()
+    except Exception as e:
+        print(f"⚠️ ปิดเบราว์เซอร์ไม่สำเร็จ: {e}")
 
-            input("กด Enter เพื่อปิด browser ...")
-            browser_context.close()
+async def _save_session_safely(context, browser_name, profile_name, login_check_ms=None):
+    try:
+        await save_session(context, browser_name, profile_name, login_check_ms)
+    except Exception as e:
+        print(f"⚠️ บันทึก session ของโปรไฟล์ '{profile_name}' ไม่ได้: {e}")
 
+async def _wait_before_close():
+    """
+    รอผู้ใช้กด Enter ก่อนปิดเบราว์เซอร์ (ให้ดูผลบนหน้าเว็บได้) เฉพาะเมื่อรันจาก terminal
+    ใน worker process (GUI / daemon) ผลการจองรู้แล้วจึงปิดทันที ไม่ให้ prompt ที่ไม่มีใครตอบทำให้งานเกินเวลา
+    """
+    if in_worker():
+        return
+    with span("close_prompt", category="human"):
+        try:
+            await asyncio.to_thread(input, "กด Enter เพื่อปิด browser ...")
+        except EOFError:
+            # ไม่มี stdin (หรือผู้ใช้ยกเลิก) = ปิดเลย
+            pass
+
+async def finish_booking_async(session, branch, day, time_str):
+    """รันขั้นตอนจองบนหน้าเว็บที่เตรียมไว้แล้ว จากนั้นรอผู้ใช้ปิดเบราว์เซอร์ คืน True เมื่อจองสำเร็จ"""
+    from booking_scripts.site_rocketbooking import run_booking_steps
+    from flow_engine import new_checkpoint
+
+    checkpoint = new_checkpoint()
+    try:
+        with span("booking_steps") as steps_attrs:
+            booked = await run_booking_steps(session["page"], session["site_config"], branch, str(day), time_str, checkpoint)
+            if checkpoint["retries"]:
+                # ถ้าไม่มี checkpoint แต่ละครั้งที่ล้มเหลวต้องเริ่มใหม่ตั้งแต่ซิงก์โปรไฟล์/เปิดเบราว์เซอร์/ล็อกอิน
+                recovered_ms = checkpoint["recovered_ms"] + checkpoint["retries"] * session["warmup_seconds"] * 1000
+                steps_attrs.update(retries=checkpoint["retries"], recovered_ms=round(recovered_ms, 1))
+                print(f"♻️ กู้คืนจากขั้นตอนที่ล้มเหลว {checkpoint['retries']} ครั้งบนหน้าเดิม "
+                      f"(ประหยัดเวลาเทียบกับเริ่มจองใหม่ ~{recovered_ms / 1000:.1f} วินาที, ขั้นตอนล่าสุดที่ผ่าน: {checkpoint['last_completed'] or '-'})")
+
+        if not booked and session["session_hit"]:
+            # จองไม่สำเร็จหลังข้ามการตรวจ LINE login: รอบหน้าให้ตรวจใหม่
+            invalidate_session(session["browser"], session["profile_name"])
+
+        await _wait_before_close()
+        if booked:
+            # เก็บ session ล่าสุด (เว็บอาจต่ออายุ cookie ระหว่างรัน) ก่อนปิดเบราว์เซอร์
+            await _save_session_safely(session["context"], session["browser"], session["profile_name"])
     finally:
-        if browser_name == 'chrome' and Path(user_data_dir).exists():
-            shutil.rmtree(user_data_dir)
-            print(f"🗑️ ลบโฟลเดอร์ชั่วคราว: {user_data_dir}")
+        await _close_context(session["context"])
+    return booked
 
 # **เพิ่ม parameter สำหรับ LINE Login**
-def run_live_mode_for_user(username, browser, profile_name, branch, day, time_index, line_email=None, line_password=None):
+async def run_browser_for_user_async(playwright, user_config, branch, day, time_index, line_email=None, line_password=None):
+    time_str = resolve_time_str(time_index)
+    if time_str is None:
+        return False
+    print(f"⏰ เวลาที่เลือก: {time_str}")
+
+    with trace_run("live", username=user_config['username'], profile=user_config.get('profile_name', 'Default'), branch=branch, day=day, time=time_str):
+        async with profiled_run("live", f"{user_config['username']}_{user_config.get('profile_name', 'Default')}"):
+            lease = await acquire_profile_lease_async(user_config)
+            try:
+                session = await prepare_browser_for_user_async(playwright, user_config, line_email, line_password)
+                if session is None:
+                    return False
+
+                return await finish_booking_async(session, branch, day, time_str)
+            finally:
+                release_lease(lease)
+                # เวลาที่ใช้จริงของแต่ละขั้นตอนในรอบนี้ ใช้ปรับ timeout ของรอบหน้า (ดู adaptive_timeouts.py)
+                save_timeout_history()
+
+async def run_prewarmed_browser_for_user_async(playwright, user_config, branch, day, time_index, fire_at, line_email=None, line_password=None):
+    """
+    Pre-warm: เตรียมเบราว์เซอร์ล่วงหน้า แล้วรอจนถึง fire_at (epoch seconds) จึงเริ่มขั้นตอนจองทันที
+    เวลาที่ใช้เตรียมตัวจะไม่ถูกนับรวมในช่วงเวลาจอง
+    """
+    time_str = resolve_time_str(time_index)
+    if time_str is None:
+        return False
+    print(f"⏰ เวลาที่เลือก: {time_str}")
+
+    with trace_run("live_prewarmed", username=user_config['username'], profile=user_config.get('profile_name', 'Default'), branch=branch, day=day, time=time_str):
+        async with profiled_run("live_prewarmed", f"{user_config['username']}_{user_config.get('profile_name', 'Default')}"):
+            lease = await acquire_profile_lease_async(user_config)
+            try:
+                session = await prepare_browser_for_user_async(playwright, user_config, line_email, line_password)
+                if session is None:
+                    return False
+
+                # ระหว่างรอถึงเวลาจอง context ยังไม่ได้ส่งให้ finish_booking_async ปิด
+                try:
+                    warmup_seconds = session["warmup_seconds"]
+                    remaining = fire_at - time.time()
+                    if remaining > 0:
+                        print(f"🔥 Pre-warm เสร็จใน {warmup_seconds:.2f} วินาที, รออีก {remaining:.2f} วินาทีถึงเวลาจอง...")
+                        with span("prewarm_idle", category="idle") as idle_attrs:
+                            jitter_ms = await sleep_until(fire_at)
+                            idle_attrs["jitter_ms"] = round(jitter_ms, 2)
+                        print(f"⏱️ ถึงเวลาจอง: ตื่นช้ากว่าเป้าหมาย {jitter_ms:+.2f} ms")
+                        saved_seconds = warmup_seconds
+                    else:
+                        print(f"⚠️ Pre-warm เสร็จช้ากว่าเวลาจอง {-remaining:.2f} วินาที (ควรเพิ่ม lead time)")
+                        saved_seconds = max(0.0, warmup_seconds + remaining)
+
+                    print(f"⚡ Pre-warm: ประหยัดเวลาในช่วงจองได้ ~{saved_seconds:.2f} วินาที (user: {user_config['username']}, โปรไฟล์: {user_config.get('profile_name', 'Default')})")
+                except BaseException:
+                    await _close_context(session["context"])
+                    raise
+                return await finish_booking_async(session, branch, day, time_str)
+            finally:
+                release_lease(lease)
+                # เวลาที่ใช้จริงของแต่ละขั้นตอนในรอบนี้ ใช้ปรับ timeout ของรอบหน้า (ดู adaptive_timeouts.py)
+                save_timeout_history()
+
+def run_browser_for_user(user_config, branch, day, time_index, line_email=None, line_password=None):
+    """Sync wrapper: ส่ง flow เข้า BookingEngine แล้วรอจนเสร็จ คืน True เมื่อจองสำเร็จ"""
+    return get_engine().run(
+        lambda playwright: run_browser_for_user_async(playwright, user_config, branch, day, time_index, line_email, line_password)
+    )
+
+def find_user_config(username, browser, profile_name):
     config = load_config()
     users = config.get('users', [])
     matched_users = [
         u for u in users if u['username'] == username and u['browser'] == browser and u['profile_name'] == profile_name
     ]
+    return matched_users[0] if matched_users else None
 
-    if not matched_users:
+# **เพิ่ม parameter สำหรับ LINE Login**
+async def run_live_mode_for_user_async(playwright, username, browser, profile_name, branch, day, time_index, line_email=None, line_password=None):
+    user_config = find_user_config(username, browser, profile_name)
+
+    if not user_config:
         print("❌ ไม่พบ config ที่ตรงกับข้อมูลที่ระบุ")
-        return
+        return False
+
+    # **ส่ง line_email และ line_password ไปยัง run_browser_for_user_async**
+    return await run_browser_for_user_async(playwright, user_config, branch, day, time_index, line_email, line_password)
+
+def run_live_mode_for_user(username, browser, profile_name, branch, day, time_index, line_email=None, line_password=None):
+    """Sync wrapper ของ run_live_mode_for_user_async (ใช้กับ CLI) คืน True เมื่อจองสำเร็จ"""
+    return get_engine().run(
+        lambda playwright: run_live_mode_for_user_async(playwright, username, browser, profile_name, branch, day, time_index, line_email, line_password)
+    )
+
+async def run_prewarmed_live_mode_for_user_async(playwright, username, browser, profile_name, branch, day, time_index, fire_at, line_email=None, line_password=None):
+    user_config = find_user_config(username, browser, profile_name)
+
+    if not user_config:
+        print("❌ ไม่พบ config ที่ตรงกับข้อมูลที่ระบุ")
+        return False
+
+    return await run_prewarmed_browser_for_user_async(playwright, user_config, branch, day, time_index, fire_at, line_email, line_password)
 
-    # **ส่ง line_email และ line_password ไปยัง run_browser_for_user**
-    run_browser_for_user(matched_users[0], branch, day, time_index, line_email, line_password)
\ No newline at end of file
+def run_prewarmed_live_mode_for_user(username, browser, profile_name, branch, day, time_index, fire_at, line_email=None, line_password=None):
+    """Sync wrapper ของ run_prewarmed_live_mode_for_user_async (ใช้ใน worker process) คืน True เมื่อจองสำเร็จ"""
+    return get_engine().run(
+        lambda playwright: run_prewarmed_live_mode_for_user_async(playwright, username, browser, profile_name, branch, day, time_index, fire_at, line_email, line_password)
+    )
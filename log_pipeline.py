@@ -0,0 +1,102 @@
+import collections
+import sys
+import tkinter as tk
+
+# จำนวนบรรทัดสูงสุดที่เก็บไว้ในช่อง Log (บรรทัดเก่าสุดจะถูกลบออก)
+DEFAULT_MAX_LINES = 5000
+# ความถี่ที่ Tk loop ดึง log ที่ค้างอยู่ไปแสดง (ms ต่อเฟรม)
+DEFAULT_FRAME_MS = 50
+
+
+class LogSink:
+    """
+    ปลายทางของ log สำหรับ Text widget ที่เรียกได้จากทุก thread
+    - write() แค่ต่อข้อความเข้าคิว (deque) ไม่แตะ widget
+    - Tk loop ดึงคิวทั้งหมดทุก frame_ms แล้ว insert เป็นชุดเดียว
+    - เก็บไว้ไม่เกิน max_lines บรรทัด (ทั้งในคิวและใน widget)
+    """
+
+    def __init__(self, widget, max_lines=DEFAULT_MAX_LINES, frame_ms=DEFAULT_FRAME_MS, echo=True):
+        self.widget = widget
+        self.max_lines = max_lines
+        self.frame_ms = frame_ms
+        # echo ไปที่ console เดิมด้วย (build แบบไม่มี console sys.__stdout__ จะเป็น None)
+        self._console = sys.__stdout__ if echo else None
+        # deque.append/popleft ปลอดภัยข้าม thread; ถ้าค้างเกิน maxlen ข้อความเก่าสุดจะถูกทิ้ง
+        self._pending = collections.deque(maxlen=max_lines * 2)
+        self._after_id = None
+
+    def write(self, text, tag="stdout"):
+        if not text:
+            return
+        self._pending.append((text, tag))
+        if self._console is not None:
+            try:
+                self._console.write(text)
+            except (OSError, ValueError):
+                pass
+
+    def flush(self):
+        if self._console is not None:
+            self._console.flush()
+
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.widget.after(self.frame_ms, self._drain)
+
+    def stop(self):
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _take_batch(self):
+        # รวมข้อความที่ติดกันและ tag เดียวกันเป็นก้อนเดียว เพื่อ insert ให้น้อยครั้งที่สุด
+        batch = []
+        while True:
+            try:
+                text, tag = self._pending.popleft()
+            except IndexError:
+                break
+            if batch and batch[-1][1] == tag:
+                batch[-1][0].append(text)
+            else:
+                batch.append(([text], tag))
+        return [("".join(parts), tag) for parts, tag in batch]
+
+    def _drain(self):
+        self._after_id = None
+        try:
+            batch = self._take_batch()
+            if batch:
+                self._render(batch)
+        finally:
+            if self.widget.winfo_exists():
+                self._after_id = self.widget.after(self.frame_ms, self._drain)
+
+    def _render(self, batch):
+        widget = self.widget
+        # เลื่อนตามท้ายเฉพาะตอนที่ผู้ใช้ดูบรรทัดล่าสุดอยู่ (ไม่กระโดดถ้ากำลังเลื่อนดูย้อนหลัง)
+        follow = widget.yview()[1] >= 0.999
+        widget.config(state="normal")
+        for text, tag in batch:
+            widget.insert(tk.END, text, (tag,))
+        line_count = int(widget.index("end-1c").split(".")[0])
+        if line_count > self.max_lines:
+            widget.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+        widget.config(state="disabled")
+        if follow:
+            widget.see(tk.END)
+
+
+class TextRedirector:
+    """ใช้แทน sys.stdout/sys.stderr เพื่อส่งทุก print เข้า LogSink"""
+
+    def __init__(self, sink, tag="stdout"):
+        self.sink = sink
+        self.tag = tag
+
+    def write(self, s):
+        self.sink.write(s, self.tag)
+
+    def flush(self):
+        self.sink.flush()
@@ -1,4 +1,6 @@
+import argparse
 import json
+import multiprocessing
 from pathlib import Path
 import sys
 import os
@@ -8,8 +10,16 @@ import datetime
 script_dir = Path(__file__).resolve().parent
 sys.path.append(str(script_dir))
 
+# python main.py --startup-profile : จับเวลา import/การเปิดโปรแกรม ต้องเริ่มก่อน import โมดูลอื่นของโปรเจกต์
+import startup_profile
+if "--startup-profile" in sys.argv[1:]:
+    startup_profile.install()
+
 from live_mode import run_live_mode_for_user
 from trial_mode import start_trial_mode as run_trial_mode # หากยังคงใช้ trial mode
+from config_service import load_json
+import run_profiler
+from user_directory import UserDirectory
 from utils import connect_gsheet # สำหรับการโหลดข้อมูลผู้ใช้จาก Google Sheet
 
 # --- พาธไปยัง config ไฟล์ต่างๆ ---
@@ -17,6 +27,7 @@ USER_CONFIG_PATH = Path("user_config.json")
 LINE_USER_CONFIG_PATH = Path("booking_elements/config_line_user.json")
 BRANCH_CONFIG_PATH = Path("branch/config.json")
 TIME_CONFIG_PATH = Path("branch/time.json")
+SCHEDULE_CONFIG_PATH = Path("booking_elements/schedule_config.json")
 
 # กำหนดค่า Role เริ่มต้น (ใช้เป็นค่า fallback หากข้อมูลจาก Google Sheet ไม่สมบูรณ์)
 DEFAULT_USER_ROLES = {
@@ -92,17 +103,14 @@ def authenticate_user(username, password, gsheet_users_data):
     Authenticates a user against data loaded from Google Sheet.
     Returns (user_data_dict) on success, or None on failure.
     The user_data_dict will contain 'username', 'role', 'max_profiles', 'can_use_scheduler'.
+    gsheet_users_data is a UserDirectory (lookup by username index, cached on disk).
     """
-    for user_cred in gsheet_users_data:
-        if user_cred.get("username") == username and user_cred.get("password") == password:
-            return user_cred # Return the full user data dict
-    return None
+    return gsheet_users_data.authenticate(username, password)
 
 def load_json_config(path):
     """Helper to load JSON config safely."""
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_json(path)
     except FileNotFoundError:
         print(f"❌ Config file not found: {path}")
         return {}
@@ -223,7 +231,115 @@ def run_cli_mode(all_configs, gsheet_users_data):
     else:
         print("❌ Username หรือ Password ไม่ถูกต้อง.")
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Popmartth Rocket Booking Bot")
+    parser.add_argument("--gui", action="store_true", help="เปิดหน้าต่าง GUI (ค่าเริ่มต้นคือโหมด CLI แบบถามตอบ)")
+    parser.add_argument("--trace-summary", action="store_true", help="สรุปเวลาแต่ละขั้นตอนจาก logs/booking_trace.jsonl แล้วจบ")
+    parser.add_argument("--startup-profile", action="store_true", help="จับเวลา import/การเปิดโปรแกรม")
+    # ใช้ชื่อ --profile-run เพราะ --profile ของคำสั่ง book คือชื่อโปรไฟล์เบราว์เซอร์
+    parser.add_argument("--profile-run", action="store_true",
+                        help="เก็บ cProfile และ Playwright trace ของทุกการจองลง logs/profiles (ใช้ได้ทุกโหมด รวม book/daemon)")
+    subparsers = parser.add_subparsers(dest="command")
+
+    # python main.py book --user u --password p --browser chrome --profile "Profile 1" --branch X --day 15 --time 10:00
+    # python main.py book --job job.json   (key เดียวกับรายการจองใน job_store, argument ที่ระบุจะทับค่าในไฟล์)
+    book = subparsers.add_parser("book", help="จองหนึ่งครั้งโดยไม่ต้องถามตอบ แล้วจบ (exit code 0 = สำเร็จ)")
+    book.add_argument("--job", type=Path, help="ไฟล์ JSON ของรายการจอง")
+    book.add_argument("--user", dest="username")
+    book.add_argument("--password", default=os.environ.get("BOOKING_PASSWORD"), help="หรือตั้ง environment variable BOOKING_PASSWORD")
+    book.add_argument("--browser")
+    book.add_argument("--profile", dest="profile_name")
+    book.add_argument("--branch")
+    book.add_argument("--day", type=int)
+    book.add_argument("--time", dest="time_str")
+    book.add_argument("--at", dest="schedule_time", help='เวลาจอง "YYYY-MM-DD HH:MM:SS": pre-warm ก่อนแล้วเริ่มจองตรงเวลา')
+    book.add_argument("--log-file", type=Path, default=None)
+    book.add_argument("--verbose", action="store_true")
+
+    # python main.py daemon : รันรายการจองที่ตั้งเวลาไว้ทั้งหมดโดยไม่มี Tk จนได้รับ SIGINT/SIGTERM
+    daemon = subparsers.add_parser("daemon", help="รัน scheduler ของรายการจองที่ตั้งเวลาไว้โดยไม่มีหน้าจอ")
+    daemon.add_argument("--rescan", type=float, default=None, help="ตรวจรายการจองใหม่ทุกกี่วินาที")
+    daemon.add_argument("--grace", type=float, default=None, help="เวลาที่รองานที่ทำอยู่ให้จบเมื่อได้รับสัญญาณหยุด (วินาที)")
+    daemon.add_argument("--log-file", type=Path, default=None)
+    daemon.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+def load_job_spec(args):
+    """รวมไฟล์ --job กับ argument ของคำสั่ง book, คืน (job dict, fire_at หรือ None)"""
+    job = {}
+    if args.job:
+        job.update(load_json_config(args.job))
+    for key in ("username", "browser", "profile_name", "branch", "day", "time_str", "schedule_time"):
+        value = getattr(args, key)
+        if value is not None:
+            job[key] = value
+
+    missing = [key for key in ("username", "browser", "profile_name", "branch", "day", "time_str") if job.get(key) in (None, "")]
+    if missing:
+        raise ValueError(f"ข้อมูลการจองไม่ครบ: {', '.join(missing)}")
+    job["day"] = int(job["day"])
+
+    fire_at = None
+    if job.get("schedule_time"):
+        fire_at = datetime.datetime.strptime(job["schedule_time"], "%Y-%m-%d %H:%M:%S").timestamp()
+    return job, fire_at
+
+def run_book_command(args, all_configs, gsheet_users_data):
+    import booking_daemon
+
+    try:
+        job, fire_at = load_job_spec(args)
+    except (ValueError, TypeError) as e:
+        print(f"❌ {e}")
+        return 2
+
+    password = job.get("password") or args.password
+    if not password or not authenticate_user(job["username"], password, gsheet_users_data):
+        print("❌ Username หรือ Password ไม่ถูกต้อง.")
+        return 2
+    if not booking_daemon.profile_allowed(gsheet_users_data, all_configs['user_profiles'], job):
+        print(f"❌ ไม่พบโปรไฟล์ {job['browser']} - {job['profile_name']} หรือเกินจำนวนโปรไฟล์ที่ใช้ได้ของ '{job['username']}'.")
+        return 2
+
+    booking_daemon.setup_logging(args.log_file or booking_daemon.DAEMON_LOG_PATH, args.verbose)
+    booked = booking_daemon.run_once(
+        all_configs, gsheet_users_data,
+        lambda username, profile_name: load_line_credentials(username, profile_name, all_configs['line_accounts']),
+        job, fire_at=fire_at,
+    )
+    return 0 if booked else 1
+
+def run_daemon_command(args, all_configs, gsheet_users_data):
+    import booking_daemon
+
+    booking_daemon.setup_logging(args.log_file or booking_daemon.DAEMON_LOG_PATH, args.verbose)
+    booking_daemon.run_daemon(
+        all_configs, gsheet_users_data,
+        lambda username, profile_name: load_line_credentials(username, profile_name, load_json_config(LINE_USER_CONFIG_PATH).get("line_accounts", [])),
+        schedule_json_path=SCHEDULE_CONFIG_PATH,
+        rescan_seconds=args.rescan if args.rescan is not None else booking_daemon.DEFAULT_RESCAN_SECONDS,
+        grace_seconds=args.grace if args.grace is not None else booking_daemon.DEFAULT_SHUTDOWN_GRACE_SECONDS,
+    )
+    return 0
+
 def start():
+    args = parse_args()
+
+    # python main.py --trace-summary : สรุปเวลาแต่ละขั้นตอนจาก logs/booking_trace.jsonl และ timeout ที่ปรับจากประวัติ แล้วจบ
+    if args.trace_summary:
+        from adaptive_timeouts import print_summary as print_timeout_summary
+        from tracing import print_summary
+        print_summary()
+        print()
+        print_timeout_summary()
+        return 0
+
+    # ตั้งผ่าน environment เพื่อให้ worker process ที่เริ่มหลังจากนี้ profile ด้วย (ดู run_profiler.py)
+    if args.profile_run:
+        run_profiler.set_enabled(True)
+
+    startup_profile.mark("imports done")
+
     # Load all necessary configs at the start
     all_configs = {
         'user_profiles': load_json_config(USER_CONFIG_PATH),
@@ -231,24 +347,35 @@ def start():
         'branches': load_json_config(BRANCH_CONFIG_PATH),
         'times': load_json_config(TIME_CONFIG_PATH),
     }
-    gsheet_users_data = load_user_credentials_from_gsheet() # Load user credentials from GSheet
+    startup_profile.mark("configs loaded")
+    # โหลดผู้ใช้จาก cache ทันที แล้วรีเฟรชจาก Google Sheet ใน background
+    gsheet_users_data = UserDirectory(load_user_credentials_from_gsheet)
 
-    if not gsheet_users_data:
+    if not gsheet_users_data.load():
         print("❌ ไม่สามารถโหลดข้อมูลผู้ใช้จาก Google Sheet ได้. โปรแกรมไม่สามารถทำงานได้.")
-        return
+        return 1
+    gsheet_users_data.start_background_refresh()
+    startup_profile.mark("users loaded")
+
+    if args.command == "book":
+        return run_book_command(args, all_configs, gsheet_users_data)
+    if args.command == "daemon":
+        return run_daemon_command(args, all_configs, gsheet_users_data)
 
     # Check if a specific mode is requested via command line arguments
     # python main.py --gui or python main.py --cli
-    mode_arg = sys.argv[1] if len(sys.argv) > 1 else ""
-
-    if mode_arg == "--gui":
+    if args.gui:
         print("Starting GUI mode...")
         # Import gui_app here to avoid circular imports if gui_app imports main
         from gui_app import run_gui_app # Assuming run_gui_app is a function in gui_app.py that starts the Tkinter loop
         run_gui_app(all_configs, gsheet_users_data)
     else: # Default to CLI mode if no --gui arg or other unrecognized arg
+        startup_profile.report()
         run_cli_mode(all_configs, gsheet_users_data)
+    return 0
 
 
 if __name__ == "__main__":
-    start()
\ No newline at end of file
+    # จำเป็นสำหรับ worker process (multiprocessing แบบ spawn) ใน build ของ PyInstaller
+    multiprocessing.freeze_support()
+    sys.exit(start())
@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('user_config.json', '.'), ('booking_elements', 'booking_elements'), ('branch', 'branch'), ('credentials.json', '.')],
-    hiddenimports=['tkinter', 'tkinter.ttk', 'gspread', 'google.oauth2.service_account', 'schedule', 'requests'],
+    hiddenimports=['tkinter', 'tkinter.ttk', 'gspread', 'google.oauth2.service_account', 'requests'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
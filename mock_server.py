@@ -0,0 +1,529 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# เว็บจำลองสำหรับทดสอบ booking flow แบบออฟไลน์
+# DOM ของแต่ละหน้าเลียนแบบ selectors ใน booking_elements/rocketbooking.json, pmrocket.json, ithitec.json
+# ใช้งาน: python mock_server.py --port 8765 --latency-ms 150 --captcha
+# แล้วตั้ง BOOKING_MOCK_URL=http://127.0.0.1:8765 ก่อนรันบอท เพื่อให้ทุก flow วิ่งมาที่เว็บนี้
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+BRANCH_CONFIG_PATH = Path("branch/config.json")
+TIME_CONFIG_PATH = Path("branch/time.json")
+
+# รายชื่อสาขา/เวลาสำรอง ถ้าโหลดจากโฟลเดอร์ branch ไม่ได้
+FALLBACK_BRANCHES = ["Terminal 21", "Centralworld", "Siam Center"]
+FALLBACK_TIMES = ["10:30", "11:00", "11:30", "12:00"]
+
+MOCK_LINE_COOKIE = "mock_line_linked"
+
+
+def _load_list(path, fallback):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, list) and data else fallback
+    except (OSError, json.JSONDecodeError):
+        return fallback
+
+
+# --- HTML ---
+
+_WIZARD_JS = """
+async function api(path, body) {
+  const opts = body ? {method: "POST", headers: {"Content-Type": "application/json"}, body: JSON.stringify(body)} : {};
+  const r = await fetch(path, opts);
+  return r.json();
+}
+function el(tag, attrs, text) {
+  const e = document.createElement(tag);
+  for (const [k, v] of Object.entries(attrs || {})) {
+    if (k === "class") e.className = v; else if (k === "disabled") e.disabled = v; else e.setAttribute(k, v);
+  }
+  if (text !== undefined) e.textContent = text;
+  return e;
+}
+function daysInMonth() {
+  const now = new Date();
+  return new Date(now.getFullYear(), now.getMonth() + 1, 0).getDate();
+}
+const booking = {site: SITE};
+"""
+
+# script ช่วยอยู่ใน <head> เพื่อไม่ให้นับเป็น child ของ #root (selectors ของจริงใช้ nth-child)
+_ROCKET_HEAD = """<!doctype html>
+<html><head><meta charset="utf-8"><title>{title}</title>
+<script>const SITE = "rocketbooking";{wizard}</script>
+</head>
+<body><div id="root">
+<header><a href="/profile">Profile</a></header>
+"""
+
+_ROCKET_NAV = """<div class="sc-715cd296-0 ipiVos"><div>
+<div><a href="/booking/event"><div class="sc-715cd296-3 bKZdFH"><img alt="Booking" width="120" height="60" src="data:image/gif;base64,R0lGODlhAQABAAAAACw="></div></a></div>
+<div><a href="/profile"><div><span>Profile</span></div></a></div>
+</div></div>
+"""
+
+_CAPTCHA_FORM = """<div id="captcha-wrapper"><form>
+<div>Let's confirm you are human</div>
+<div>Complete the security check before continuing.</div>
+<div><div><div>
+<div>Choose all the pictures of POP MART boxes</div>
+<div><canvas width="300" height="300"><button type="button">1</button><button type="button">2</button></canvas></div>
+</div></div></div>
+<button type="button" id="amzn-captcha-verify-button">Begin</button>
+</form></div>
+<script>
+(function () {
+  const begin = document.getElementById("amzn-captcha-verify-button");
+  begin.addEventListener("click", () => {
+    const confirm = el("button", {type: "button", id: "amzn-btn-verify-internal"}, "Confirm");
+    confirm.addEventListener("click", () => {
+      document.getElementById("captcha-wrapper").remove();
+      document.getElementById("booking-home").hidden = false;
+    });
+    begin.replaceWith(confirm);
+  });
+})();
+</script>
+"""
+
+_ROCKET_EVENT_BODY = """<div class="sc-98fa634e-0 fIUykr">
+<div class="ant-flex css-kghr11 ant-flex-align-center ant-flex-justify-center ant-flex-vertical">{event}</div>
+</div>
+<div id="step"></div>
+<script>
+const step = document.getElementById("step");
+function nextButton(label, onClick) {
+  const b = el("button", {type: "button", disabled: true}, label);
+  b.addEventListener("click", onClick);
+  return b;
+}
+function showBranches(branches) {
+  step.replaceChildren();
+  const list = el("div", {class: "branch-list"});
+  const next = nextButton("Next", showDateTime);
+  for (const name of branches) {
+    const wrap = el("div");
+    const b = el("button", {type: "button"}, name);
+    b.addEventListener("click", () => { booking.branch = name; next.disabled = false; });
+    wrap.appendChild(b);
+    list.appendChild(wrap);
+  }
+  step.append(list, next);
+}
+function showDateTime() {
+  step.replaceChildren();
+  const grid = el("div", {id: "calendar-grid"});
+  const slots = el("div", {class: "time-slot-buttons"});
+  const next = nextButton("Next", showConfirm);
+  for (let d = 1; d <= daysInMonth(); d++) {
+    const b = el("button", {type: "button", class: "day-cell"}, String(d));
+    b.addEventListener("click", async () => {
+      booking.day = d;
+      const times = await api("/api/times?day=" + d);
+      slots.replaceChildren();
+      for (const t of times) {
+        const tb = el("button", {type: "button"}, t);
+        tb.addEventListener("click", () => { booking.time = t; next.disabled = false; });
+        slots.appendChild(tb);
+      }
+    });
+    grid.appendChild(b);
+  }
+  step.append(grid, slots, next);
+}
+function showConfirm() {
+  step.replaceChildren();
+  const box = el("input", {type: "checkbox", id: "accept"});
+  const label = el("label", {for: "accept"}, "I accept the terms");
+  const confirm = nextButton("Confirm Booking", async () => {
+    const result = await api("/api/book", booking);
+    step.replaceChildren(el("div", {class: "booking-success"}, "Booking confirmed #" + result.id));
+  });
+  box.addEventListener("change", () => { confirm.disabled = !box.checked; });
+  step.append(box, label, confirm);
+}
+const register = document.getElementById("register");
+if (register) {
+  register.addEventListener("click", async () => {
+    document.querySelector(".fIUykr").remove();
+    showBranches(await api("/api/branches"));
+  });
+}
+</script>
+"""
+
+_ROCKET_EVENT_CARD = """<div class="event-card"><h3>POP MART Mock Event</h3><button type="button" id="register">Register</button></div>"""
+_ROCKET_NO_EVENT = """<div>ไม่มีอีเว้นต์ในขณะนี้</div>"""
+
+_ROCKET_PROFILE_BODY = """<div class="sc-396c748-0 YUIJZ">
+<div class="ant-flex css-kghr11 ant-flex-align-center ant-flex-justify-center ant-flex-vertical">{line_status}</div>
+</div>
+<div id="line-modal"></div>
+{nav}
+<script>
+const initial = document.getElementById("line-connect");
+if (initial) {
+  initial.addEventListener("click", () => {
+    const outer = el("div", {class: "sc-7d3b8656-0 gmBTzU"});
+    const inner = el("div", {class: "sc-48e8cede-3 kLicsn"});
+    const b = el("button", {type: "button"}, "Connect LINE Account*");
+    b.addEventListener("click", () => { window.location.href = "/line/login"; });
+    inner.appendChild(b);
+    outer.appendChild(inner);
+    document.getElementById("line-modal").replaceChildren(outer);
+  });
+}
+</script>
+"""
+
+_LINE_LOGIN_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>LINE Login</title></head>
+<body><div id="app"><div><div><div><div class="MdBox01"><div>
+<form method="post" action="/line/login"><fieldset>
+<legend>LINE</legend>
+<div><input type="text" name="email" placeholder="Email address"></div>
+<div><input type="password" name="password" placeholder="Password"></div>
+<div class="mdFormGroup01Btn"><button type="submit">Log in</button></div>
+</fieldset></form>
+</div></div></div></div></div></div></body></html>
+"""
+
+_PMROCKET_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>PM Rocket Mock</title></head>
+<body><div id="root"><div><div class="step"><div id="content">
+<h2>POP MART Mock Event</h2>
+<button type="button" id="register">Register</button>
+</div></div></div></div>
+<script>
+const SITE = "pmrocket";
+{wizard}
+const content = document.getElementById("content");
+function stepButton(label, onClick) {
+  const b = el("button", {type: "button", disabled: true}, label);
+  b.addEventListener("click", onClick);
+  return b;
+}
+document.getElementById("register").addEventListener("click", async () => {
+  const branches = await api("/api/branches");
+  const list = el("div");
+  const next = stepButton("Next", showDateTime);
+  for (const name of branches) {
+    const b = el("button", {type: "button"}, name);
+    b.addEventListener("click", () => { booking.branch = name; next.disabled = false; });
+    list.appendChild(b);
+  }
+  content.replaceChildren(list, next);
+});
+function showDateTime() {
+  const grid = el("div", {id: "calendar-grid"});
+  const slots = el("div", {class: "button-grid"});
+  const next = stepButton("Next", showConfirm);
+  for (let d = 1; d <= daysInMonth(); d++) {
+    const b = el("button", {type: "button", class: "day-cell"}, String(d));
+    b.addEventListener("click", async () => {
+      booking.day = d;
+      const times = await api("/api/times?day=" + d);
+      slots.replaceChildren();
+      for (const t of times) {
+        const tb = el("button", {type: "button"}, t);
+        tb.addEventListener("click", () => { booking.time = t; next.disabled = false; });
+        slots.appendChild(tb);
+      }
+    });
+    grid.appendChild(b);
+  }
+  content.replaceChildren(grid, slots, next);
+}
+function showConfirm() {
+  const box = el("input", {type: "checkbox", id: "final-checkbox"});
+  const confirm = stepButton("Confirm", async () => {
+    const result = await api("/api/book", booking);
+    content.replaceChildren(el("div", {class: "booking-success"}, "Booking confirmed #" + result.id));
+  });
+  box.addEventListener("change", () => { confirm.disabled = !box.checked; });
+  content.replaceChildren(box, confirm);
+}
+</script>
+</body></html>
+"""
+
+_ITHITEC_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>ITHITEC Mock</title></head>
+<body>
+<div id="step-register"><div><div><div class="event-card">
+<h2>POP MART Mock Event</h2>
+<div class="register-section"><div><button type="button">Register Now</button></div></div>
+</div></div></div></div>
+<div id="step-branch" hidden><div id="branch-list-container"></div><button type="button" id="branch-next-btn" disabled>Next</button></div>
+<div id="step-datetime" hidden>
+<div id="calendar-grid"></div>
+<div class="time-select-section"><div id="time-slots-grid"></div></div>
+<button type="button" id="datetime-next-btn" disabled>Next</button>
+</div>
+<div id="step-confirm" hidden>
+<input type="checkbox" id="terms-checkbox"><label for="terms-checkbox">I accept the terms</label>
+<button type="button" id="final-book-btn" disabled>Book</button>
+</div>
+<div id="step-done" hidden></div>
+<script>
+const SITE = "ithitec";
+{wizard}
+const $ = (id) => document.getElementById(id);
+function show(id) {
+  for (const s of ["step-register", "step-branch", "step-datetime", "step-confirm", "step-done"]) $(s).hidden = s !== id;
+}
+document.querySelector("#step-register button").addEventListener("click", async () => {
+  const branches = await api("/api/branches");
+  const list = $("branch-list-container");
+  for (const name of branches) {
+    const b = el("button", {type: "button"}, name);
+    b.addEventListener("click", () => { booking.branch = name; $("branch-next-btn").disabled = false; });
+    list.appendChild(b);
+  }
+  show("step-branch");
+});
+$("branch-next-btn").addEventListener("click", () => {
+  const grid = $("calendar-grid");
+  for (let d = 1; d <= daysInMonth(); d++) {
+    const b = el("button", {type: "button", class: "day-cell"}, String(d));
+    b.addEventListener("click", async () => {
+      booking.day = d;
+      const times = await api("/api/times?day=" + d);
+      const slots = $("time-slots-grid");
+      slots.replaceChildren();
+      for (const t of times) {
+        const tb = el("button", {type: "button"}, t);
+        tb.addEventListener("click", () => { booking.time = t; $("datetime-next-btn").disabled = false; });
+        slots.appendChild(tb);
+      }
+    });
+    grid.appendChild(b);
+  }
+  show("step-datetime");
+});
+$("datetime-next-btn").addEventListener("click", () => show("step-confirm"));
+$("terms-checkbox").addEventListener("change", (e) => { $("final-book-btn").disabled = !e.target.checked; });
+$("final-book-btn").addEventListener("click", async () => {
+  const result = await api("/api/book", booking);
+  $("step-done").textContent = "Booking confirmed #" + result.id;
+  show("step-done");
+});
+</script>
+</body></html>
+"""
+
+
+def _rocket_page(title, body):
+    head = _ROCKET_HEAD.replace("{title}", title).replace("{wizard}", _WIZARD_JS)
+    return head + body + "</div></body></html>\n"
+
+
+def render_rocket_booking(options):
+    """หน้า /booking: (CAPTCHA ถ้าเปิดไว้) + เมนูไปหน้าอีเว้นต์"""
+    if options["captcha"]:
+        body = _CAPTCHA_FORM + _ROCKET_NAV.replace('<div class="sc-715cd296-0 ipiVos">', '<div class="sc-715cd296-0 ipiVos" id="booking-home" hidden>', 1)
+    else:
+        body = _ROCKET_NAV.replace('<div class="sc-715cd296-0 ipiVos">', '<div class="sc-715cd296-0 ipiVos" id="booking-home">', 1)
+    return _rocket_page("Rocket Booking Mock", body)
+
+
+def render_rocket_event(options):
+    event = _ROCKET_EVENT_CARD if options["events"] else _ROCKET_NO_EVENT
+    return _rocket_page("Rocket Booking Mock - Event", _ROCKET_EVENT_BODY.replace("{event}", event))
+
+
+def render_rocket_profile(line_linked):
+    if line_linked:
+        line_status = "<div>LINE: connected</div>"
+    else:
+        line_status = '<button type="button" id="line-connect">Connect</button>'
+    body = _ROCKET_PROFILE_BODY.replace("{line_status}", line_status).replace("{nav}", _ROCKET_NAV)
+    return _rocket_page("Rocket Booking Mock - Profile", body)
+
+
+# --- HTTP server ---
+
+class MockBookingHandler(BaseHTTPRequestHandler):
+    server_version = "MockBooking/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.options["verbose"]:
+            super().log_message(format, *args)
+
+    def _apply_latency(self):
+        options = self.server.options
+        delay_ms = options["latency_ms"]
+        if options["jitter_ms"]:
+            delay_ms += random.uniform(0, options["jitter_ms"])
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-store")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, payload, status=200):
+        self._send(status, json.dumps(payload, ensure_ascii=False), "application/json; charset=utf-8")
+
+    def _redirect(self, location, headers=None):
+        self.send_response(303)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _line_linked(self):
+        return f"{MOCK_LINE_COOKIE}=1" in (self.headers.get("Cookie") or "")
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length).decode("utf-8") if length else ""
+
+    def do_GET(self):
+        self._apply_latency()
+        url = urlparse(self.path)
+        path = url.path.rstrip("/") or "/"
+        options = self.server.options
+
+        if path in ("/", "/booking"):
+            self._send(200, render_rocket_booking(options))
+        elif path == "/booking/event":
+            self._send(200, render_rocket_event(options))
+        elif path == "/profile":
+            self._send(200, render_rocket_profile(self._line_linked()))
+        elif path == "/line/login":
+            self._send(200, _LINE_LOGIN_PAGE)
+        elif path == "/pmrocket":
+            self._send(200, _PMROCKET_PAGE.replace("{wizard}", _WIZARD_JS))
+        elif path == "/ithitec":
+            self._send(200, _ITHITEC_PAGE.replace("{wizard}", _WIZARD_JS))
+        elif path == "/api/branches":
+            self._send_json(options["branches"])
+        elif path == "/api/times":
+            self._send_json(options["times"])
+        elif path == "/api/bookings":
+            with self.server.bookings_lock:
+                self._send_json(list(self.server.bookings))
+        else:
+            self._send(404, "not found", "text/plain; charset=utf-8")
+
+    def do_POST(self):
+        self._apply_latency()
+        path = urlparse(self.path).path.rstrip("/")
+
+        if path == "/line/login":
+            form = parse_qs(self._read_body())
+            if not form.get("email") or not form.get("password"):
+                self._send(200, _LINE_LOGIN_PAGE)
+                return
+            self._redirect("/profile", {"Set-Cookie": f"{MOCK_LINE_COOKIE}=1; Path=/; Max-Age=31536000"})
+        elif path == "/api/book":
+            try:
+                payload = json.loads(self._read_body() or "{}")
+            except json.JSONDecodeError:
+                self._send_json({"error": "invalid json"}, status=400)
+                return
+            with self.server.bookings_lock:
+                record = dict(payload, id=len(self.server.bookings) + 1, ts=time.time())
+                self.server.bookings.append(record)
+            self._send_json(record)
+        else:
+            self._send(404, "not found", "text/plain; charset=utf-8")
+
+
+def create_mock_server(host=DEFAULT_HOST, port=DEFAULT_PORT, latency_ms=0, jitter_ms=0, captcha=False, events=True, verbose=False):
+    """
+    สร้าง HTTP server ของเว็บจำลอง (ยังไม่เริ่มรับ request)
+    port=0 ให้ระบบเลือก port ว่างให้ (ดู server.server_address)
+    """
+    server = ThreadingHTTPServer((host, port), MockBookingHandler)
+    server.daemon_threads = True
+    server.options = {
+        "latency_ms": latency_ms,
+        "jitter_ms": jitter_ms,
+        "captcha": captcha,
+        "events": events,
+        "verbose": verbose,
+        "branches": _load_list(BRANCH_CONFIG_PATH, FALLBACK_BRANCHES),
+        "times": _load_list(TIME_CONFIG_PATH, FALLBACK_TIMES),
+    }
+    server.bookings = []
+    server.bookings_lock = threading.Lock()
+    return server
+
+
+def start_mock_server(**kwargs):
+    """เริ่มเว็บจำลองใน background thread แล้วคืน server (ปิดด้วย server.shutdown())"""
+    server = create_mock_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, name="mock-booking-server", daemon=True)
+    thread.start()
+    return server
+
+
+def base_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def site_urls(server):
+    """URL เริ่มต้นของแต่ละ site บนเว็บจำลอง (ชื่อเดียวกับไฟล์ใน booking_elements)"""
+    root = base_url(server)
+    return {
+        "rocketbooking": f"{root}/booking",
+        "pmrocket": f"{root}/pmrocket/",
+        "ithitec": f"{root}/ithitec/",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="เว็บจองจำลองสำหรับทดสอบ booking flow แบบออฟไลน์")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency-ms", type=float, default=0, help="หน่วงเวลาทุก request (ms)")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="หน่วงเพิ่มแบบสุ่ม 0..N ms")
+    parser.add_argument("--captcha", action="store_true", help="แสดง CAPTCHA form ที่หน้า /booking")
+    parser.add_argument("--no-events", action="store_true", help="จำลองกรณีไม่มีอีเว้นต์ให้จอง")
+    parser.add_argument("--verbose", action="store_true", help="แสดง log ของทุก request")
+    args = parser.parse_args()
+
+    server = create_mock_server(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        captcha=args.captcha,
+        events=not args.no_events,
+        verbose=args.verbose,
+    )
+    print(f"🧪 Mock booking server: {base_url(server)}")
+    for name, url in site_urls(server).items():
+        print(f"   {name}: {url}")
+    print(f"ℹ️ ตั้ง BOOKING_MOCK_URL={base_url(server)} เพื่อให้บอทจองกับเว็บนี้")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 ปิด mock server")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import asyncio
+import datetime
+import heapq
+import itertools
+import threading
+import time
+
+# ช่วงท้ายก่อนถึงเวลา (วินาที) ที่จะเลิกใช้ wait/sleep ของระบบ แล้ววนเช็คนาฬิกาเอง
+# (timer ของ OS บางตัว เช่น Windows ละเอียดแค่ ~15 ms)
+SPIN_THRESHOLD = 0.02
+
+# งานที่เลยเวลามาไม่เกินค่านี้ (วินาที) ยังยิงทันที, เกินกว่านี้จะถูกข้าม
+DEFAULT_MISFIRE_GRACE = 5.0
+
+
+def monotonic_deadline(when):
+    """แปลงเวลา (datetime หรือ epoch) เป็น deadline บนนาฬิกา monotonic"""
+    if isinstance(when, datetime.datetime):
+        when = when.timestamp()
+    return time.monotonic() + (when - time.time())
+
+
+def _spin_until(deadline):
+    while time.monotonic() < deadline:
+        time.sleep(0)
+
+
+async def sleep_until(fire_at):
+    """
+    async sleep จนถึงเวลา fire_at (epoch) แบบแม่นระดับ ms
+    คืนค่า jitter (ms) ที่วัดได้: บวก = ตื่นช้ากว่าเป้าหมาย
+    """
+    deadline = monotonic_deadline(fire_at)
+    remaining = deadline - time.monotonic()
+    if remaining > SPIN_THRESHOLD:
+        await asyncio.sleep(remaining - SPIN_THRESHOLD)
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0)
+    return (time.monotonic() - deadline) * 1000
+
+
+class PreciseScheduler:
+    """
+    ตัวตั้งเวลางานแบบครั้งเดียวตามวันเวลาที่แน่นอน (ระดับวินาที)
+    เก็บงานใน heap เรียงตาม deadline บนนาฬิกา monotonic
+    thread ของ scheduler หลับจนถึงงานถัดไป (ตื่นเมื่อมีงานเพิ่ม/ยกเลิก) แล้วยิง callback
+    และ log jitter ที่วัดได้ของทุกงาน
+    """
+
+    def __init__(self, log=print, misfire_grace=DEFAULT_MISFIRE_GRACE):
+        self._log = log
+        self._misfire_grace = misfire_grace
+        self._heap = []
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    @property
+    def running(self):
+        return self._running
+
+    def schedule_at(self, when, callback, *args, name=None):
+        """
+        ตั้งให้เรียก callback(*args) ที่เวลา when (datetime หรือ epoch)
+        คืนค่า job id สำหรับ cancel()
+        """
+        target = when.timestamp() if isinstance(when, datetime.datetime) else when
+        job_id = next(self._ids)
+        job = {
+            "id": job_id,
+            "name": name or f"job-{job_id}",
+            "target": target,
+            "deadline": monotonic_deadline(target),
+            "callback": callback,
+            "args": args,
+        }
+        with self._cond:
+            self._jobs[job_id] = job
+            heapq.heappush(self._heap, (job["deadline"], job_id))
+            self._cond.notify()
+        return job_id
+
+    def cancel(self, job_id):
+        with self._cond:
+            # ลบออกจาก dict พอ รายการใน heap จะถูกทิ้งตอนถึงคิว
+            removed = self._jobs.pop(job_id, None) is not None
+            self._cond.notify()
+        return removed
+
+    def clear(self):
+        with self._cond:
+            self._jobs.clear()
+            self._heap.clear()
+            self._cond.notify()
+
+    def pending(self):
+        """คืนรายการงานที่รออยู่ เรียงตามเวลา: [(name, datetime), ...]"""
+        with self._cond:
+            jobs = sorted(self._jobs.values(), key=lambda job: job["deadline"])
+        return [(job["name"], datetime.datetime.fromtimestamp(job["target"])) for job in jobs]
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="precise-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def _next_due_job(self):
+        """รอจนมีงานถึงเวลา (เรียกโดยถือ lock อยู่) คืน job หรือ None เมื่อหยุด"""
+        while self._running:
+            # ทิ้งงานที่ถูกยกเลิกไปแล้วที่หัว heap
+            while self._heap and self._heap[0][1] not in self._jobs:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                self._cond.wait()
+                continue
+
+            deadline, job_id = self._heap[0]
+            remaining = deadline - time.monotonic()
+            if remaining > SPIN_THRESHOLD:
+                self._cond.wait(remaining - SPIN_THRESHOLD)
+                continue
+
+            heapq.heappop(self._heap)
+            return self._jobs.pop(job_id)
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                job = self._next_due_job()
+            if job is None:
+                break
+
+            _spin_until(job["deadline"])
+            jitter_ms = (time.monotonic() - job["deadline"]) * 1000
+            target_str = datetime.datetime.fromtimestamp(job["target"]).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+            if jitter_ms > self._misfire_grace * 1000:
+                self._log(f"⚠️ Scheduler: ข้าม '{job['name']}' เพราะเลยเวลามาแล้ว {jitter_ms / 1000:.1f} วินาที (เป้าหมาย {target_str})")
+                continue
+
+            self._log(f"⏱️ Scheduler: ยิง '{job['name']}' (เป้าหมาย {target_str}, jitter {jitter_ms:+.2f} ms)")
+            try:
+                job["callback"](*job["args"])
+            except Exception as e:
+                self._log(f"❌ Scheduler: งาน '{job['name']}' เกิดข้อผิดพลาด: {e}")
+
+        self._log("Scheduler หยุดทำงานแล้ว.")
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+# ไฟล์ manifest ที่เก็บ size/mtime/hash ของทุกไฟล์ที่ซิงก์แล้ว (อยู่ในโฟลเดอร์ปลายทาง)
+MANIFEST_NAME = ".profile_sync_manifest.json"
+
+# โฟลเดอร์ที่ Chrome/Edge สร้างใหม่ได้เอง ไม่ต้องคัดลอก
+SKIP_DIR_NAMES = {
+    "Cache",
+    "Code Cache",
+    "GPUCache",
+    "DawnCache",
+    "DawnGraphiteCache",
+    "DawnWebGPUCache",
+}
+SKIP_REL_DIRS = {
+    "Service Worker/CacheStorage",
+    "Service Worker/ScriptCache",
+}
+# ไฟล์ lock ของเบราว์เซอร์ที่ไม่ควรคัดลอกข้ามโฟลเดอร์
+SKIP_FILE_NAMES = {"LOCK", "lockfile", "SingletonLock", "SingletonCookie", "SingletonSocket"}
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _load_manifest(dest_dir: Path):
+    manifest_path = dest_dir / MANIFEST_NAME
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_manifest(dest_dir: Path, manifest):
+    manifest_path = dest_dir / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def _is_skipped_dir(rel_dir: str, name: str):
+    if name in SKIP_DIR_NAMES:
+        return True
+    rel_path = f"{rel_dir}/{name}" if rel_dir else name
+    return rel_path in SKIP_REL_DIRS
+
+
+def _hash_file(path: Path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _copy_with_hash(src: Path, dst: Path):
+    """
+    คัดลอกไฟล์พร้อมคำนวณ hash ในรอบเดียว คืนค่า (hash, จำนวน bytes)
+    เขียนลงไฟล์ชั่วคราวแล้ว replace: ถ้าคัดลอกไม่สำเร็จ ไฟล์ปลายทางเดิมไม่ถูกเขียนทับครึ่ง ๆ กลาง ๆ
+    """
+    digest = hashlib.sha1()
+    copied = 0
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(dst.name + ".sync_tmp")
+    try:
+        with open(src, "rb") as fin, open(tmp, "wb") as fout:
+            for chunk in iter(lambda: fin.read(_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                fout.write(chunk)
+                copied += len(chunk)
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+    return digest.hexdigest(), copied
+
+
+def _dest_matches(entry, dst_path: Path):
+    # ไฟล์ปลายทางถูกเบราว์เซอร์แก้ระหว่างรันได้ (โฟลเดอร์ทำงาน) จึงต้องเทียบกับ stat ที่บันทึกไว้หลังคัดลอกด้วย
+    try:
+        st = dst_path.stat()
+    except FileNotFoundError:
+        return False
+    return entry.get("dst_size") == st.st_size and entry.get("dst_mtime_ns") == st.st_mtime_ns
+
+
+def _iter_source_files(source_dir: Path):
+    for root, dirs, files in os.walk(source_dir):
+        rel_dir = Path(root).relative_to(source_dir).as_posix()
+        if rel_dir == ".":
+            rel_dir = ""
+        dirs[:] = [d for d in dirs if not _is_skipped_dir(rel_dir, d)]
+        for name in files:
+            if name in SKIP_FILE_NAMES:
+                continue
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            yield rel_path, Path(root) / name
+
+
+def sync_profile(source_dir, dest_dir):
+    """
+    ซิงก์โปรไฟล์เบราว์เซอร์จาก source_dir ไปยัง dest_dir แบบ incremental
+    คัดลอกเฉพาะไฟล์ที่ size/mtime/hash ของต้นทาง หรือ size/mtime ของปลายทาง เปลี่ยนไปจากรอบก่อน
+    และลบไฟล์ที่ถูกลบออกจากต้นทาง
+    คืนค่า dict รายงานผล: files_copied, bytes_copied, files_unchanged, files_removed, files_failed, elapsed
+    """
+    source_dir = Path(source_dir)
+    dest_dir = Path(dest_dir)
+    started = time.perf_counter()
+
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    old_manifest = _load_manifest(dest_dir)
+    new_manifest = {}
+    failed = set()
+    report = {
+        "files_copied": 0,
+        "bytes_copied": 0,
+        "files_unchanged": 0,
+        "files_removed": 0,
+        "files_failed": 0,
+    }
+
+    for rel_path, src_path in _iter_source_files(source_dir):
+        dst_path = dest_dir / rel_path
+        try:
+            st = src_path.stat()
+            entry = old_manifest.get(rel_path)
+            if entry and _dest_matches(entry, dst_path) and entry["size"] == st.st_size:
+                if entry["mtime_ns"] == st.st_mtime_ns:
+                    new_manifest[rel_path] = entry
+                    report["files_unchanged"] += 1
+                    continue
+                # mtime เปลี่ยนแต่ขนาดเท่าเดิม: ตรวจ hash ก่อนตัดสินใจคัดลอก
+                if _hash_file(src_path) == entry["sha1"]:
+                    new_manifest[rel_path] = dict(entry, mtime_ns=st.st_mtime_ns)
+                    report["files_unchanged"] += 1
+                    continue
+
+            digest, copied = _copy_with_hash(src_path, dst_path)
+            dst_st = dst_path.stat()
+            new_manifest[rel_path] = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "sha1": digest,
+                "dst_size": dst_st.st_size,
+                "dst_mtime_ns": dst_st.st_mtime_ns,
+            }
+            report["files_copied"] += 1
+            report["bytes_copied"] += copied
+        except OSError as e:
+            # ไฟล์ที่เบราว์เซอร์ต้นทางล็อกไว้อยู่ (เช่นเปิด Chrome ค้างไว้) จะข้ามไป
+            print(f"⚠️ คัดลอกไฟล์โปรไฟล์ไม่ได้: {rel_path} ({e})")
+            report["files_failed"] += 1
+            # ไม่เก็บ entry เดิมไว้: รอบหน้าจะคัดลอกใหม่ (ไฟล์ปลายทางเดิม ถ้ามี ยังใช้ต่อได้ในรอบนี้)
+            failed.add(rel_path)
+
+    for rel_path in old_manifest.keys() - new_manifest.keys() - failed:
+        stale_path = dest_dir / rel_path
+        try:
+            stale_path.unlink()
+            report["files_removed"] += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️ ลบไฟล์โปรไฟล์เก่าไม่ได้: {rel_path} ({e})")
+
+    _save_manifest(dest_dir, new_manifest)
+    report["elapsed"] = time.perf_counter() - started
+    return report
+
+
+def format_sync_report(report):
+    return (f"คัดลอก {report['files_copied']} ไฟล์ ({report['bytes_copied'] / (1024 * 1024):.1f} MB), "
+            f"ไม่เปลี่ยน {report['files_unchanged']} ไฟล์, ลบ {report['files_removed']} ไฟล์, "
+            f"ใช้เวลา {report['elapsed']:.2f} วินาที")
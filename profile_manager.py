@@ -0,0 +1,257 @@
+import json
+import os
+import shutil
+import socket
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from profile_cache import sync_profile, format_sync_report
+
+# ทุกการรันที่ใช้โปรไฟล์เบราว์เซอร์ต้องถือ lease ของโปรไฟล์นั้นก่อน (ไฟล์ lock ข้าม process)
+# - โฟลเดอร์ทำงาน (playwright_<browser>_user_data_<profile>) ถูกใช้โดยผู้ถือ lease เพียงคนเดียว
+# - Edge ไม่เปิดบนโฟลเดอร์ User Data จริงอีกต่อไป แต่ซิงก์มาเป็นโฟลเดอร์ทำงานเหมือน Chrome
+# - lease ของ process ที่ตายไปแล้ว (เช่น worker ถูก kill) ถูกยึดคืนได้ทันที
+LEASES_DIR = Path("cache/profile_leases")
+
+# เวลาที่รอ lease ของโปรไฟล์ที่มีงานอื่นใช้อยู่ ก่อนยอมแพ้ (วินาที, 0 = ไม่รอ)
+DEFAULT_LEASE_WAIT_SECONDS = 30
+_POLL_SECONDS = 0.5
+
+# ไฟล์ lock ของเบราว์เซอร์ที่ค้างในโฟลเดอร์ทำงานเมื่อรอบก่อนจบไม่ปกติ (ทำให้เปิดโปรไฟล์ซ้ำไม่ได้)
+_STALE_BROWSER_LOCKS = ("SingletonLock", "SingletonCookie", "SingletonSocket", "lockfile")
+
+# โฟลเดอร์ User Data (เทียบกับ home) และ executable ของเบราว์เซอร์ แยกตามระบบปฏิบัติการ
+# executable บน Linux/macOS เป็นชื่อคำสั่งที่หาใน PATH (shutil.which) ถ้าไม่พบใช้ Chromium ที่มากับ Playwright
+# ทับได้รายโปรไฟล์ด้วย "user_data_root" / "executable_path" ใน user_config.json (เช่นเครื่อง Linux ที่ติดตั้งไว้ที่อื่น)
+BROWSER_PATHS = {
+    "win32": {
+        "chrome": ("AppData/Local/Google/Chrome/User Data", r"C:\Program Files\Google\Chrome\Application\chrome.exe"),
+        "edge": ("AppData/Local/Microsoft/Edge/User Data", r"C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe"),
+    },
+    "darwin": {
+        "chrome": ("Library/Application Support/Google/Chrome", "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"),
+        "edge": ("Library/Application Support/Microsoft Edge", "/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge"),
+    },
+    "linux": {
+        "chrome": (".config/google-chrome", ("google-chrome", "google-chrome-stable")),
+        "edge": (".config/microsoft-edge", ("microsoft-edge", "microsoft-edge-stable")),
+    },
+}
+
+
+def browser_paths(browser):
+    """คืน (user_data_root, executable) เริ่มต้นของเบราว์เซอร์บนระบบนี้ executable เป็น None ถ้าหาไม่พบ"""
+    platform = sys.platform if sys.platform in BROWSER_PATHS else "linux"
+    paths = BROWSER_PATHS[platform]
+    if browser not in paths:
+        raise ValueError("Browser ต้องเป็น chrome หรือ edge")
+    user_data_root, executable = paths[browser]
+    if isinstance(executable, tuple):
+        executable = next((found for found in map(shutil.which, executable) if found), None)
+    return user_data_root, executable
+
+
+class ProfileBusyError(RuntimeError):
+    """มีงานอื่นถือ lease ของโปรไฟล์นี้อยู่เกินเวลาที่รอได้"""
+
+
+def _safe_name(browser, profile_name):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in f"{browser}_{profile_name}")
+
+
+def lease_path(browser, profile_name):
+    return LEASES_DIR / f"{_safe_name(browser, profile_name)}.lock"
+
+
+def workdir_for(browser, profile_name):
+    """โฟลเดอร์ทำงานของโปรไฟล์ (cache ที่ซิงก์แบบ incremental ข้ามรอบการรัน)"""
+    return Path(f"./playwright_{browser}_user_data_{profile_name}")
+
+
+def _pid_alive(pid):
+    if sys.platform == "win32":
+        import ctypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            # ERROR_ACCESS_DENIED: process มีอยู่แต่เป็นของผู้ใช้อื่น
+            return ctypes.get_last_error() == 5
+        try:
+            exit_code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_lease(browser, profile_name):
+    """ข้อมูลผู้ถือ lease ปัจจุบัน หรือ None ถ้าไม่มีใครถืออยู่"""
+    try:
+        with open(lease_path(browser, profile_name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError):
+        # ไฟล์กำลังถูกเขียนอยู่ (หรือเสีย) ถือว่ายังมีผู้ถือ
+        return {}
+
+
+def _is_stale(holder):
+    if not holder or "pid" not in holder:
+        return False
+    return holder.get("host") == socket.gethostname() and not _pid_alive(holder["pid"])
+
+
+def _try_create(path, lease):
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(lease, f)
+    return True
+
+
+@contextmanager
+def _takeover_guard(path):
+    # ล็อกระดับ OS ระหว่างยึด lease ที่ค้าง (หลาย process อาจเห็นว่า lease เดียวกันค้างพร้อมกัน)
+    # OS ปลดล็อกให้เองถ้า process ตายกลางทาง จึงไม่มี guard ค้างแบบไฟล์ lock
+    with open(path.with_name(path.name + ".takeover"), "a+b") as f:
+        f.seek(0)
+        if sys.platform == "win32":
+            import msvcrt
+
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform == "win32":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _take_over(path, stale, lease):
+    """แทนที่ lease ที่ค้าง (stale) ด้วย lease ของเราแบบ atomic คืน True ถ้าได้ lease"""
+    with _takeover_guard(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                current = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            # ถูกลบไปแล้ว (หรือกำลังถูกเขียน) ให้วนกลับไปสร้างด้วย O_EXCL ตามปกติ
+            return False
+        if current.get("token") != stale.get("token"):
+            # มีคนยึดไปก่อนแล้ว
+            return False
+        # เจ้าของเดิมตายแล้วและไม่มีใครเขียนทับ lease ที่มีอยู่ได้ (O_EXCL) จึง replace ได้อย่างปลอดภัย
+        tmp = path.with_name(f"{path.name}.{lease['token']}.tmp")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(lease, f)
+            os.replace(tmp, path)
+        finally:
+            try:
+                tmp.unlink()
+            except FileNotFoundError:
+                pass
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f).get("token") == lease["token"]
+        except (OSError, json.JSONDecodeError):
+            return False
+
+
+def acquire_lease(browser, profile_name, owner=None, wait_seconds=DEFAULT_LEASE_WAIT_SECONDS):
+    """
+    ขอ lease ของโปรไฟล์ (บล็อกได้ไม่เกิน wait_seconds) คืน dict lease สำหรับ release_lease
+    ถ้ามีงานอื่นถืออยู่จนหมดเวลา จะ raise ProfileBusyError แทนการค้างรอ
+    """
+    path = lease_path(browser, profile_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lease = {
+        "token": uuid.uuid4().hex,
+        "pid": os.getpid(),
+        "host": socket.gethostname(),
+        "owner": owner or f"pid {os.getpid()}",
+        "acquired_at": time.time(),
+        "path": str(path),
+    }
+    deadline = time.monotonic() + wait_seconds
+    announced = False
+    while True:
+        if _try_create(path, lease):
+            return lease
+        holder = read_lease(browser, profile_name)
+        if _is_stale(holder):
+            if _take_over(path, holder, lease):
+                print(f"🧹 ยึด lease ของโปรไฟล์ '{profile_name}' คืนจาก process {holder['pid']} ที่จบไปแล้ว")
+                return lease
+            continue
+        if time.monotonic() >= deadline:
+            holder_text = (holder or {}).get("owner", "งานอื่น")
+            raise ProfileBusyError(f"โปรไฟล์ {browser}/{profile_name} ถูกใช้อยู่โดย {holder_text} (รอ {wait_seconds:.0f} วินาทีแล้ว)")
+        if not announced:
+            print(f"⏳ โปรไฟล์ '{profile_name}' ถูกใช้อยู่โดย {(holder or {}).get('owner', 'งานอื่น')}, รอสูงสุด {wait_seconds:.0f} วินาที...")
+            announced = True
+        time.sleep(_POLL_SECONDS)
+
+
+def release_lease(lease):
+    """คืน lease (ลบไฟล์เฉพาะเมื่อยังเป็นของเราอยู่)"""
+    if lease is None:
+        return
+    path = Path(lease["path"])
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            holder = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return
+    if holder.get("token") == lease["token"]:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def prepare_workdir(browser, profile_name, user_data_root=None, executable_path=None):
+    """
+    ซิงก์โปรไฟล์ต้นทางเข้าโฟลเดอร์ทำงาน แล้วลบไฟล์ lock ของเบราว์เซอร์ที่ค้างจากรอบก่อน
+    ต้องเรียกขณะถือ lease ของโปรไฟล์ คืน (user_data_dir, executable)
+    user_data_root / executable_path: ทับค่าเริ่มต้นของระบบ (ดู BROWSER_PATHS)
+    """
+    default_root, executable = browser_paths(browser)
+    executable = executable_path or executable
+    # พาธสัมพัทธ์นับจาก home, พาธเต็ม (หรือขึ้นต้นด้วย ~) ใช้ตามนั้น
+    source_profile_path = Path(os.path.expanduser('~')) / Path(os.path.expanduser(user_data_root or default_root)) / profile_name
+    if not source_profile_path.is_dir():
+        print(f"❌ ไม่พบโปรไฟล์ {browser} '{profile_name}' ที่พาธ: {source_profile_path}. ตรวจสอบให้แน่ใจว่าโปรไฟล์นี้มีอยู่จริง.")
+        raise ValueError(f"ไม่พบโปรไฟล์ {browser} '{profile_name}'")
+
+    workdir = workdir_for(browser, profile_name)
+    report = sync_profile(source_profile_path, workdir)
+    print(f"📂 ซิงก์โปรไฟล์ '{profile_name}' ไปยัง: {workdir} ({format_sync_report(report)})")
+
+    for name in _STALE_BROWSER_LOCKS:
+        try:
+            (workdir / name).unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"⚠️ ลบไฟล์ lock เดิมของเบราว์เซอร์ไม่ได้: {name} ({e})")
+    return str(workdir), executable
@@ -0,0 +1,91 @@
+from fnmatch import fnmatch
+
+# ตัวเลือกการเปิดเบราว์เซอร์ของแต่ละโปรไฟล์ (user_config.json -> "launch_options") หรือของการรันแต่ละครั้ง เช่น
+#   "launch_options": {"block_resources": true, "blocked_url_patterns": ["*googletagmanager.com*"]}
+# ฟอร์มจองใช้แค่ HTML/JS/XHR ของเว็บ จึงตัดรูป ฟอนต์ วิดีโอ และสคริปต์ภายนอกออกได้
+
+# ชนิดของ request (request.resource_type ของ Playwright) ที่บล็อกเมื่อเปิด block_resources
+DEFAULT_BLOCKED_TYPES = ["image", "media", "font"]
+# สคริปต์ภายนอกที่ไม่เกี่ยวกับการจอง (wildcard แบบ fnmatch เทียบกับ URL เต็ม)
+DEFAULT_BLOCKED_URL_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*connect.facebook.com*",
+    "*hotjar.com*",
+]
+
+DEFAULT_LAUNCH_OPTIONS = {
+    "headless": False,
+    "block_resources": False,
+    "blocked_types": DEFAULT_BLOCKED_TYPES,
+    "blocked_url_patterns": DEFAULT_BLOCKED_URL_PATTERNS,
+}
+
+# อ่าน transferSize จาก Resource Timing API (ข้าม origin ที่ไม่ส่ง Timing-Allow-Origin จะนับเป็น 0)
+_PAGE_LOAD_JS = """() => {
+    const nav = performance.getEntriesByType("navigation")[0];
+    const resources = performance.getEntriesByType("resource");
+    let bytes = nav ? nav.transferSize : 0;
+    for (const r of resources) bytes += r.transferSize;
+    return {
+        transfer_bytes: bytes,
+        resources: resources.length,
+        dom_ready_ms: nav ? Math.round(nav.domContentLoadedEventEnd) : null,
+        load_ms: nav && nav.loadEventEnd ? Math.round(nav.loadEventEnd) : null,
+    };
+}"""
+
+
+def resolve_launch_options(*layers):
+    """รวมตัวเลือกจากหลายชั้น (ชั้นหลังทับชั้นก่อน, ข้ามค่า None) บนค่าเริ่มต้น"""
+    options = dict(DEFAULT_LAUNCH_OPTIONS)
+    for layer in layers:
+        if layer:
+            options.update({key: value for key, value in layer.items() if value is not None})
+    return options
+
+
+async def install_blocking(context, options):
+    """
+    ติดตั้ง route บน context เพื่อบล็อก request ตาม options
+    คืน dict สถิติ {"blocked", "by_type"} ที่อัปเดตระหว่างรัน หรือ None ถ้าไม่ได้เปิด block_resources
+    หมายเหตุ: เมื่อมี route Chromium จะไม่ใช้ HTTP cache ของ context นี้
+    """
+    if not options.get("block_resources"):
+        return None
+
+    blocked_types = set(options.get("blocked_types") or [])
+    patterns = list(options.get("blocked_url_patterns") or [])
+    stats = {"blocked": 0, "by_type": {}}
+
+    async def handle(route, request):
+        resource_type = request.resource_type
+        if resource_type in blocked_types or any(fnmatch(request.url, pattern) for pattern in patterns):
+            stats["blocked"] += 1
+            stats["by_type"][resource_type] = stats["by_type"].get(resource_type, 0) + 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", handle)
+    return stats
+
+
+async def measure_page_load(page):
+    """ขนาดข้อมูลที่โหลดและเวลาที่หน้าเว็บพร้อม (ms นับจากเริ่ม navigation) ด้วย evaluate ครั้งเดียว"""
+    try:
+        return await page.evaluate(_PAGE_LOAD_JS)
+    except Exception as e:
+        print(f"⚠️ วัดขนาดการโหลดหน้าเว็บไม่ได้: {e}")
+        return None
+
+
+def format_load_report(metrics, stats):
+    blocking = f"บล็อก {stats['blocked']} requests {stats['by_type']}" if stats is not None else "ไม่บล็อก resource"
+    if metrics is None:
+        return f"📦 โหลดหน้าเว็บ ({blocking})"
+    dom_ready = f"{metrics['dom_ready_ms']} ms" if metrics["dom_ready_ms"] is not None else "-"
+    return (f"📦 โหลดหน้าเว็บ {metrics['transfer_bytes'] / 1024:.0f} KB จาก {metrics['resources']} ไฟล์, "
+            f"DOM พร้อมใน {dom_ready} ({blocking})")
@@ -0,0 +1,230 @@
+import contextvars
+import cProfile
+import datetime
+import io
+import json
+import os
+import shutil
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from tracing import current_run
+
+# โหมด profiling ของการจอง: เก็บหลักฐานของรอบที่ช้าไว้ดูทีหลัง (หนึ่งโฟลเดอร์ต่อการรัน ใน logs/profiles)
+#   python.prof         : cProfile ของฝั่ง Python (python -m pstats / snakeviz)
+#   python_top.txt      : ฟังก์ชันที่ใช้เวลาสะสมมากที่สุด
+#   playwright_trace.zip: screenshot, DOM snapshot และ network ของ context (playwright show-trace <zip>)
+#   run.json            : สรุปเวลาแยกตามส่วน (โค้ดของเรา / Playwright / รอเบราว์เซอร์) และขนาดไฟล์
+# เปิดด้วย python main.py --profile-run ... หรือ checkbox ใน GUI (ส่งต่อให้ worker process ผ่าน environment)
+PROFILE_ENV = "BOOKING_PROFILE_RUN"
+PROFILES_DIR = Path("logs/profiles")
+
+# ขนาดสูงสุดของหนึ่งการรัน: เกินแล้วลบ Playwright trace (ไฟล์ใหญ่สุด) เหลือแค่ cProfile
+MAX_RUN_BYTES = 150 * 1024 * 1024
+# retention: เก็บไม่เกิน MAX_RUNS การรัน, ไม่เกิน RETENTION_DAYS วัน และรวมไม่เกิน MAX_TOTAL_BYTES
+MAX_RUNS = 20
+RETENTION_DAYS = 7
+MAX_TOTAL_BYTES = 1024 * 1024 * 1024
+TOP_FUNCTIONS = 40
+
+# builtin ที่ event loop ใช้รอ I/O: เวลาในนี้คือเวลาที่รอเบราว์เซอร์ตอบ (หน้าเว็บทำงาน + round trip ของ IPC)
+_WAIT_FUNCTIONS = ("select", "poll", "control", "GetQueuedCompletionStatus")
+_PROJECT_DIR = str(Path(__file__).resolve().parent)
+
+# การรันที่กำลัง profile ของ context นี้ (asyncio task แต่ละตัวมีของตัวเอง เหมือน tracing)
+_current = contextvars.ContextVar("booking_profile_run", default=None)
+
+
+def is_enabled():
+    return os.environ.get(PROFILE_ENV, "") not in ("", "0")
+
+
+def set_enabled(enabled):
+    """เปิด/ปิด profiling ของการรันถัดไป (worker process ที่เริ่มหลังจากนี้รับค่าผ่าน environment)"""
+    if enabled:
+        os.environ[PROFILE_ENV] = "1"
+    else:
+        os.environ.pop(PROFILE_ENV, None)
+
+
+def _dir_size(path):
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def prune_runs(reserve=0):
+    """ลบโฟลเดอร์ profile เก่าตาม retention (เริ่มจากเก่าสุด), reserve: จำนวนการรันที่จะเพิ่มหลังจากนี้"""
+    if not PROFILES_DIR.is_dir():
+        return 0
+    runs = sorted((p for p in PROFILES_DIR.iterdir() if p.is_dir()), key=lambda p: p.stat().st_mtime)
+    cutoff = time.time() - RETENTION_DAYS * 86400
+    sizes = {p: _dir_size(p) for p in runs}
+    remaining = len(runs)
+    total = sum(sizes.values())
+    removed = 0
+    for path in runs:
+        if path.stat().st_mtime >= cutoff and remaining + reserve <= MAX_RUNS and total <= MAX_TOTAL_BYTES:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        remaining -= 1
+        total -= sizes[path]
+        removed += 1
+    if removed:
+        print(f"🧹 ลบผล profiling เก่า {removed} การรัน (เก็บไว้ {remaining} การรัน, {total / 1024 / 1024:.0f} MB)")
+    return removed
+
+
+def _run_dir(kind, label):
+    safe_label = "".join(c if c.isalnum() or c in "-_." else "_" for c in label)
+    return PROFILES_DIR / f"{datetime.datetime.now():%Y%m%d-%H%M%S}_{kind}_{safe_label}_{os.getpid()}"
+
+
+async def start_tracing(context):
+    """เริ่ม Playwright tracing ของ context (ไม่ทำอะไรถ้าไม่ได้อยู่ใน profiled_run)"""
+    run = _current.get()
+    if run is None:
+        return
+    try:
+        await context.tracing.start(screenshots=True, snapshots=True, title=run["label"])
+    except Exception as e:
+        print(f"⚠️ เริ่ม Playwright tracing ไม่ได้: {e}")
+        return
+    run["contexts"].append(context)
+
+
+async def stop_tracing(context):
+    """บันทึก Playwright trace ของ context ลงโฟลเดอร์ของการรัน ต้องเรียกก่อน context.close()"""
+    run = _current.get()
+    if run is None or context not in run["contexts"]:
+        return
+    run["contexts"].remove(context)
+    run["traces"] += 1
+    suffix = f"_{run['traces']}" if run["traces"] > 1 else ""
+    try:
+        await context.tracing.stop(path=str(run["dir"] / f"playwright_trace{suffix}.zip"))
+    except Exception as e:
+        print(f"⚠️ บันทึก Playwright trace ไม่ได้: {e}")
+
+
+def breakdown(stats):
+    """
+    แยกเวลาใน cProfile (วินาที, tottime) เป็น ours: โค้ดของโปรเจกต์, playwright: ฝั่ง Python ของ Playwright (IPC/serialize),
+    wait: event loop รอเบราว์เซอร์ (หน้าเว็บ + round trip), other: library อื่น/asyncio
+    หมายเหตุ: wait รวมเวลาที่ตั้งใจรอด้วย (prewarm_idle, รอผู้ใช้กด Enter) ดูเทียบกับ span ใน booking_trace.jsonl
+    """
+    groups = {"ours": 0.0, "playwright": 0.0, "wait": 0.0, "other": 0.0}
+    for (filename, _, function), (_, _, tottime, _, _) in stats.stats.items():
+        if filename == "~" and any(name in function for name in _WAIT_FUNCTIONS):
+            groups["wait"] += tottime
+        elif "playwright" in filename:
+            groups["playwright"] += tottime
+        elif filename.startswith(_PROJECT_DIR) and "site-packages" not in filename:
+            groups["ours"] += tottime
+        else:
+            groups["other"] += tottime
+    return {name: round(seconds, 3) for name, seconds in groups.items()}
+
+
+def _enforce_run_cap(run_dir):
+    dropped = []
+    size = _dir_size(run_dir)
+    for trace in sorted(run_dir.glob("playwright_trace*.zip"), key=lambda p: -p.stat().st_size):
+        if size <= MAX_RUN_BYTES:
+            break
+        size -= trace.stat().st_size
+        trace.unlink()
+        dropped.append(trace.name)
+    if dropped:
+        print(f"⚠️ ผล profiling เกิน {MAX_RUN_BYTES / 1024 / 1024:.0f} MB, ลบ {', '.join(dropped)} (เก็บ cProfile ไว้)")
+    return dropped
+
+
+def _write_results(run, profiler, duration_s):
+    import pstats
+
+    summary = {
+        "kind": run["kind"],
+        "label": run["label"],
+        "trace_run_id": run["trace_run_id"],
+        "started": run["started"],
+        "duration_s": round(duration_s, 3),
+    }
+    if profiler is not None:
+        profiler.dump_stats(str(run["dir"] / "python.prof"))
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        (run["dir"] / "python_top.txt").write_text(stream.getvalue(), encoding="utf-8")
+        summary["breakdown_s"] = breakdown(stats)
+
+    summary["dropped"] = _enforce_run_cap(run["dir"])
+    summary["files"] = {f.name: f.stat().st_size for f in sorted(run["dir"].iterdir()) if f.is_file()}
+    with open(run["dir"] / "run.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    return summary
+
+
+@asynccontextmanager
+async def profiled_run(kind, label):
+    """
+    profile การรันหนึ่งครั้ง ถ้าเปิด profiling ไว้ (is_enabled) ไม่เช่นนั้นไม่ทำอะไร
+    ต้องเรียกใน event loop ของ BookingEngine: cProfile จับเฉพาะ thread ที่เปิด (งานใน asyncio.to_thread ไม่ถูกนับ)
+    context ที่เริ่ม start_tracing แล้วยังไม่ถูก stop_tracing จะถูกบันทึก trace ตอนจบ
+    """
+    if not is_enabled():
+        yield None
+        return
+
+    prune_runs(reserve=1)
+    trace = current_run()
+    run = {
+        "kind": kind,
+        "label": label,
+        "dir": _run_dir(kind, label),
+        "trace_run_id": trace["run_id"] if trace else None,
+        "started": datetime.datetime.now().isoformat(timespec="seconds"),
+        "contexts": [],
+        "traces": 0,
+    }
+    run["dir"].mkdir(parents=True, exist_ok=True)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # มี profiler อื่นทำงานอยู่ใน thread นี้ (เช่นการรันอื่นบน loop เดียวกันที่ profile อยู่)
+        print("⚠️ มี profiler อื่นทำงานอยู่ใน thread นี้, ข้าม cProfile (เก็บเฉพาะ Playwright trace)")
+        profiler = None
+    print(f"🔬 เปิด profiling: ผลจะอยู่ที่ {run['dir']}")
+
+    token = _current.set(run)
+    started = time.perf_counter()
+    try:
+        yield run
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        for context in list(run["contexts"]):
+            # context ที่ไม่ได้ปิดตามปกติ (เช่น flow ล้มเหลวกลางทาง)
+            await stop_tracing(context)
+        _current.reset(token)
+        try:
+            summary = _write_results(run, profiler, time.perf_counter() - started)
+        except Exception as e:
+            print(f"⚠️ บันทึกผล profiling ไม่ได้: {e}")
+        else:
+            _print_result(run["dir"], summary)
+
+
+def _print_result(run_dir, summary):
+    parts = summary.get("breakdown_s")
+    if parts:
+        print(f"🔬 profiling {summary['duration_s']:.1f} วินาที: โค้ดของเรา {parts['ours']:.2f} s, "
+              f"Playwright (IPC ฝั่ง Python) {parts['playwright']:.2f} s, รอเบราว์เซอร์/หน้าเว็บ {parts['wait']:.2f} s, "
+              f"อื่น ๆ {parts['other']:.2f} s")
+    total_mb = sum(summary["files"].values()) / 1024 / 1024
+    print(f"🔬 ผล profiling ({total_mb:.1f} MB): {run_dir}")
+    for name in summary["files"]:
+        if name.startswith("playwright_trace"):
+            print(f"   ดู trace: playwright show-trace {run_dir / name}")
+    if "python.prof" in summary["files"]:
+        print(f"   ดู cProfile: python -m pstats {run_dir / 'python.prof'}")
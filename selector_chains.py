@@ -0,0 +1,142 @@
+import asyncio
+import weakref
+
+from playwright.async_api import TimeoutError
+
+from tracing import current_run, span
+
+# selector ใน booking_elements/*.json เป็นได้ทั้ง string หรือ list ของตัวเลือกเรียงตามลำดับที่ต้องการ เช่น
+#   "line_connect_button_initial": ["body > div > div.sc-396c748-0.YUIJZ > ... > button", "button:has-text('Connect')"]
+# ทุกตัวเลือกถูกรอพร้อมกัน ตัวแรกที่เจอชนะ ตัวเลือกที่ไม่เจอบนหน้าที่ตัวอื่นเจอแล้วถูกรายงานว่า stale
+# (class ที่ generate จากการ build เว็บใหม่จะเสียไปเฉย ๆ) จึงเสียเวลาแค่ round trip เดียว ไม่ต้องรอจน timeout
+
+# Locator ที่สร้างแล้วของแต่ละหน้า: {page: {selector: Locator}}
+_locator_cache = weakref.WeakKeyDictionary()
+
+# selector ที่ไม่ตรงกับหน้าเว็บแล้ว: {(key, selector): จำนวนครั้งที่พบ}
+# เก็บแยกต่อการรัน (ใน dict ของ tracing.trace_run) ไม่ให้การรันก่อนหน้าใน process เดียวกันปนมาในสรุปของรอบนี้
+# โค้ดที่ไม่ได้อยู่ใน trace_run (เช่น benchmark) ใช้ _untraced_stale และเรียก reset_stale() เองก่อนแต่ละรอบ
+_untraced_stale = {}
+
+
+def _stale():
+    run = current_run()
+    if run is None:
+        return _untraced_stale
+    return run.setdefault("stale_selectors", {})
+
+
+def reset_stale():
+    """ล้างตัวนับ stale ของโค้ดที่ไม่ได้อยู่ใน trace_run"""
+    _untraced_stale.clear()
+
+
+def get_locator(page, selector):
+    """คืน Locator ของ selector บนหน้านี้ (สร้างครั้งเดียวต่อหน้า)"""
+    page_locators = _locator_cache.setdefault(page, {})
+    locator = page_locators.get(selector)
+    if locator is None:
+        locator = page.locator(selector)
+        page_locators[selector] = locator
+    return locator
+
+
+def alternatives(value):
+    """ตัวเลือกทั้งหมดของ selector (string เดียวหรือ list)"""
+    if value is None:
+        return []
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _mark_stale(key, missed, winner):
+    stale = _stale()
+    for selector in missed:
+        first_time = (key, selector) not in stale
+        stale[(key, selector)] = stale.get((key, selector), 0) + 1
+        if first_time:
+            print(f"⚠️ selector '{key}' ตัวเลือก {selector!r} ไม่ตรงกับหน้าเว็บแล้ว (stale), ใช้ {winner!r} แทน")
+            with span("stale_selector", category="selector", key=key, selector=selector, winner=winner):
+                pass
+
+
+async def _report_misses(page, key, options, winner):
+    # นับตัวเลือกที่เหลือพร้อมกันในรอบเดียว ตัวที่ไม่เจอเลยถือว่า stale
+    others = [selector for selector in options if selector != winner]
+    counts = await asyncio.gather(*(get_locator(page, selector).count() for selector in others), return_exceptions=True)
+    _mark_stale(key, [selector for selector, count in zip(others, counts) if count == 0], winner)
+
+
+async def wait_for_any(page, key, value, state="visible", timeout=None):
+    """
+    รอจนตัวเลือกใดตัวเลือกหนึ่งของ selector อยู่ในสถานะ state คืน Locator (.first) ของตัวที่ชนะ
+    ถ้าเจอพร้อมกันหลายตัวจะเลือกตามลำดับใน list, ไม่เจอเลยภายใน timeout จะ raise TimeoutError
+    """
+    options = alternatives(value)
+    if len(options) == 1:
+        locator = get_locator(page, options[0]).first
+        await locator.wait_for(state=state, timeout=timeout)
+        return locator
+
+    tasks = {asyncio.ensure_future(get_locator(page, selector).first.wait_for(state=state, timeout=timeout)): selector for selector in options}
+    pending = set(tasks)
+    winner = None
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda t: options.index(tasks[t])):
+                if task.exception() is None:
+                    winner = tasks[task]
+                    break
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    if winner is None:
+        raise TimeoutError(f"ไม่พบ '{key}' จากตัวเลือก {len(options)} แบบภายใน {timeout} ms")
+    await _report_misses(page, key, options, winner)
+    return get_locator(page, winner).first
+
+
+async def find_present(page, key, value):
+    """
+    ตรวจทันทีโดยไม่รอ (แทน page.query_selector) คืน Locator (.first) ของตัวเลือกแรกที่มีอยู่บนหน้า หรือ None
+    """
+    options = alternatives(value)
+    if not options:
+        return None
+    counts = await asyncio.gather(*(get_locator(page, selector).count() for selector in options))
+    found = [selector for selector, count in zip(options, counts) if count > 0]
+    if not found:
+        return None
+    _mark_stale(key, [selector for selector, count in zip(options, counts) if count == 0], found[0])
+    return get_locator(page, found[0]).first
+
+
+async def evaluate_any(page, key, value, script):
+    """
+    evaluate_all กับทุกตัวเลือกพร้อมกัน คืน (Locator, ผลลัพธ์) ของตัวเลือกแรกที่ได้ผลไม่ว่าง
+    ถ้าไม่มีตัวไหนเจอเลย คืน Locator ของตัวเลือกแรกกับ list ว่าง
+    """
+    options = alternatives(value)
+    results = await asyncio.gather(*(get_locator(page, selector).evaluate_all(script) for selector in options))
+    for selector, result in zip(options, results):
+        if result:
+            _mark_stale(key, [s for s, r in zip(options, results) if not r], selector)
+            return get_locator(page, selector), result
+    return get_locator(page, options[0]), []
+
+
+def stale_selectors():
+    """selector ที่พบว่า stale ในการรันปัจจุบัน: list ของ (key, selector, จำนวนครั้ง)"""
+    return [(key, selector, count) for (key, selector), count in sorted(_stale().items())]
+
+
+def print_stale_summary():
+    stale = stale_selectors()
+    if not stale:
+        return
+    print(f"🧟 selector ที่ไม่ตรงกับหน้าเว็บแล้ว {len(stale)} ตัว (ควรแก้ใน booking_elements):")
+    for key, selector, count in stale:
+        print(f"   - {key}: {selector!r} ({count} ครั้ง)")
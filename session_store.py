@@ -0,0 +1,103 @@
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+# storage_state (cookies + localStorage) ของแต่ละโปรไฟล์ หลังล็อกอิน LINE สำเร็จ
+# ใช้ข้ามการตรวจ LINE login (เปิดหน้า Profile แล้วรอปุ่ม Connect) ในการรันครั้งถัดไป
+SESSIONS_DIR = Path("cache/sessions")
+
+# อายุสูงสุดของ session ที่บันทึกไว้ก่อนจะตรวจ LINE login ใหม่ (วินาที)
+DEFAULT_MAX_AGE_SECONDS = 12 * 60 * 60
+# cookie ที่จะหมดอายุภายในเวลานี้ถือว่าใช้ไม่ได้แล้ว (วินาที)
+COOKIE_EXPIRY_MARGIN_SECONDS = 5 * 60
+
+
+def session_path(browser, profile_name):
+    return SESSIONS_DIR / f"{browser}_{profile_name}.json"
+
+
+def _host_matches(host, cookie_domain):
+    domain = cookie_domain.lstrip(".")
+    return host == domain or host.endswith("." + domain)
+
+
+def _read(browser, profile_name):
+    try:
+        with open(session_path(browser, profile_name), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️ อ่าน session ที่บันทึกไว้ไม่ได้ ({browser}/{profile_name}): {e}")
+        return None
+
+
+def load_fresh_session(browser, profile_name, url, max_age_seconds=DEFAULT_MAX_AGE_SECONDS):
+    """
+    คืน session ที่บันทึกไว้ถ้ายังใช้ได้ (ไม่เปิดเบราว์เซอร์ ตรวจจากไฟล์อย่างเดียว):
+    บันทึกไว้ไม่เกิน max_age_seconds และมี cookie ของโดเมน url ที่ยังไม่หมดอายุ
+    คืน (session, reason) โดย session เป็น None เมื่อใช้ไม่ได้
+    """
+    session = _read(browser, profile_name)
+    if session is None:
+        return None, "ไม่มี session ที่บันทึกไว้"
+
+    age = time.time() - session.get("saved_at", 0)
+    if age > max_age_seconds:
+        return None, f"session อายุ {age / 3600:.1f} ชั่วโมง (เกิน {max_age_seconds / 3600:.0f})"
+
+    host = urlparse(url).hostname or ""
+    cookies = [c for c in session.get("storage_state", {}).get("cookies", []) if _host_matches(host, c.get("domain", ""))]
+    if not cookies:
+        return None, f"ไม่มี cookie ของ {host}"
+    deadline = time.time() + COOKIE_EXPIRY_MARGIN_SECONDS
+    # expires = -1 คือ session cookie (ไม่มีวันหมดอายุที่แน่นอน)
+    expired = [c["name"] for c in cookies if 0 < c.get("expires", -1) < deadline]
+    if expired:
+        return None, f"cookie หมดอายุ ({', '.join(expired)})"
+    return session, f"session อายุ {age / 60:.0f} นาที"
+
+
+async def apply_session(context, session):
+    """ใส่ cookies และ localStorage ของ session ลงใน context ก่อนเปิดหน้าเว็บ"""
+    state = session["storage_state"]
+    if state.get("cookies"):
+        await context.add_cookies(state["cookies"])
+    origins = {o["origin"]: {item["name"]: item["value"] for item in o.get("localStorage", [])} for o in state.get("origins", [])}
+    if any(origins.values()):
+        # localStorage ใส่ได้ตอนหน้าเว็บโหลดเท่านั้น จึงใช้ init script (ไม่ทับค่าที่เว็บตั้งไว้แล้ว)
+        await context.add_init_script(script=f"""(() => {{
+            const items = {json.dumps(origins)}[location.origin];
+            if (!items) return;
+            for (const [name, value] of Object.entries(items)) {{
+                if (localStorage.getItem(name) === null) localStorage.setItem(name, value);
+            }}
+        }})()""")
+
+
+async def save_session(context, browser, profile_name, login_check_ms=None):
+    """
+    บันทึก storage_state ของ context (เรียกหลังล็อกอินสำเร็จ และก่อนปิดเบราว์เซอร์)
+    login_check_ms: เวลาที่ใช้ตรวจ LINE login ในรอบนี้ (ใช้ประมาณเวลาที่ประหยัดได้ในรอบถัดไป)
+    """
+    state = await context.storage_state()
+    if login_check_ms is None:
+        previous = _read(browser, profile_name) or {}
+        login_check_ms = previous.get("login_check_ms")
+
+    path = session_path(browser, profile_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"saved_at": time.time(), "login_check_ms": login_check_ms, "storage_state": state}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def invalidate_session(browser, profile_name):
+    """ลบ session ที่บันทึกไว้ (เช่นเมื่อจองไม่สำเร็จหลังใช้ session เดิม)"""
+    try:
+        session_path(browser, profile_name).unlink()
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,109 @@
+import json
+import os
+from pathlib import Path
+
+from config_service import load_json
+
+# plan ของแต่ละ site (ส่วนที่ไม่ต้องใช้ Playwright) แยกจาก flow_engine
+# เพื่อให้ GUI อ่านรายการเว็บได้โดยไม่ต้อง import Playwright ตอนเปิดโปรแกรม
+
+# โฟลเดอร์ที่เก็บคำอธิบายเว็บไซต์ (selectors + flow) ของแต่ละ site
+SITES_DIR = Path("booking_elements")
+
+# ถ้าตั้ง BOOKING_MOCK_URL (เช่น http://127.0.0.1:8765 จาก mock_server.py) ทุก site จะชี้ไปที่เว็บจำลอง
+MOCK_BASE_URL = os.environ.get("BOOKING_MOCK_URL", "").rstrip("/")
+
+# action ที่ flow engine รองรับ
+STEP_ACTIONS = {"click", "check", "require", "select_text"}
+
+# นโยบายลองใหม่เมื่อขั้นตอนล้มเหลว (ทับได้ด้วย "retry" ในไฟล์ JSON ของ site)
+# max_retries: จำนวนครั้งที่ลองใหม่ได้ทั้ง flow
+# same_step_attempts: ลองขั้นตอนเดิมบนหน้าเดิมกี่ครั้ง ก่อนถอยกลับไปขั้นตอน anchor ก่อนหน้า
+# backoff_ms: เวลารอก่อนลองใหม่แต่ละครั้ง
+DEFAULT_RETRY_POLICY = {"max_retries": 3, "same_step_attempts": 1, "backoff_ms": 300}
+
+# plan ที่ compile แล้วของแต่ละ site: {site_name: (ข้อมูล JSON ที่ใช้ compile, plan)}
+# compile ใหม่เมื่อ config_service โหลดไฟล์ใหม่ (ไฟล์ถูกแก้ไข)
+_plan_cache = {}
+
+
+def _resolve_selector(selectors, key, site_name, step_name):
+    if key not in selectors:
+        raise ValueError(f"site '{site_name}' ขั้นตอน '{step_name}': ไม่พบ selector '{key}'")
+    return selectors[key]
+
+
+def compile_plan(site_name, site_config):
+    """
+    แปลงคำอธิบาย site (dict จากไฟล์ JSON) เป็น plan ที่พร้อมรัน
+    ตรวจสอบ action และ selector ของทุกขั้นตอนตั้งแต่ตอนโหลด
+    """
+    selectors = site_config.get("selectors", {})
+    steps = []
+    for raw_step in site_config.get("flow", []):
+        step_name = raw_step["name"]
+        action = raw_step["action"]
+        if action not in STEP_ACTIONS:
+            raise ValueError(f"site '{site_name}' ขั้นตอน '{step_name}': ไม่รองรับ action '{action}'")
+
+        step = {
+            "name": step_name,
+            "action": action,
+            "optional": raw_step.get("optional", False),
+            "timeout_ms": raw_step.get("timeout_ms"),
+            "ready": raw_step.get("ready"),
+            "fail_message": raw_step.get("fail_message"),
+            # anchor: ขั้นตอนที่เริ่ม flow ใหม่จากตรงนี้ได้ (เช่นปุ่มเข้าหน้า Booking ที่ล้างฟอร์มเดิม)
+            "anchor": raw_step.get("anchor", False),
+            # retry: false = ขั้นตอนนี้ล้มเหลวแล้วไม่ลองใหม่ (เช่นกดยืนยันไปแล้ว)
+            "retry": raw_step.get("retry", True),
+        }
+        # selector เป็น string หรือ list ของตัวเลือก (ดู selector_chains.py), *_key เก็บชื่อไว้รายงาน selector ที่ stale
+        if action == "select_text":
+            step["container"] = _resolve_selector(selectors, raw_step["container"], site_name, step_name)
+            step["container_key"] = raw_step["container"]
+            step["items"] = _resolve_selector(selectors, raw_step["items"], site_name, step_name)
+            step["items_key"] = raw_step["items"]
+            step["value"] = raw_step["value"]
+            step["fallback"] = raw_step.get("fallback", "first")
+        else:
+            step["target"] = _resolve_selector(selectors, raw_step["target"], site_name, step_name)
+            step["target_key"] = raw_step["target"]
+        steps.append(step)
+
+    site_url = site_config.get("site_url")
+    if MOCK_BASE_URL and site_url:
+        site_url = f"{MOCK_BASE_URL}/{site_name}/"
+
+    return {
+        "name": site_name,
+        "site_url": site_url,
+        "trial": site_config.get("trial", False),
+        "selectors": selectors,
+        "steps": steps,
+        "retry": dict(DEFAULT_RETRY_POLICY, **site_config.get("retry", {})),
+    }
+
+
+def load_site_plan(site_name):
+    """คืน plan ของ site จาก cache (compile ใหม่เฉพาะเมื่อไฟล์ JSON เปลี่ยน)"""
+    site_config = load_json(SITES_DIR / f"{site_name}.json")
+    cached = _plan_cache.get(site_name)
+    if cached is not None and cached[0] is site_config:
+        return cached[1]
+    plan = compile_plan(site_name, site_config)
+    _plan_cache[site_name] = (site_config, plan)
+    return plan
+
+
+def list_trial_sites():
+    """คืนรายชื่อ plan ของ site ที่เปิดให้ใช้ใน Trial Mode (เรียงตามชื่อไฟล์)"""
+    plans = []
+    for path in sorted(SITES_DIR.glob("*.json")):
+        try:
+            site_config = load_json(path)
+        except (OSError, json.JSONDecodeError):
+            continue
+        if isinstance(site_config, dict) and site_config.get("trial") and site_config.get("flow"):
+            plans.append(load_site_plan(path.stem))
+    return plans
@@ -0,0 +1,95 @@
+import importlib.abc
+import sys
+import time
+
+# รายงานเวลาเปิดโปรแกรม (คล้าย python -X importtime แต่ใช้ได้ใน build ของ PyInstaller ด้วย)
+# เปิดด้วย: python main.py --startup-profile [--gui]
+
+_started = time.perf_counter()
+_enabled = False
+_phases = []
+# เวลา import ของแต่ละโมดูล: {name: {"self_ms", "cumulative_ms", "depth"}}
+_imports = {}
+_import_stack = []
+
+
+class _TimedLoader:
+    """ห่อ loader เดิมเพื่อจับเวลา exec_module (attribute อื่นส่งต่อให้ loader เดิม)"""
+
+    def __init__(self, loader, name):
+        self._loader = loader
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        entry = {"self_ms": 0.0, "cumulative_ms": 0.0, "depth": len(_import_stack)}
+        _import_stack.append(entry)
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            _import_stack.pop()
+            entry["cumulative_ms"] = elapsed
+            entry["self_ms"] += elapsed
+            if _import_stack:
+                # เวลาของโมดูลลูกไม่นับเป็น self time ของโมดูลแม่
+                _import_stack[-1]["self_ms"] -= elapsed
+            _imports[self._name] = entry
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, name)
+                return spec
+        return None
+
+
+def install():
+    """เริ่มจับเวลา import และช่วงต่าง ๆ ของการเปิดโปรแกรม (เรียกก่อน import โมดูลหนัก)"""
+    global _enabled
+    if _enabled:
+        return
+    _enabled = True
+    sys.meta_path.insert(0, _TimingFinder())
+
+
+def enabled():
+    return _enabled
+
+
+def mark(phase):
+    """บันทึกเวลาที่ถึงช่วงนี้ของการเปิดโปรแกรม (ไม่ทำอะไรถ้าไม่ได้เปิด --startup-profile)"""
+    if _enabled:
+        _phases.append((phase, (time.perf_counter() - _started) * 1000))
+
+
+def report(top=20):
+    if not _enabled:
+        return
+    print(f"\n📊 Startup profile ({(time.perf_counter() - _started) * 1000:.0f} ms ตั้งแต่เริ่มจับเวลา)")
+    previous = 0.0
+    for phase, at_ms in _phases:
+        print(f"  {at_ms:>8.0f} ms  (+{at_ms - previous:>6.0f})  {phase}")
+        previous = at_ms
+
+    top_level = sorted(
+        ((name, entry) for name, entry in _imports.items() if entry["depth"] == 0),
+        key=lambda item: item[1]["cumulative_ms"],
+        reverse=True,
+    )
+    print(f"  import ที่ใช้เวลามากที่สุด ({len(_imports)} โมดูลถูก import):")
+    print(f"  {'cumulative ms':>14}{'self ms':>10}  module")
+    for name, entry in top_level[:top]:
+        print(f"  {entry['cumulative_ms']:>14.1f}{entry['self_ms']:>10.1f}  {name}")
@@ -0,0 +1,75 @@
+import time
+
+from playwright.async_api import TimeoutError
+
+# budget เริ่มต้นของแต่ละขั้นตอน (ms) ถ้าใน config ไม่ได้ระบุ budget_ms
+DEFAULT_BUDGET_MS = 10000
+
+
+async def wait_until_ready(page, condition, budget_ms):
+    """
+    รอจนเงื่อนไขความพร้อมของขั้นตอนเป็นจริง
+    condition รองรับ type: selector, url, js (type response ต้องใช้ผ่าน perform_step)
+    ถ้าไม่มี condition จะ fallback เป็น networkidle แบบเดิม
+    """
+    if not condition:
+        await page.wait_for_load_state("networkidle", timeout=budget_ms)
+        return
+
+    condition_type = condition.get("type")
+    if condition_type == "selector":
+        await page.wait_for_selector(condition["selector"], state=condition.get("state", "visible"), timeout=budget_ms)
+    elif condition_type == "url":
+        await page.wait_for_url(condition["url"], wait_until="commit", timeout=budget_ms)
+    elif condition_type == "js":
+        await page.wait_for_function(condition["expression"], timeout=budget_ms)
+    else:
+        raise ValueError(f"ไม่รองรับ readiness type: {condition_type}")
+
+
+async def perform_step(page, step_name, action, condition):
+    """
+    ทำ action ของขั้นตอน (เช่นคลิกปุ่ม) แล้วรอจน readiness (condition) ของขั้นตอนนั้นเป็นจริง
+    timeout ของการรอ readiness จะถูกรายงานแต่ไม่หยุด flow (เหมือน networkidle เดิม)
+    คืนค่า dict: step, ok, waited_ms, budget_ms, condition
+    """
+    budget_ms = condition.get("budget_ms", DEFAULT_BUDGET_MS) if condition else DEFAULT_BUDGET_MS
+    condition_type = condition.get("type") if condition else "networkidle"
+
+    started = None
+    ok = True
+    try:
+        if condition_type == "response":
+            # ต้องดัก response ก่อนคลิก เพื่อไม่ให้พลาด XHR ที่ตอบกลับเร็ว
+            async with page.expect_response(condition["url"], timeout=budget_ms) as response_info:
+                await action()
+                started = time.perf_counter()
+            await response_info.value
+        else:
+            await action()
+            started = time.perf_counter()
+            await wait_until_ready(page, condition, budget_ms)
+    except TimeoutError:
+        if started is None:
+            # action เอง timeout (เช่นหาปุ่มไม่เจอ) ให้ผู้เรียกจัดการต่อ
+            raise
+        ok = False
+        print(f"⚠️ ขั้นตอน '{step_name}' ยังไม่พร้อมภายใน {budget_ms} ms ({condition_type}), อาจมีปัญหา")
+
+    waited_ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+    print(f"⏱️ {step_name}: รอ {waited_ms:.0f}/{budget_ms} ms ({condition_type})")
+    return {
+        "step": step_name,
+        "ok": ok,
+        "waited_ms": round(waited_ms, 1),
+        "budget_ms": budget_ms,
+        "condition": condition_type,
+    }
+
+
+def print_step_summary(step_timings):
+    if not step_timings:
+        return
+    total_waited = sum(t["waited_ms"] for t in step_timings)
+    total_budget = sum(t["budget_ms"] for t in step_timings)
+    print(f"📊 เวลารอรวม {total_waited:.0f} ms จาก budget {total_budget} ms ({len(step_timings)} ขั้นตอน)")
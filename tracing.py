@@ -0,0 +1,259 @@
+import contextvars
+import datetime
+import json
+import math
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+# ไฟล์ JSONL แบบ append-only ที่เก็บ span ของทุกการรัน
+TRACE_LOG_PATH = Path("logs/booking_trace.jsonl")
+
+# การรันปัจจุบันของ context นี้ (asyncio task / thread แต่ละตัวมีของตัวเอง)
+_current_run = contextvars.ContextVar("booking_trace_run", default=None)
+_write_lock = threading.Lock()
+_listeners = []
+
+
+def add_listener(callback):
+    """callback(record) จะถูกเรียกทุกครั้งที่ span/run จบ (เช่นส่ง progress จาก worker process)"""
+    _listeners.append(callback)
+
+
+def _write_records(records):
+    if not records:
+        return
+    lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+    with _write_lock:
+        TRACE_LOG_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(TRACE_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def _append_record(run, record):
+    # span ส่วนใหญ่จบบน event loop ของ BookingEngine: เก็บไว้ใน buffer ของการรัน แล้วเขียนไฟล์ครั้งเดียวตอน trace_run จบ
+    # (span ที่จบหลังการรันเขียนไฟล์ไปแล้ว เขียนตรงทันที)
+    buffer = run["records"]
+    if buffer is None:
+        _write_records([record])
+    else:
+        buffer.append(record)
+    for callback in _listeners:
+        try:
+            callback(record)
+        except Exception:
+            pass
+
+
+def current_run():
+    """คืน dict ของการรันปัจจุบัน หรือ None ถ้าไม่ได้อยู่ใน trace_run"""
+    return _current_run.get()
+
+
+@contextmanager
+def trace_run(kind, **attrs):
+    """
+    เริ่มบันทึก trace ของการรันหนึ่งครั้ง (live / trial)
+    ถ้าอยู่ใน trace_run อยู่แล้วจะใช้การรันเดิมต่อ
+    """
+    existing = _current_run.get()
+    if existing is not None:
+        yield existing
+        return
+
+    run = {
+        "run_id": uuid.uuid4().hex[:12],
+        "kind": kind,
+        "attrs": attrs,
+        "started": time.monotonic(),
+        "records": [],
+    }
+    token = _current_run.set(run)
+    status = "ok"
+    try:
+        yield run
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _current_run.reset(token)
+        _append_record(run, {
+            "run_id": run["run_id"],
+            "kind": kind,
+            "span": "run",
+            "category": "run",
+            "start_ms": 0.0,
+            "duration_ms": round((time.monotonic() - run["started"]) * 1000, 1),
+            "status": status,
+            "ts": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "attrs": attrs,
+        })
+        records, run["records"] = run["records"], None
+        try:
+            _write_records(records)
+        except OSError as e:
+            print(f"⚠️ บันทึก trace ไม่ได้ ({TRACE_LOG_PATH}): {e}")
+
+
+@contextmanager
+def span(name, category="phase", **attrs):
+    """
+    บันทึกช่วงเวลา (monotonic clock) ของขั้นตอนหนึ่งลงไฟล์ trace (เขียนลงไฟล์พร้อมกันตอน trace_run จบ)
+    category: phase (เตรียมเบราว์เซอร์/โหลดหน้า), step (ขั้นตอนใน flow), human (รอผู้ใช้)
+    """
+    run = _current_run.get()
+    if run is None:
+        yield attrs
+        return
+
+    started = time.monotonic()
+    status = "ok"
+    try:
+        yield attrs
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        ended = time.monotonic()
+        _append_record(run, {
+            "run_id": run["run_id"],
+            "kind": run["kind"],
+            "span": name,
+            "category": category,
+            "start_ms": round((started - run["started"]) * 1000, 1),
+            "duration_ms": round((ended - started) * 1000, 1),
+            "status": status,
+            "ts": datetime.datetime.now().isoformat(timespec="milliseconds"),
+            "attrs": attrs,
+        })
+
+
+def load_records(path=TRACE_LOG_PATH):
+    records = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def percentile(values, pct):
+    """percentile แบบ nearest-rank (values ต้องเรียงแล้ว)"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def summarize(records):
+    """รวมสถิติ p50/p95/max ของแต่ละ span จากทุกการรัน"""
+    durations = {}
+    round_trips = {}
+    for record in records:
+        durations.setdefault(record["span"], []).append(record["duration_ms"])
+        trips = (record.get("attrs") or {}).get("round_trips")
+        if trips is not None:
+            round_trips.setdefault(record["span"], []).append(trips)
+
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        summary[name] = {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "max": values[-1],
+            # จำนวน round trip ไปยังเบราว์เซอร์เฉลี่ย (เฉพาะ span ของขั้นตอนที่บันทึกไว้)
+            "round_trips": sum(round_trips[name]) / len(round_trips[name]) if name in round_trips else None,
+        }
+    return summary
+
+
+def summarize_page_loads(records):
+    """เปรียบเทียบการโหลดหน้าแรก (span navigation) ระหว่างรอบที่บล็อกและไม่บล็อก resource"""
+    groups = {}
+    for record in records:
+        attrs = record.get("attrs") or {}
+        if record["span"] != "navigation" or "transfer_bytes" not in attrs:
+            continue
+        groups.setdefault(bool(attrs.get("blocking")), []).append((attrs["transfer_bytes"], attrs.get("dom_ready_ms") or 0, record["duration_ms"]))
+
+    summary = {}
+    for blocking, rows in groups.items():
+        summary[blocking] = {
+            "count": len(rows),
+            "transfer_kb": sum(row[0] for row in rows) / len(rows) / 1024,
+            "dom_ready_p50": percentile(sorted(row[1] for row in rows), 50),
+            "navigation_p50": percentile(sorted(row[2] for row in rows), 50),
+        }
+    return summary
+
+
+def summarize_retries(records):
+    """รวมการลองใหม่ของ flow (span booking_steps ที่มี retries) คืน None ถ้าไม่เคยลองใหม่"""
+    rows = [r for r in records if r["span"] == "booking_steps" and (r.get("attrs") or {}).get("retries")]
+    if not rows:
+        return None
+    return {
+        "runs": len(rows),
+        "retries": sum(r["attrs"]["retries"] for r in rows),
+        "recovered_s": sum(r["attrs"].get("recovered_ms", 0) for r in rows) / 1000,
+    }
+
+
+def summarize_stale_selectors(records):
+    """selector ที่ถูกรายงานว่า stale (span stale_selector) นับจำนวนการรันต่อ (key, selector)"""
+    runs = {}
+    for record in records:
+        attrs = record.get("attrs") or {}
+        if record["span"] == "stale_selector":
+            runs.setdefault((attrs.get("key"), attrs.get("selector")), set()).add(record["run_id"])
+    return {key: len(run_ids) for key, run_ids in runs.items()}
+
+
+def print_summary(path=TRACE_LOG_PATH):
+    records = load_records(path)
+    if not records:
+        print(f"ℹ️ ยังไม่มีข้อมูล trace ใน {path}")
+        return
+
+    run_count = len({r["run_id"] for r in records})
+    print(f"📊 สรุปเวลาแต่ละขั้นตอนจาก {run_count} การรัน ({path})")
+    print(f"{'span':<28}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'trips':>7}")
+    for name, stats in sorted(summarize(records).items()):
+        trips = f"{stats['round_trips']:.1f}" if stats["round_trips"] is not None else "-"
+        print(f"{name:<28}{stats['count']:>7}{stats['p50']:>10.0f}{stats['p95']:>10.0f}{stats['max']:>10.0f}{trips:>7}")
+
+    page_loads = summarize_page_loads(records)
+    if page_loads:
+        print(f"\n{'โหลดหน้าแรก':<28}{'count':>7}{'avg KB':>10}{'DOM p50':>10}{'nav p50':>10}")
+        for blocking, stats in sorted(page_loads.items()):
+            label = "บล็อก resource" if blocking else "ไม่บล็อก"
+            print(f"{label:<28}{stats['count']:>7}{stats['transfer_kb']:>10.0f}{stats['dom_ready_p50']:>10.0f}{stats['navigation_p50']:>10.0f}")
+
+    retries = summarize_retries(records)
+    if retries:
+        print(f"\n♻️ ลองใหม่ {retries['retries']} ครั้งใน {retries['runs']} การรัน, "
+              f"ประหยัดเวลาเทียบกับเริ่มจองใหม่รวม ~{retries['recovered_s']:.1f} วินาที")
+
+    stale = summarize_stale_selectors(records)
+    if stale:
+        print("\n🧟 selector ที่ไม่ตรงกับหน้าเว็บแล้ว (ควรแก้ใน booking_elements):")
+        for (key, selector), run_count in sorted(stale.items(), key=lambda item: -item[1]):
+            print(f"   - {key}: {selector!r} ({run_count} การรัน)")
+
+
+if __name__ == "__main__":
+    # python tracing.py [path]
+    print_summary(Path(sys.argv[1]) if len(sys.argv) > 1 else TRACE_LOG_PATH)
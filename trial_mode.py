@@ -1,12 +1,25 @@
-import json
+import asyncio
 from pathlib import Path
-from playwright.sync_api import sync_playwright
-import booking_scripts.site_pmrocket as pmrocket
-import booking_scripts.site_ithitec as ithitec
-
+from booking_engine import get_engine
+from config_service import load_json
+from resource_blocking import format_load_report, install_blocking, measure_page_load, resolve_launch_options
+from run_profiler import profiled_run, start_tracing, stop_tracing
+from site_plans import list_trial_sites
+from tracing import span, trace_run
+from worker_pool import in_worker
+
+def _make_trial_booking(site_name):
+    async def booking(page, branch, day, time_str):
+        # import flow engine (และ Playwright) เมื่อเริ่มจองจริงเท่านั้น
+        from flow_engine import run_site_flow
+        return await run_site_flow(page, site_name, branch, day, time_str)
+    return booking
+
+# สร้างรายการเว็บทดสอบจากไฟล์ booking_elements/*.json ที่มี "trial": true
+# (เพิ่มเว็บใหม่ได้ด้วยไฟล์ JSON อย่างเดียว)
 TRIAL_SITES = {
-    "1": ("https://popmart.ithitec.com/", ithitec.booking),
-    "2": ("https://pmrocketbotautoq.web.app/", pmrocket.booking)
+    str(i): (plan["site_url"], _make_trial_booking(plan["name"]))
+    for i, plan in enumerate(list_trial_sites(), start=1)
 }
 
 BROWSERS = {
@@ -19,71 +32,109 @@ def load_branch_list():
     if not branch_path.exists():
         print("❌ ไม่พบไฟล์ branch/config.json")
         return []
-    with open(branch_path, "r", encoding="utf-8") as f:
-        branches = json.load(f)
-    return branches
+    return load_json(branch_path)
 
 def load_time_list():
     time_path = Path("branch/time.json")
     if not time_path.exists():
         print("❌ ไม่พบไฟล์ branch/time.json")
         return []
-    with open(time_path, "r", encoding="utf-8") as f:
-        times = json.load(f)
-    return times
+    return load_json(time_path)
 
 # ปรับแก้ฟังก์ชัน start_trial_mode ให้รับค่าเป็นพารามิเตอร์
-def start_trial_mode(username: str, site_choice: str, browser_choice: str, branch: str, day: int, time_str: str):
+async def start_trial_mode_async(playwright, username: str, site_choice: str, browser_choice: str, branch: str, day: int, time_str: str, launch_options: dict = None):
+    """
+    launch_options: ตัวเลือกการเปิดเบราว์เซอร์ เช่น {"headless": True, "block_resources": True} (ดู resource_blocking.py)
+    คืน True เมื่อ flow ทดสอบจองจบครบทุกขั้นตอน
+    """
     print(f"\n🧪 Trial Mode for {username}")
+    launch_options = resolve_launch_options(launch_options)
+    headless = bool(launch_options["headless"])
 
     site = TRIAL_SITES.get(site_choice)
     if not site:
         print(f"❌ Invalid site selection: {site_choice}.")
-        return
+        return False
 
     site_url, booking_func = site
 
     browser_name = BROWSERS.get(browser_choice)
     if not browser_name:
         print(f"❌ Invalid browser selection: {browser_choice}.")
-        return
+        return False
 
     if branch is None:
         print("❌ ไม่สามารถโหลดรายชื่อสาขาได้")
-        return
+        return False
 
     if day is None or not (1 <= day <= 31):
         print(f"❌ เลือกวันไม่ถูกต้อง: {day}")
-        return
+        return False
 
     if time_str is None:
         print("❌ เลือกเวลาไม่ถูกต้อง")
-        return
+        return False
 
     try:
-        with sync_playwright() as p:
-            browser_type = getattr(p, "chromium")
-
-            if browser_name == "chrome":
-                browser = browser_type.launch(headless=False, channel="chrome")
-            elif browser_name == "edge":
-                browser = browser_type.launch(headless=False, channel="msedge")
-            else:
-                print(f"❌ ไม่รองรับเบราว์เซอร์: {browser_name}")
-                return
-
-            page = browser.new_page()
-            page.goto(site_url)
-            print(f"🌐 Opened {site_url} in {browser_name.capitalize()}")
-
-            # เรียกฟังก์ชัน booking พร้อมส่งค่า branch, day, time
-            booking_func(page, branch, day, time_str)
-
-            input("🕹️ Press Enter to close browser...")
-            browser.close()
+        with trace_run("trial", username=username, site=site_url, browser=browser_name, branch=branch, day=day, time=time_str):
+            async with profiled_run("trial", f"{username}_{browser_name}"):
+                browser_type = getattr(playwright, "chromium")
+                # ปิดเบราว์เซอร์เสมอ แม้ flow จะ error กลางทาง (driver ของ BookingEngine ยังทำงานต่อ ไม่ได้ปิดให้)
+                browser = None
+                context = None
+                try:
+                    with span("browser_launch", browser=browser_name, headless=headless):
+                        if browser_name == "chrome":
+                            browser = await browser_type.launch(headless=headless, channel="chrome")
+                        elif browser_name == "edge":
+                            browser = await browser_type.launch(headless=headless, channel="msedge")
+                        else:
+                            print(f"❌ ไม่รองรับเบราว์เซอร์: {browser_name}")
+                            return False
+
+                        context = await browser.new_context()
+                        blocking_stats = await install_blocking(context, launch_options)
+                        # ถ้าเปิด profiling ไว้ (ดู run_profiler.py) บันทึก screenshot/DOM/network ของทั้งรอบ
+                        await start_tracing(context)
+                        page = await context.new_page()
+
+                    with span("navigation", url=site_url) as nav_attrs:
+                        await page.goto(site_url)
+                        load_metrics = await measure_page_load(page)
+                        nav_attrs.update(blocking=blocking_stats is not None, **(load_metrics or {}))
+                    print(f"🌐 Opened {site_url} in {browser_name.capitalize()}{' (headless)' if headless else ''}")
+                    print(format_load_report(load_metrics, blocking_stats))
+
+                    # เรียกฟังก์ชัน booking พร้อมส่งค่า branch, day, time
+                    with span("booking_steps"):
+                        booked = await booking_func(page, branch, day, time_str)
+
+                    # ใน worker process (GUI) ผลรู้แล้วจึงปิดทันที ไม่รอ prompt ที่อาจไม่มีใครตอบ
+                    if not headless and not in_worker():
+                        with span("close_prompt", category="human"):
+                            try:
+                                await asyncio.to_thread(input, "🕹️ Press Enter to close browser...")
+                            except EOFError:
+                                pass
+                    return booked
+                finally:
+                    if context is not None:
+                        await stop_tracing(context)
+                    if browser is not None:
+                        try:
+                            await browser.close()
+                        except Exception as e:
+                            print(f"⚠️ ปิดเบราว์เซอร์ไม่สำเร็จ: {e}")
 
     except Exception as e:
         print(f"❌ Error: {e}")
+        return False
+
+def start_trial_mode(username: str, site_choice: str, browser_choice: str, branch: str, day: int, time_str: str, launch_options: dict = None):
+    """Sync wrapper: ส่ง trial flow เข้า BookingEngine แล้วรอจนเสร็จ คืน True เมื่อจองสำเร็จ"""
+    return get_engine().run(
+        lambda playwright: start_trial_mode_async(playwright, username, site_choice, browser_choice, branch, day, time_str, launch_options)
+    )
 
 # ลบฟังก์ชัน choose_branch, choose_day, choose_time ออกไป (หรือคอมเมนต์ไว้)
 # เพื่อป้องกันการเรียกใช้ input() ในโหมด GUI
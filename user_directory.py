@@ -0,0 +1,164 @@
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from pathlib import Path
+
+# cache ของชีต Users บนดิสก์ (เก็บเฉพาะ hash ของรหัสผ่าน ไม่เก็บรหัสผ่านจริง)
+USERS_CACHE_PATH = Path("cache/users_cache.json")
+
+# อายุของ cache ก่อนจะดึงข้อมูลจาก Google Sheet ใหม่ (วินาที)
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+# ถ้าดึงข้อมูลไม่สำเร็จ จะลองใหม่หลังจากนี้ (วินาที)
+RETRY_SECONDS = 60
+
+
+def _hash_password(salt, password):
+    return hashlib.sha256(f"{salt}:{password}".encode("utf-8")).hexdigest()
+
+
+class UserDirectory:
+    """
+    รายชื่อผู้ใช้และสิทธิ์จากชีต Users พร้อม cache บนดิสก์
+    - ตอนเปิดโปรแกรมโหลดจาก cache ทันที (ถ้ามี) แล้วค่อยรีเฟรชจาก Google Sheet ใน background
+    - ใช้ cache เดิมต่อได้ถ้า Google Sheet ช้าหรือเชื่อมต่อไม่ได้
+    - ค้นหาผู้ใช้ผ่าน index ตาม username
+    ใช้แทน list ผลลัพธ์ของ load_user_credentials_from_gsheet() ได้ (วน for / len ได้เหมือนเดิม)
+    """
+
+    def __init__(self, fetch_users, cache_path=USERS_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS):
+        # fetch_users: ฟังก์ชันที่คืน list ของ dict (username, password, role, max_profiles, can_use_scheduler)
+        self._fetch_users = fetch_users
+        self._cache_path = Path(cache_path)
+        self._ttl_seconds = ttl_seconds
+        # salt และ index ต้องสลับพร้อมกัน จึงเก็บไว้ใน dict เดียว
+        self._index = {"salt": "", "by_username": {}}
+        self._users = []
+        self._fetched_at = 0.0
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
+        self._stop_event = threading.Event()
+
+    # --- อ่านข้อมูล ---
+
+    def __iter__(self):
+        return iter(self._users)
+
+    def __len__(self):
+        return len(self._users)
+
+    def get(self, username):
+        """คืนข้อมูลผู้ใช้ (ไม่มีรหัสผ่าน) หรือ None"""
+        entry = self._index["by_username"].get(username)
+        return entry["user"] if entry else None
+
+    def authenticate(self, username, password):
+        index = self._index
+        entry = index["by_username"].get(username)
+        if entry is None or password is None:
+            return None
+        if hmac.compare_digest(entry["password_hash"], _hash_password(index["salt"], password)):
+            return entry["user"]
+        return None
+
+    @property
+    def age_seconds(self):
+        return time.time() - self._fetched_at if self._fetched_at else None
+
+    def is_stale(self):
+        age = self.age_seconds
+        return age is None or age >= self._ttl_seconds
+
+    # --- cache ---
+
+    def _apply(self, entries, fetched_at, salt):
+        # สร้าง list/index ชุดใหม่ก่อนแล้วค่อยสลับทีเดียว เพื่อให้ thread อื่นอ่านได้ระหว่างรีเฟรช
+        by_username = {}
+        for entry in entries:
+            by_username[entry["user"]["username"]] = entry
+        self._index = {"salt": salt, "by_username": by_username}
+        self._users = [entry["user"] for entry in by_username.values()]
+        self._fetched_at = fetched_at
+
+    def load_cache(self):
+        """โหลดจาก cache บนดิสก์ คืน True ถ้ามีข้อมูลผู้ใช้"""
+        try:
+            with open(self._cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._apply(data["users"], data["fetched_at"], data["salt"])
+        except FileNotFoundError:
+            return False
+        except (OSError, KeyError, TypeError, json.JSONDecodeError) as e:
+            print(f"⚠️ อ่าน cache ผู้ใช้ไม่ได้ ({self._cache_path}): {e}")
+            return False
+        return bool(self._users)
+
+    def _save_cache(self, entries, fetched_at, salt):
+        self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._cache_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": fetched_at, "salt": salt, "users": entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self._cache_path)
+
+    # --- รีเฟรชจาก Google Sheet ---
+
+    def refresh(self):
+        """ดึงข้อมูลจาก Google Sheet แล้วอัปเดต cache คืน True เมื่อสำเร็จ (ข้อมูลเดิมยังใช้ได้ถ้าล้มเหลว)"""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            try:
+                records = self._fetch_users()
+            except Exception as e:
+                print(f"⚠️ รีเฟรชข้อมูลผู้ใช้ไม่สำเร็จ: {e}")
+                return False
+            if not records:
+                print("⚠️ รีเฟรชข้อมูลผู้ใช้ไม่สำเร็จ (ไม่ได้รับข้อมูลผู้ใช้), ใช้ข้อมูลเดิมต่อ")
+                return False
+
+            salt = secrets.token_hex(16)
+            entries = []
+            for record in records:
+                user = {key: value for key, value in record.items() if key != "password"}
+                entries.append({"user": user, "password_hash": _hash_password(salt, record["password"])})
+            fetched_at = time.time()
+            self._apply(entries, fetched_at, salt)
+            try:
+                self._save_cache(entries, fetched_at, salt)
+            except OSError as e:
+                print(f"⚠️ บันทึก cache ผู้ใช้ไม่ได้: {e}")
+            print(f"🔄 อัปเดตข้อมูลผู้ใช้ {len(entries)} รายการใน {time.perf_counter() - started:.2f} วินาที")
+            return True
+
+    def load(self):
+        """
+        ใช้ตอนเปิดโปรแกรม: โหลดจาก cache ทันที ถ้าไม่มี cache จึงดึงจาก Google Sheet แบบรอผล
+        คืน True ถ้ามีข้อมูลผู้ใช้ให้ใช้งาน
+        """
+        if self.load_cache():
+            age_minutes = self.age_seconds / 60
+            state = "หมดอายุ, จะรีเฟรชใน background" if self.is_stale() else "ยังไม่หมดอายุ"
+            print(f"⚡ โหลดข้อมูลผู้ใช้ {len(self)} รายการจาก cache (อายุ {age_minutes:.0f} นาที, {state})")
+            return True
+        return self.refresh()
+
+    def start_background_refresh(self):
+        """เริ่ม thread ที่รีเฟรชข้อมูลเมื่อ cache หมดอายุ (และลองใหม่ทุก RETRY_SECONDS ถ้าล้มเหลว)"""
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._refresh_thread = threading.Thread(target=self._refresh_loop, name="user-directory-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def stop_background_refresh(self):
+        self._stop_event.set()
+
+    def _refresh_loop(self):
+        while not self._stop_event.is_set():
+            if self.is_stale():
+                wait_seconds = self._ttl_seconds if self.refresh() else RETRY_SECONDS
+            else:
+                wait_seconds = self._ttl_seconds - self.age_seconds
+            self._stop_event.wait(max(1.0, wait_seconds))
@@ -1,10 +1,11 @@
-import gspread
-from google.oauth2.service_account import Credentials
-
 SHEET_NAME = "Users"  # ชื่อชีตที่เก็บข้อมูล user
 SPREADSHEET_ID = "1rQnV_-30tmb8oYj7g9q6-YdyuWZZ2c8sZ2xH7pqszVk"
 
 def connect_gsheet():
+    # import gspread/google-auth ตอนเชื่อมต่อชีตครั้งแรกเท่านั้น (ลดเวลาเปิดโปรแกรม)
+    import gspread
+    from google.oauth2.service_account import Credentials
+
     scope = ["https://spreadsheets.google.com/feeds",
              "https://www.googleapis.com/auth/drive"]
     creds = Credentials.from_service_account_file("credentials.json", scopes=scope)
@@ -0,0 +1,307 @@
+import builtins
+import importlib
+import itertools
+import multiprocessing
+import queue
+import sys
+import threading
+import time
+import traceback
+
+# รันการจองแต่ละครั้งใน process แยก (ไม่ใช่ thread ใน process ของ GUI)
+# - worker ส่ง event (log/progress/prompt/done) กลับมาทาง multiprocessing.Queue
+# - worker ที่ค้าง/ตาย/เกินเวลา จะถูก kill เฉพาะตัวมันเอง ไม่กระทบ GUI และงานอื่น
+# - GUI ไม่ต้องรออะไร: ผลทั้งหมดมาทาง callback จาก thread ของ pool
+
+# งานที่ worker รันได้: kind -> (โมดูล, ฟังก์ชัน sync) import ใน worker ตอนเริ่มงาน
+JOB_TARGETS = {
+    "live": ("live_mode", "run_live_mode_for_user"),
+    "live_prewarmed": ("live_mode", "run_prewarmed_live_mode_for_user"),
+    "trial": ("trial_mode", "start_trial_mode"),
+}
+
+DEFAULT_MAX_WORKERS = 4
+# เวลาสูงสุดของงานหนึ่งงาน นับจากเริ่ม worker (วินาที, None = ไม่จำกัด)
+DEFAULT_TIMEOUT_SECONDS = 30 * 60
+# เวลาที่รอให้ event สุดท้ายของ worker ที่จบแล้วมาถึง ก่อนสรุปว่า crash (วินาที)
+_EXIT_GRACE_SECONDS = 0.5
+_POLL_SECONDS = 0.1
+
+
+# --- ฝั่ง worker process ---
+
+# True เมื่อโค้ดกำลังรันอยู่ใน worker process (ไม่มี terminal ให้ผู้ใช้กด Enter)
+_in_worker = False
+
+
+def in_worker():
+    return _in_worker
+
+class _EventWriter:
+    """ใช้แทน sys.stdout/sys.stderr ใน worker: ส่งข้อความทีละบรรทัดเป็น event"""
+
+    def __init__(self, events, job_id, stream):
+        self._events = events
+        self._job_id = job_id
+        self._stream = stream
+        self._buffer = ""
+
+    def write(self, text):
+        self._buffer += text
+        if "\n" in self._buffer:
+            lines, self._buffer = self._buffer.rsplit("\n", 1)
+            self._events.put({"type": "log", "job_id": self._job_id, "stream": self._stream, "text": lines})
+
+    def flush(self):
+        if self._buffer:
+            self._events.put({"type": "log", "job_id": self._job_id, "stream": self._stream, "text": self._buffer})
+            self._buffer = ""
+
+
+def _worker_main(job_id, target_name, kwargs, events, commands):
+    global _in_worker
+    _in_worker = True
+    sys.stdout = _EventWriter(events, job_id, "stdout")
+    sys.stderr = _EventWriter(events, job_id, "stderr")
+
+    # input() ใน flow (เช่น "กด Enter เพื่อปิด browser") ถามผ่าน GUI แทน stdin ที่ worker ไม่มี
+    def prompt(text=""):
+        sys.stdout.flush()
+        events.put({"type": "prompt", "job_id": job_id, "text": str(text)})
+        if commands.get() == "cancel":
+            raise EOFError("ผู้ใช้ยกเลิก")
+        return ""
+
+    builtins.input = prompt
+
+    import tracing
+
+    # ส่งทุก span ที่จบแล้วเป็น progress event
+    tracing.add_listener(lambda record: events.put({
+        "type": "progress",
+        "job_id": job_id,
+        "span": record["span"],
+        "status": record["status"],
+        "duration_ms": record["duration_ms"],
+    }))
+
+    events.put({"type": "started", "job_id": job_id, "pid": multiprocessing.current_process().pid})
+    try:
+        module_name, function_name = target_name
+        target = getattr(importlib.import_module(module_name), function_name)
+        result = target(**kwargs)
+        sys.stdout.flush()
+        result = result if isinstance(result, (bool, int, float, str, type(None))) else None
+        if result is False:
+            # งานจบปกติแต่รายงานว่าไม่สำเร็จ (เช่นจองไม่ได้) ไม่ใช่ error ของ worker
+            events.put({"type": "done", "job_id": job_id, "ok": False, "reason": "unsuccessful", "result": result, "error": "การจองไม่สำเร็จ"})
+        else:
+            events.put({"type": "done", "job_id": job_id, "ok": True, "result": result})
+    except BaseException as e:
+        sys.stdout.flush()
+        events.put({"type": "done", "job_id": job_id, "ok": False, "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc()})
+    finally:
+        from booking_engine import get_engine
+        try:
+            get_engine().shutdown()
+        except Exception:
+            pass
+
+
+# --- ฝั่ง GUI / process หลัก ---
+
+class WorkerPool:
+    """
+    pool ของ worker process สำหรับงานจอง (หนึ่งงานต่อหนึ่ง process, พร้อมกันไม่เกิน max_workers)
+    on_event(event): เรียกจาก thread ของ pool สำหรับทุก event (log, progress, prompt, started, done)
+    event "done" มี ok, error และ reason ("finished", "unsuccessful", "failed", "crashed", "timeout", "cancelled")
+    งานที่คืน False ถือว่าไม่สำเร็จ (ok=False, reason "unsuccessful"), คืนค่าอื่นหรือ None ถือว่าสำเร็จ
+    """
+
+    def __init__(self, on_event=None, max_workers=DEFAULT_MAX_WORKERS):
+        # spawn ใช้ได้ทั้ง Windows และ build ของ PyInstaller (ต้องเรียก multiprocessing.freeze_support())
+        self._ctx = multiprocessing.get_context("spawn")
+        self._events = self._ctx.Queue()
+        self._on_event = on_event
+        self.max_workers = max_workers
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._running = {}
+        self._monitor = None
+        self._stop = threading.Event()
+
+    def submit(self, kind, kwargs, timeout=DEFAULT_TIMEOUT_SECONDS, on_done=None, label=None):
+        """
+        ส่งงานเข้าคิว คืน job_id ทันที (ไม่บล็อก)
+        on_done(event): เรียกครั้งเดียวเมื่องานจบ ไม่ว่าสำเร็จ ล้มเหลว crash หรือเกินเวลา
+        """
+        if kind not in JOB_TARGETS:
+            raise ValueError(f"ไม่รู้จักงานประเภท: {kind}")
+        job = {
+            "id": next(self._ids),
+            "kind": kind,
+            "target": JOB_TARGETS[kind],
+            "kwargs": kwargs,
+            "timeout": timeout,
+            "on_done": on_done,
+            "label": label or kind,
+            "submitted_at": time.monotonic(),
+        }
+        with self._lock:
+            self._pending.append(job)
+        self._ensure_monitor()
+        return job["id"]
+
+    def send(self, job_id, command="continue"):
+        """ตอบ prompt ของ worker ("continue" หรือ "cancel")"""
+        with self._lock:
+            job = self._running.get(job_id)
+        if job is not None:
+            job["commands"].put(command)
+
+    def cancel(self, job_id):
+        with self._lock:
+            for job in self._pending:
+                if job["id"] == job_id:
+                    self._pending.remove(job)
+                    break
+            else:
+                job = self._running.get(job_id)
+                if job is not None:
+                    job["kill_reason"] = "cancelled"
+                return
+        self._finish(job, {"type": "done", "job_id": job_id, "ok": False, "reason": "cancelled", "error": "ยกเลิกก่อนเริ่มงาน"})
+
+    def cancel_all(self):
+        """ยกเลิกทุกงาน (ทั้งที่รอและที่กำลังทำงาน) โดยยังเรียก on_done ของแต่ละงานตามปกติ"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            for job in self._running.values():
+                job["kill_reason"] = "cancelled"
+        for job in pending:
+            self._finish(job, {"type": "done", "job_id": job["id"], "ok": False, "reason": "cancelled", "error": "ยกเลิกก่อนเริ่มงาน"})
+
+    def active_jobs(self):
+        with self._lock:
+            return {"running": len(self._running), "pending": len(self._pending)}
+
+    def shutdown(self, kill=True):
+        """หยุด thread ของ pool และ kill worker ที่ยังทำงานอยู่"""
+        self._stop.set()
+        if self._monitor is not None:
+            self._monitor.join(timeout=2)
+        if kill:
+            with self._lock:
+                running = list(self._running.values())
+            for job in running:
+                self._kill(job["process"])
+
+    # --- monitor thread ---
+
+    def _ensure_monitor(self):
+        if self._monitor is None or not self._monitor.is_alive():
+            self._stop.clear()
+            self._monitor = threading.Thread(target=self._monitor_loop, name="worker-pool", daemon=True)
+            self._monitor.start()
+
+    def _monitor_loop(self):
+        while not self._stop.is_set():
+            self._start_pending()
+            self._drain_events(timeout=_POLL_SECONDS)
+            self._check_workers()
+
+    def _start_pending(self):
+        with self._lock:
+            to_start = []
+            while self._pending and len(self._running) + len(to_start) < self.max_workers:
+                to_start.append(self._pending.pop(0))
+        for job in to_start:
+            job["commands"] = self._ctx.Queue()
+            job["process"] = self._ctx.Process(
+                target=_worker_main,
+                args=(job["id"], job["target"], job["kwargs"], self._events, job["commands"]),
+                name=f"booking-worker-{job['id']}",
+                daemon=True,
+            )
+            job["started_at"] = time.monotonic()
+            with self._lock:
+                self._running[job["id"]] = job
+            try:
+                job["process"].start()
+            except Exception as e:
+                self._finish(job, {"type": "done", "job_id": job["id"], "ok": False, "reason": "crashed", "error": f"เริ่ม worker ไม่ได้: {e}"})
+
+    def _drain_events(self, timeout):
+        try:
+            event = self._events.get(timeout=timeout)
+        except queue.Empty:
+            return
+        while True:
+            self._handle_event(event)
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                return
+
+    def _handle_event(self, event):
+        with self._lock:
+            job = self._running.get(event.get("job_id"))
+        if job is None:
+            return
+        if event["type"] == "done":
+            event.setdefault("reason", "finished" if event["ok"] else "failed")
+            job["done_event"] = event
+            return
+        self._emit(event)
+
+    def _check_workers(self):
+        now = time.monotonic()
+        with self._lock:
+            running = list(self._running.values())
+        for job in running:
+            process = job["process"]
+            if job.get("kill_reason"):
+                self._kill(process)
+                self._finish(job, {"type": "done", "job_id": job["id"], "ok": False, "reason": job["kill_reason"], "error": "ถูกยกเลิก"})
+            elif job["timeout"] is not None and now - job["started_at"] > job["timeout"] and process.is_alive():
+                self._kill(process)
+                self._finish(job, {"type": "done", "job_id": job["id"], "ok": False, "reason": "timeout", "error": f"เกินเวลา {job['timeout']:.0f} วินาที"})
+            elif not process.is_alive():
+                if "done_event" in job:
+                    process.join(timeout=0)
+                    self._finish(job, job["done_event"])
+                elif "exited_at" not in job:
+                    # event สุดท้ายอาจยังค้างอยู่ใน queue รอก่อนสรุปว่า crash
+                    job["exited_at"] = now
+                elif now - job["exited_at"] > _EXIT_GRACE_SECONDS:
+                    self._finish(job, {"type": "done", "job_id": job["id"], "ok": False, "reason": "crashed", "error": f"worker จบโดยไม่มีผลลัพธ์ (exit code {process.exitcode})"})
+
+    @staticmethod
+    def _kill(process):
+        if process.is_alive():
+            process.kill()
+        process.join(timeout=2)
+
+    def _finish(self, job, event):
+        with self._lock:
+            self._running.pop(job["id"], None)
+            if job.get("finished"):
+                return
+            job["finished"] = True
+        event["label"] = job["label"]
+        event["elapsed_s"] = round(time.monotonic() - job.get("started_at", job["submitted_at"]), 2)
+        self._emit(event)
+        if job["on_done"] is not None:
+            try:
+                job["on_done"](event)
+            except Exception as e:
+                print(f"⚠️ worker pool: on_done ของงาน {job['id']} ผิดพลาด: {e}")
+
+    def _emit(self, event):
+        if self._on_event is None:
+            return
+        try:
+            self._on_event(event)
+        except Exception as e:
+            print(f"⚠️ worker pool: on_event ผิดพลาด: {e}")